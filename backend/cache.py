@@ -0,0 +1,253 @@
+import asyncio
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """Case-fold and collapse whitespace so trivially different prompts share a cache key"""
+    return " ".join(text.casefold().split())
+
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded mapping that evicts the least recently used entry and counts hits and misses.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._data), "maxsize": self.maxsize}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class TTLCache:
+    """
+    Thread-safe, size-bounded LRU cache whose entries expire `ttl_seconds` after they are stored.
+
+    Concurrent misses on the same key share a single computation through `get_or_compute` / `aget_or_compute`, from
+    threads and coroutines alike. Values rejected by their `cacheable` predicate are shared but not stored. When `path`
+    is set, unexpired entries are loaded from it on creation and written back by `save`.
+    """
+
+    def __init__(self, maxsize: int, ttl_seconds: float, path: str | None = None):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        # key -> (expiry as a unix timestamp, value)
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._in_flight: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+        if path and os.path.exists(path):
+            self.load()
+
+    def _get(self, key: Hashable) -> tuple[bool, Any]:
+        # Caller holds the lock
+        if key in self._data:
+            expires_at, value = self._data[key]
+            if expires_at > time.time():
+                self._data.move_to_end(key)
+                return True, value
+            del self._data[key]
+        return False, None
+
+    def _put(self, key: Hashable, value: Any):
+        # Caller holds the lock
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (time.time() + self.ttl_seconds, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            found, value = self._get(key)
+            if found:
+                self.hits += 1
+                return value
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._put(key, value)
+
+    def _claim(self, key: Hashable) -> tuple[bool, Any, Future | None, bool]:
+        """Returns (found, value, future, leader). The leader computes the value and resolves the shared future."""
+        with self._lock:
+            found, value = self._get(key)
+            if found:
+                self.hits += 1
+                return True, value, None, False
+            if (future := self._in_flight.get(key)) is not None:
+                self.coalesced += 1
+                return False, None, future, False
+            self.misses += 1
+            future = self._in_flight[key] = Future()
+            return False, None, future, True
+
+    def _resolve(self, key: Hashable, future: Future, value: Any = None, error: BaseException | None = None,
+                 cacheable: Callable[[Any], bool] | None = None):
+        with self._lock:
+            del self._in_flight[key]
+            if error is None and (cacheable is None or cacheable(value)):
+                self._put(key, value)
+        if error is None:
+            future.set_result(value)
+        else:
+            future.set_exception(error)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any],
+                       cacheable: Callable[[Any], bool] | None = None) -> Any:
+        found, value, future, leader = self._claim(key)
+        if found:
+            return value
+        if not leader:
+            return future.result()
+        try:
+            value = compute()
+        except BaseException as e:
+            self._resolve(key, future, error=e)
+            raise
+        self._resolve(key, future, value, cacheable=cacheable)
+        return value
+
+    async def aget_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]],
+                              cacheable: Callable[[Any], bool] | None = None) -> Any:
+        found, value, future, leader = self._claim(key)
+        if found:
+            return value
+        if leader:
+            # Run the computation as its own task so cancelling the leader doesn't cancel it for the other waiters
+            task = asyncio.ensure_future(self._acompute(key, future, compute, cacheable))
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        # Shield the shared future so a cancelled waiter doesn't cancel it for everyone else
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    async def _acompute(self, key: Hashable, future: Future, compute: Callable[[], Awaitable[Any]],
+                        cacheable: Callable[[Any], bool] | None = None):
+        try:
+            value = await compute()
+        except BaseException as e:
+            self._resolve(key, future, error=e)
+            raise
+        self._resolve(key, future, value, cacheable=cacheable)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits, "misses": self.misses, "coalesced": self.coalesced,
+                "size": len(self._data), "maxsize": self.maxsize,
+            }
+
+    def save(self):
+        if not self.path:
+            return
+        now = time.time()
+        with self._lock:
+            entries = {key: entry for key, entry in self._data.items() if entry[0] > now}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(entries, f)
+        os.replace(tmp_path, self.path)
+
+    def load(self):
+        try:
+            with open(self.path, "rb") as f:
+                entries: dict[Hashable, tuple[float, Any]] = pickle.load(f)
+        except Exception as e:
+            logger.error(f"Failed to load cache from {self.path}: {str(e)}")
+            return
+
+        now = time.time()
+        with self._lock:
+            for key, entry in entries.items():
+                if entry[0] > now:
+                    self._data[key] = entry
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent async calls with the same key into a single execution, without caching its result.
+
+    The first caller for a key starts the computation, callers arriving while it runs wait for it, and every one of
+    them gets its result or its exception. The computation runs as its own task, so cancelled waiters (such as a
+    disconnected client that happened to start it) don't cancel it for the others.
+    """
+
+    def __init__(self):
+        self.executed = 0
+        self.coalesced = 0
+        self._in_flight: dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+        """
+        Args:
+            key (Hashable): Calls with equal keys share a computation
+            compute (Callable[[], Awaitable[Any]]): Starts the computation, only called when none is in flight for `key`
+
+        Returns:
+            tuple[Any, bool]: The computation's result, and whether this call joined one started by another caller
+        """
+        task = self._in_flight.get(key)
+        shared = task is not None
+        if shared:
+            self.coalesced += 1
+        else:
+            self.executed += 1
+            task = self._in_flight[key] = asyncio.ensure_future(compute())
+            task.add_done_callback(lambda t: self._done(key, t))
+        return await asyncio.shield(task), shared
+
+    def _done(self, key: Hashable, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Mark the exception retrieved, it has been raised to the waiters, if any are left
+        task.cancelled() or task.exception()
+
+    def stats(self) -> dict:
+        return {"executed": self.executed, "coalesced": self.coalesced, "in_flight": len(self._in_flight)}
@@ -34,10 +34,81 @@ class Settings(BaseSettings, extra="ignore"):
     # OpenAI
     OPENAI_API_KEY: str
     OPENAI_EMBEDDINGS_MODEL: str = "text-embedding-3-small"
+    OPENAI_RATE_LIMIT_ENABLED: bool = True  # Send every OpenAI request through the process-wide rate limiter
+    OPENAI_REQUESTS_PER_MINUTE: int = 500  # Per model, until the x-ratelimit-limit-* response headers say otherwise
+    OPENAI_TOKENS_PER_MINUTE: int = 200_000  # Per model, until the x-ratelimit-limit-* response headers say otherwise
 
     # Tavily
     TAVILY_API_KEY: str
 
+    # Research agent
+    AGENT_WARMUP_ON_STARTUP: bool = True  # Build the agent graph in the FastAPI lifespan instead of on first request
+    GRADER_MODEL: str = "gpt-4o-mini"  # Retrieval grading, the most frequent call, so the cheapest and fastest model
+    REWRITER_MODEL: str = "gpt-4o-mini"  # Query rewriting
+    GENERATOR_TIERS: dict[str, str] = {"default": "gpt-4o-mini", "large": "gpt-4o"}  # Generators a request's `model` picks from
+    DEFAULT_GENERATOR_TIER: str = "default"  # Tier of requests that don't name one
+    RETRIEVAL_MODE: str = "serial"  # "serial" falls back source by source, "fanout" queries every source at once
+    CONTEXT_TOKEN_BUDGET: int = 6000  # Maximum resource tokens in the generation prompt
+    CONTEXT_NEAR_DUPLICATE_THRESHOLD: float = 0.9  # Word 3-gram Jaccard similarity from which passages are deduped
+    VECTOR_BACKEND: str = "pinecone"  # "pinecone", or "local" for the memory-mapped index at LOCAL_INDEX_DIR
+    LOCAL_INDEX_DIR: str = "resources/local_index"  # Built from the indexing DAG exports with backend.research_agent.local_index
+    RETRIEVER_MODE: str = "dense"  # "dense", or "hybrid" to fuse dense and BM25 rankings (BM25 index in LOCAL_INDEX_DIR, or from S3 with Pinecone)
+    LEXICAL_INDEX_S3_PREFIX: str = "lexical_index"  # S3 prefix the indexing DAG publishes the BM25 index of the Pinecone chunks under
+    LEXICAL_INDEX_DIR: str = "resources/lexical_index"  # Where the published BM25 index is downloaded to for hybrid search over Pinecone
+    HYBRID_CANDIDATES: int = 20  # Chunks taken from each ranking before fusion
+    RRF_K: int = 60  # Reciprocal rank fusion damping constant
+    RETRIEVER_POOL_SIZE: int = 128  # Per-article vector retrievers kept in memory
+    QUERY_EMBEDDING_CACHE_SIZE: int = 1024  # Query embeddings kept in memory
+    MULTI_ARTICLE_MAX_ARTICLES: int = 5  # Articles a multi-article question can span
+    MULTI_ARTICLE_QUOTA: int = 3  # Chunks retrieved from each article of a multi-article question
+    GRADER_MAX_CONCURRENCY: int = 8  # Parallel retrieval grader calls per graph run
+    GRADER_TIMEOUT_SECONDS: float = 30.0  # Resources whose grade takes longer are treated as irrelevant
+    GRADER_LISTWISE: bool = True  # Grade all resources in one LLM call, falling back to per-resource grading
+    GRADER_PROVIDER_LIMIT: bool = False  # Queue the async grader calls of all requests under LLM_MAX_CONCURRENCY
+    LLM_MAX_CONCURRENCY: int = 32  # Grader calls in flight to the LLM provider across the process, with GRADER_PROVIDER_LIMIT
+    RERANKER_ENABLED: bool = False  # Accept/reject confidently scored vector store resources without the LLM grader, enable once the thresholds are calibrated against its grades
+    RERANKER_ACCEPT_THRESHOLD: float = 0.7  # Confidence (weighted similarity and term overlap) to accept from
+    RERANKER_REJECT_THRESHOLD: float = 0.25  # Confidence to reject under
+    RERANKER_SIMILARITY_WEIGHT: float = 0.7  # Weight of embedding similarity in the confidence, the rest is term overlap
+    SKIP_GRADING_SCORE_THRESHOLD: float | None = None  # Generate ungraded when the top N vector scores all reach this
+    PAPER_SEARCH_SCORE_THRESHOLD: float | None = None  # Go straight to paper search when every vector score is below this
+    SCORE_POLICY_TOP_N: int = 3  # Top vector scores checked against SKIP_GRADING_SCORE_THRESHOLD
+    SPECULATIVE_GENERATION: bool = False  # Draft the answer from the ungraded vector results while they are graded
+
+    # arXiv / Tavily result cache
+    TOOL_CACHE_TTL_SECONDS: int = 60 * 60  # 1 hour
+    TOOL_CACHE_MAX_ENTRIES: int = 512  # Per tool
+    TOOL_CACHE_DIR: str | None = None  # Directory the caches are loaded from at startup and saved to at shutdown
+
+    # Semantic answer cache
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: float = 0.95  # Minimum cosine similarity between prompt embeddings
+    ANSWER_CACHE_TTL_SECONDS: int = 60 * 60 * 24  # 1 day
+    ANSWER_CACHE_MAX_ENTRIES: int = 1000
+    ANSWER_CACHE_PATH: str | None = None  # Pickle file the cache is loaded from at startup and saved to at shutdown
+    QA_SINGLE_FLIGHT: bool = True  # Identical questions in flight at the same time share one graph run
+
+    # Ingest-time article digests
+    DIGEST_ANSWERS_ENABLED: bool = True  # Answer questions matching an article's canonical questions from its digest
+    DIGEST_MATCH_THRESHOLD: float = 0.88  # Minimum cosine similarity between a prompt and a canonical question
+    DIGEST_CACHE_TTL_SECONDS: int = 5 * 60  # Digests are reloaded from Postgres after this, picking up re-ingestion
+    DIGEST_CACHE_MAX_ENTRIES: int = 1000
+
+    # Conversations
+    CONVERSATION_SESSIONS_ENABLED: bool = True  # Keep each session's last turn so follow-ups can build on it
+    CONVERSATION_TTL_SECONDS: int = 30 * 60  # Sessions idle for longer are forgotten
+    CONVERSATION_MAX_SESSIONS: int = 10_000
+    CONVERSATION_HISTORY_TURNS: int = 3  # Turns kept with their answers, older ones are compressed to their questions
+    CONVERSATION_ANSWER_MAX_CHARS: int = 800  # Answers in the history are clipped to this length
+    FOLLOW_UP_REUSE_MAX_WORDS: int = 12  # Follow-ups this short are answered from the previous turn's resources
+
+    # Answer verification
+    VERIFICATION_ENABLED: bool = False  # Check generated answers are grounded in their resources and answer the question, after returning them, at up to two LLM calls each
+    VERIFICATION_MODEL: str = "gpt-4o-mini"  # Hallucination grader
+    VERIFICATION_MAX_CONCURRENCY: int = 8  # Checks in flight at once across the process
+    VERIFICATION_TTL_SECONDS: int = 60 * 60  # Verdicts can be polled for this long
+    VERIFICATION_MAX_ENTRIES: int = 10_000
+
     # Fast API config
     APP_TITLE: str = "Multi Agent Report Generator"
     APP_VERSION: str = "0.1"
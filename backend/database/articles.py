@@ -1,4 +1,5 @@
 from sqlalchemy import Column, String, DateTime, Computed, Text, func
+from sqlalchemy.dialects.postgresql import JSONB
 
 from backend.database import Base
 
@@ -13,3 +14,18 @@ class ArticleModel(Base):
     created_date = Column(DateTime(timezone=True), server_default=func.now())
 
     __table_args__ = {"schema": "public"}
+
+
+class ArticleDigestModel(Base):
+    """Digest and canonical Q&A pairs generated for an article at ingest time by the PDF indexing DAG"""
+    __tablename__ = "article_digests"
+
+    a_id = Column(String, primary_key=True)
+    digest = Column(Text)
+    # [{"question", "answer", "embedding"}], the questions embedded with `embedding_model`
+    faq = Column(JSONB)
+    model = Column(String)
+    embedding_model = Column(String)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = {"schema": "public"}
@@ -1,13 +1,19 @@
+import asyncio
 import logging.config
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Response
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.config import settings
 from backend.database import db_session
+from backend.research_agent import get_agent_workflow
+from backend.research_agent.vector_store import get_retriever
 from backend.schemas import HealthSchema
+from backend.services.chat import answer_cache, get_answer_verifier
+from backend.utils import save_tool_caches
 from backend.views import central_router
 
 # Load logging configuration from file
@@ -21,7 +27,16 @@ logging.getLogger("passlib").setLevel(logging.ERROR)
 async def lifespan(app: FastAPI):
     logger.info("[FastAPI] Startup lifespan invoked")
     # await init_db()
+    if settings.RETRIEVER_MODE == "hybrid":
+        # Fails startup rather than the first question when the BM25 index is missing
+        await asyncio.to_thread(get_retriever)
+    if settings.AGENT_WARMUP_ON_STARTUP:
+        await asyncio.to_thread(get_agent_workflow)
+        logger.info("[FastAPI] Agent graph warmed up")
     yield
+    await get_answer_verifier().aclose()
+    answer_cache.save()
+    save_tool_caches()
 
 
 app = FastAPI(title=settings.APP_TITLE, version=settings.APP_VERSION, lifespan=lifespan)
@@ -43,3 +58,9 @@ app.add_middleware(
 @app.get("/", response_model=HealthSchema, tags=["health"])
 async def health_check(db: AsyncSession = Depends(db_session)):
     return {"api": True, "database": True}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics of the research agent: node durations, LLM calls, tokens and cost, retries and branches"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
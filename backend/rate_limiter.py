@@ -0,0 +1,308 @@
+import asyncio
+import contextvars
+import json
+import logging
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from enum import IntEnum
+from functools import lru_cache
+from typing import Iterator
+
+import httpx
+from openai import DefaultAsyncHttpxClient, DefaultHttpxClient
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Same connection pool as the OpenAI SDK's default clients, which passing a transport replaces
+CONNECTION_LIMITS = httpx.Limits(max_connections=1000, max_keepalive_connections=100)
+# Tokens assumed for a completion that doesn't set max_tokens
+DEFAULT_COMPLETION_TOKENS = 256
+# Longest a caller sleeps between checks, so pauses and priority changes are noticed
+MAX_POLL_SECONDS = 0.5
+
+
+class Priority(IntEnum):
+    LOW = 0
+    HIGH = 1
+
+
+_priority: contextvars.ContextVar[Priority] = contextvars.ContextVar("openai_priority", default=Priority.LOW)
+
+
+@contextmanager
+def priority(level: Priority) -> Iterator[None]:
+    """OpenAI requests made in this context, including the threads and tasks it starts, go through at `level`"""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def parse_duration(value: str | None) -> float | None:
+    """Parses the reset durations of OpenAI's rate limit headers, such as "20ms", "1s" or "6m0.5s", into seconds"""
+    if not value:
+        return None
+    units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|s|m|h)", value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(number) * units[unit] for number, unit in parts)
+
+
+def estimate_tokens(request: httpx.Request) -> int:
+    """Rough token cost of a chat completion or embedding request, prompt characters / 4 plus the completion budget"""
+    try:
+        body = json.loads(request.content or b"{}")
+    except (ValueError, httpx.RequestNotRead):
+        return 0
+    if not isinstance(body, dict):
+        return 0
+
+    if "messages" in body:
+        characters = sum(len(json.dumps(message.get("content", ""))) for message in body["messages"])
+        completion = body.get("max_completion_tokens") or body.get("max_tokens") or DEFAULT_COMPLETION_TOKENS
+        return characters // 4 + completion
+    if "input" in body:
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        # Inputs can already be token ids
+        return sum(len(item) if isinstance(item, list) else len(str(item)) // 4 for item in inputs)
+    return 0
+
+
+def _retry_delay(headers: httpx.Headers) -> float:
+    """Time to hold off after a 429, from the headers that say when the limit resets"""
+    try:
+        if retry_after_ms := headers.get("retry-after-ms"):
+            return float(retry_after_ms) / 1000
+    except ValueError:
+        pass
+    return (
+        parse_duration(headers.get("retry-after"))
+        or max(parse_duration(headers.get("x-ratelimit-reset-requests")) or 0.0,
+               parse_duration(headers.get("x-ratelimit-reset-tokens")) or 0.0)
+        or 1.0
+    )
+
+
+class _Bucket:
+    """Request and token buckets of one model, refilled continuously at the per-minute limits"""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.requests = float(requests_per_minute)
+        self.tokens = float(tokens_per_minute)
+        self.updated_at = time.monotonic()
+
+    def refill(self, now: float):
+        elapsed = now - self.updated_at
+        self.requests = min(self.requests_per_minute, self.requests + elapsed * self.requests_per_minute / 60)
+        self.tokens = min(self.tokens_per_minute, self.tokens + elapsed * self.tokens_per_minute / 60)
+        self.updated_at = now
+
+    def wait_time(self, tokens: int) -> float:
+        # A request larger than the whole bucket waits for a full one instead of forever
+        tokens = min(tokens, self.tokens_per_minute)
+        return max(
+            (1 - self.requests) * 60 / self.requests_per_minute,
+            (tokens - self.tokens) * 60 / self.tokens_per_minute,
+            0.0,
+        )
+
+
+class OpenAIRateLimiter:
+    """
+    Process-wide token-bucket limiter for the requests and tokens per minute of each OpenAI model.
+
+    Every request takes one request and its estimated tokens from its model's buckets, waiting until they refill.
+    Responses keep the buckets in line with the provider's view, which also counts other processes sharing the key:
+    the x-ratelimit-limit-* headers set the bucket sizes, and the x-ratelimit-remaining-* headers cap their levels. A
+    429 pauses the model until its retry-after or reset time, plus jitter, so callers don't retry in lockstep.
+
+    While a high priority request (such as answer generation) waits, low priority ones (such as grading) hold back.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        """
+        Args:
+            requests_per_minute (int): Requests per minute of a model until its response headers say otherwise
+            tokens_per_minute (int): Tokens per minute of a model until its response headers say otherwise
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.throttled = 0
+        self.rate_limited = 0
+        self._buckets: dict[str, _Bucket] = {}
+        self._paused_until: dict[str, float] = {}
+        self._high_priority_waiting: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, model: str) -> _Bucket:
+        # Caller holds the lock
+        if (bucket := self._buckets.get(model)) is None:
+            bucket = self._buckets[model] = _Bucket(self.requests_per_minute, self.tokens_per_minute)
+        return bucket
+
+    def _try_acquire(self, model: str, tokens: int, level: Priority) -> float:
+        """Takes the request's share of the buckets and returns 0, or returns the time to wait before trying again"""
+        with self._lock:
+            now = time.monotonic()
+            if (paused_until := self._paused_until.get(model, 0.0)) > now:
+                return paused_until - now
+            if level < Priority.HIGH and self._high_priority_waiting.get(model):
+                return 0.05
+            bucket = self._bucket(model)
+            bucket.refill(now)
+            if wait := bucket.wait_time(tokens):
+                return wait
+            bucket.requests -= 1
+            bucket.tokens -= tokens
+            return 0.0
+
+    @contextmanager
+    def _waiting(self, model: str, level: Priority) -> Iterator[None]:
+        if level < Priority.HIGH:
+            yield
+            return
+        with self._lock:
+            self._high_priority_waiting[model] = self._high_priority_waiting.get(model, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._high_priority_waiting[model] -= 1
+
+    def acquire(self, model: str, tokens: int):
+        level = _priority.get()
+        if not (wait := self._try_acquire(model, tokens, level)):
+            return
+        self.throttled += 1
+        with self._waiting(model, level):
+            while wait:
+                time.sleep(min(wait, MAX_POLL_SECONDS))
+                wait = self._try_acquire(model, tokens, level)
+
+    async def aacquire(self, model: str, tokens: int):
+        level = _priority.get()
+        if not (wait := self._try_acquire(model, tokens, level)):
+            return
+        self.throttled += 1
+        with self._waiting(model, level):
+            while wait:
+                await asyncio.sleep(min(wait, MAX_POLL_SECONDS))
+                wait = self._try_acquire(model, tokens, level)
+
+    def update(self, model: str, response: httpx.Response):
+        """Adapts the model's buckets to the rate limit headers of a response, pausing the model on a 429"""
+        headers = response.headers
+        with self._lock:
+            bucket = self._bucket(model)
+            if limit := headers.get("x-ratelimit-limit-requests"):
+                bucket.requests_per_minute = max(1, int(limit))
+            if limit := headers.get("x-ratelimit-limit-tokens"):
+                bucket.tokens_per_minute = max(1, int(limit))
+            if (remaining := headers.get("x-ratelimit-remaining-requests")) is not None:
+                bucket.requests = min(bucket.requests, float(remaining))
+            if (remaining := headers.get("x-ratelimit-remaining-tokens")) is not None:
+                bucket.tokens = min(bucket.tokens, float(remaining))
+
+            if response.status_code == 429:
+                self.rate_limited += 1
+                delay = _retry_delay(headers)
+                paused_until = time.monotonic() + delay * random.uniform(1.0, 1.2)
+                self._paused_until[model] = max(self._paused_until.get(model, 0.0), paused_until)
+                logger.warning(f"OpenAI rate limited {model}, pausing its requests for {delay:.2f}s")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "throttled": self.throttled,
+                "rate_limited": self.rate_limited,
+                "models": {
+                    model: {
+                        "requests_per_minute": bucket.requests_per_minute, "tokens_per_minute": bucket.tokens_per_minute,
+                        "requests": round(bucket.requests, 1), "tokens": round(bucket.tokens),
+                    }
+                    for model, bucket in self._buckets.items()
+                },
+            }
+
+
+def _request_model(request: httpx.Request) -> str:
+    try:
+        return json.loads(request.content or b"{}").get("model") or request.url.path
+    except (ValueError, AttributeError, httpx.RequestNotRead):
+        return request.url.path
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    def __init__(self, limiter: OpenAIRateLimiter, transport: httpx.BaseTransport):
+        self.limiter = limiter
+        self.transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        model = _request_model(request)
+        self.limiter.acquire(model, estimate_tokens(request))
+        response = self.transport.handle_request(request)
+        self.limiter.update(model, response)
+        return response
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    def __init__(self, limiter: OpenAIRateLimiter, transport: httpx.AsyncBaseTransport):
+        self.limiter = limiter
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        model = _request_model(request)
+        await self.limiter.aacquire(model, estimate_tokens(request))
+        response = await self.transport.handle_async_request(request)
+        self.limiter.update(model, response)
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+@lru_cache
+def get_openai_rate_limiter() -> OpenAIRateLimiter:
+    return OpenAIRateLimiter(settings.OPENAI_REQUESTS_PER_MINUTE, settings.OPENAI_TOKENS_PER_MINUTE)
+
+
+def rate_limited_http_clients(event_hooks: dict | None = None,
+                              async_event_hooks: dict | None = None) -> tuple[httpx.Client, httpx.AsyncClient]:
+    """
+    HTTP clients for the OpenAI SDK (`http_client` / `http_async_client` of ChatOpenAI and OpenAIEmbeddings) whose
+    requests go through the process-wide rate limiter, unless OPENAI_RATE_LIMIT_ENABLED is off.
+
+    Args:
+        event_hooks (dict): httpx event hooks of the sync client
+        async_event_hooks (dict): httpx event hooks of the async client, coroutine functions
+    """
+    event_hooks, async_event_hooks = event_hooks or {}, async_event_hooks or {}
+    if not settings.OPENAI_RATE_LIMIT_ENABLED:
+        return DefaultHttpxClient(event_hooks=event_hooks), DefaultAsyncHttpxClient(event_hooks=async_event_hooks)
+
+    limiter = get_openai_rate_limiter()
+    return (
+        DefaultHttpxClient(
+            transport=RateLimitedTransport(limiter, httpx.HTTPTransport(limits=CONNECTION_LIMITS)),
+            event_hooks=event_hooks,
+        ),
+        DefaultAsyncHttpxClient(
+            transport=AsyncRateLimitedTransport(limiter, httpx.AsyncHTTPTransport(limits=CONNECTION_LIMITS)),
+            event_hooks=async_event_hooks,
+        ),
+    )
@@ -1,66 +1,182 @@
 import os
 import pickle
 import sys
+import threading
 
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from typing import List, Any, Union, Dict
 
 from backend.config import settings
-from backend.research_agent.vector_store import get_pinecone_vector_store, Retriever
+from backend.research_agent.vector_store import get_retriever
+from backend.research_agent.concurrency import LimitedRunnable, get_provider_limit
 from backend.research_agent.grader import GraderUtils
 from backend.research_agent.graph import GraphState
 from backend.research_agent.generate_chain import create_generate_chain
 from backend.research_agent.nodes import GraphNodes
 from backend.research_agent.edges import GraphEdges
+from backend.research_agent.metrics import MetricsCallbackHandler, instrument_edge, instrument_node
+from backend.research_agent.models import ModelRoles, get_chat_model, resolve_models
+from backend.research_agent.reranker import ResourceReranker
 from langgraph.graph import END, StateGraph
 from fastapi import FastAPI
 from fastapi.responses import RedirectResponse
 from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.runnables import RunnableLambda
 from langchain_core.output_parsers import StrOutputParser
 from dotenv import load_dotenv, find_dotenv
 
 from backend.utils import get_tavily_web_search_tool, get_arxiv_search_tool
 
 
-def compile_graph():
+def _node(name, func, afunc):
+    # Graph nodes run `func` under `invoke` and `afunc` under `ainvoke`, both timed into the node metrics
+    func, afunc = instrument_node(name, func, afunc)
+    return RunnableLambda(func, afunc=afunc, name=func.__name__)
+
+
+def _add_entry(workflow: StateGraph, graph_nodes: GraphNodes, graph_edges: GraphEdges, retrieval_node: str):
+    # Follow-ups of a conversation go straight to generation with the previous turn's resources, or are rewritten into
+    # standalone questions before retrieval, everything else starts with retrieval
+    workflow.add_node("reuse_resources", _node("reuse_resources", graph_nodes.reuse_conversation_resources, graph_nodes.areuse_conversation_resources))
+    workflow.add_node("rewrite_follow_up", _node("rewrite_follow_up", graph_nodes.rewrite_follow_up, graph_nodes.arewrite_follow_up))
+    workflow.set_conditional_entry_point(
+        instrument_edge("start", graph_edges.route_question),
+        {
+            "reuse": "reuse_resources",
+            "rewrite": "rewrite_follow_up",
+            "retrieve": retrieval_node
+        }
+    )
+    workflow.add_edge("reuse_resources", "generate")
+    workflow.add_edge("rewrite_follow_up", retrieval_node)
+
+
+def _compile(workflow: StateGraph):
+    return workflow.compile()
+
+
+def agent_run_config() -> dict:
+    """
+    Config to invoke or stream the agent graph with, so its LLM calls are recorded in the metrics. LLM calls inherit
+    the callbacks of the graph run, including those made from the grading and fan-out threads. They are passed per run
+    rather than bound to the compiled graph, which `astream_events` would drop.
+    """
+    return {"callbacks": [MetricsCallbackHandler()]}
+
+
+def compile_graph(llm=None, retriever=None, web_search_tool=None, paper_search_tool=None, retrieval_mode=None,
+                  models: ModelRoles | None = None, grader_llm=None, rewriter_llm=None,
+                  speculative_generation: bool | None = None):
+    """
+    Builds and compiles the research agent graph. Any component that isn't passed in is created from settings.
+
+    The generator, grader and query rewriter run on the models of `models`, the default tier's by default. A passed
+    `llm` is the generator and also fills the grader and rewriter roles that aren't passed in themselves.
+
+    In "serial" retrieval mode the graph falls back from the vector store to arXiv to the web one search at a time.
+    In "fanout" mode a single node queries all three at once and keeps the highest-priority relevant source.
+
+    With `speculative_generation` (SPECULATIVE_GENERATION by default) the serial graph drafts the answer from the
+    vector store resources while grading them, and generates from the draft when grading keeps them all.
+
+    Every node's duration, the LLM calls and tokens made in it, retries and the branches taken by the edges are
+    recorded in the Prometheus metrics of `backend.research_agent.metrics`.
+    """
+    retrieval_mode = retrieval_mode or settings.RETRIEVAL_MODE
+    if speculative_generation is None:
+        speculative_generation = settings.SPECULATIVE_GENERATION
 
     # Vector Store
-    vector_store = get_pinecone_vector_store()
-    # retriever = vector_store.as_retriever(
-    #     search_type="similarity",
-    #     search_args={"k": 4}
-    # )
-    retriever = Retriever(vector_store=vector_store)
+    if retriever is None:
+        # retriever = vector_store.as_retriever(
+        #     search_type="similarity",
+        #     search_args={"k": 4}
+        # )
+        retriever = get_retriever()
 
     # LLM
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0, openai_api_key=settings.OPENAI_API_KEY)
+    models = models or resolve_models()
+    if grader_llm is None:
+        grader_llm = llm if llm is not None else get_chat_model(models.grader)
+    if rewriter_llm is None:
+        rewriter_llm = llm if llm is not None else get_chat_model(models.rewriter)
+    if llm is None:
+        llm = get_chat_model(models.generator)
 
     # Evaluation - Grader
-    grader = GraderUtils(llm=llm)
+    grader = GraderUtils(llm=grader_llm)
     retrieval_grader = grader.create_retrieval_grader()
+    listwise_grader = grader.create_listwise_retrieval_grader() if settings.GRADER_LISTWISE else None
+    if settings.GRADER_PROVIDER_LIMIT:
+        # Grader calls of concurrent graph runs queue under one provider-wide limit
+        retrieval_grader, listwise_grader = (
+            LimitedRunnable(chain, name, get_provider_limit()) if chain is not None else None
+            for chain, name in ((retrieval_grader, "retrieval_grader"), (listwise_grader, "listwise_grader"))
+        )
 
     # Tools
-    web_search_tool = get_tavily_web_search_tool()
-    paper_search_tool = get_arxiv_search_tool()
+    if web_search_tool is None:
+        web_search_tool = get_tavily_web_search_tool()
+    if paper_search_tool is None:
+        paper_search_tool = get_arxiv_search_tool()
 
     graph_nodes = GraphNodes(
         llm=llm, retriever=retriever, retrieval_grader=retrieval_grader, web_search_tool=web_search_tool,
-        paper_search_tool=paper_search_tool
+        paper_search_tool=paper_search_tool, rewriter_llm=rewriter_llm, grading_concurrency=settings.GRADER_MAX_CONCURRENCY,
+        grading_timeout=settings.GRADER_TIMEOUT_SECONDS, listwise_grader=listwise_grader,
+        context_token_budget=settings.CONTEXT_TOKEN_BUDGET,
+        near_duplicate_threshold=settings.CONTEXT_NEAR_DUPLICATE_THRESHOLD,
+        article_quota=settings.MULTI_ARTICLE_QUOTA,
+        reranker=ResourceReranker(
+            accept_threshold=settings.RERANKER_ACCEPT_THRESHOLD, reject_threshold=settings.RERANKER_REJECT_THRESHOLD,
+            similarity_weight=settings.RERANKER_SIMILARITY_WEIGHT
+        ) if settings.RERANKER_ENABLED else None
+    )
+    graph_edges = GraphEdges(
+        None, None, skip_grading_threshold=settings.SKIP_GRADING_SCORE_THRESHOLD,
+        paper_search_threshold=settings.PAPER_SEARCH_SCORE_THRESHOLD, score_top_n=settings.SCORE_POLICY_TOP_N
     )
-    graph_edges = GraphEdges(None, None)
 
     # Build workflow
     workflow = StateGraph(GraphState)
 
-    workflow.add_node("vector_search", graph_nodes.vector_store_retrieve)
-    workflow.add_node("vector_search_evaluate", graph_nodes.grade_vector_store_documents)
-    workflow.add_node("paper_search", graph_nodes.paper_search)
-    workflow.add_node("paper_search_evaluate", graph_nodes.grade_paper_search_documents)
-    workflow.add_node("web_search", graph_nodes.web_search)
-    workflow.add_node("generate", graph_nodes.generate)
-
-    workflow.set_entry_point("vector_search")
-    workflow.add_edge("vector_search", "vector_search_evaluate")
+    workflow.add_node("generate", _node("generate", graph_nodes.generate, graph_nodes.agenerate))
+
+    if retrieval_mode == "fanout":
+        workflow.add_node("fanout_search", _node("fanout_search", graph_nodes.fanout_search, graph_nodes.afanout_search))
+        _add_entry(workflow, graph_nodes, graph_edges, "fanout_search")
+        workflow.add_edge("fanout_search", "generate")
+        workflow.add_edge("generate", END)
+        return _compile(workflow)
+
+    workflow.add_node("vector_search", _node("vector_search", graph_nodes.vector_store_retrieve, graph_nodes.avector_store_retrieve))
+    if speculative_generation:
+        workflow.add_node("vector_search_evaluate", _node("vector_search_evaluate", graph_nodes.speculative_grade_vector_store_documents, graph_nodes.aspeculative_grade_vector_store_documents))
+    else:
+        workflow.add_node("vector_search_evaluate", _node("vector_search_evaluate", graph_nodes.grade_vector_store_documents, graph_nodes.agrade_vector_store_documents))
+    workflow.add_node("paper_search", _node("paper_search", graph_nodes.paper_search, graph_nodes.apaper_search))
+    workflow.add_node("paper_search_evaluate", _node("paper_search_evaluate", graph_nodes.grade_paper_search_documents, graph_nodes.agrade_paper_search_documents))
+    workflow.add_node("web_search", _node("web_search", graph_nodes.web_search, graph_nodes.aweb_search))
+
+    _add_entry(workflow, graph_nodes, graph_edges, "vector_search")
+    grade_node = "vector_search_evaluate"
+    if graph_nodes.reranker is not None:
+        workflow.add_node("vector_search_rerank", _node("vector_search_rerank", graph_nodes.rerank_vector_store_documents, graph_nodes.arerank_vector_store_documents))
+        workflow.add_edge("vector_search_rerank", "vector_search_evaluate")
+        grade_node = "vector_search_rerank"
+
+    if graph_edges.has_score_policy:
+        workflow.add_conditional_edges(
+            "vector_search",
+            instrument_edge("vector_search", graph_edges.vector_search_decide_to_grade),
+            {
+                "grade": grade_node,
+                "generate": "generate",
+                "paper_search": "paper_search"
+            }
+        )
+    else:
+        workflow.add_edge("vector_search", grade_node)
 
 
     # TODO: Add paper_search back to implementation
@@ -74,7 +190,7 @@ def compile_graph():
     # )
     workflow.add_conditional_edges(
         "vector_search_evaluate",
-        graph_edges.vector_search_decide_to_generate,
+        instrument_edge("vector_search_evaluate", graph_edges.vector_search_decide_to_generate),
         {
             "relevant": "generate",
             "irrelevant": "paper_search"
@@ -83,7 +199,7 @@ def compile_graph():
     workflow.add_edge("paper_search", "paper_search_evaluate")
     workflow.add_conditional_edges(
         "paper_search_evaluate",
-        graph_edges.paper_search_decide_to_generate,
+        instrument_edge("paper_search_evaluate", graph_edges.paper_search_decide_to_generate),
         {
             "relevant": "generate",
             "irrelevant": "web_search"
@@ -91,7 +207,32 @@ def compile_graph():
     )
     workflow.add_edge("web_search", "generate")
     workflow.add_edge("generate", END)
-    return workflow.compile()
-
-
-agent_workflow = compile_graph()
+    return _compile(workflow)
+
+
+_agent_workflows: dict[ModelRoles, Any] = {}
+_agent_workflow_override = None
+_agent_workflow_lock = threading.Lock()
+
+
+def get_agent_workflow(model: str | None = None):
+    """
+    Returns the process-wide agent graph for a request's `model` (see `resolve_models`), compiling it on first use.
+    Graphs are cached per model combination. Building one creates the Pinecone, OpenAI, Tavily and arXiv clients, so
+    it is kept out of import time and the default one can be warmed up explicitly at startup instead.
+    """
+    if _agent_workflow_override is not None:
+        return _agent_workflow_override
+    models = resolve_models(model)
+    if (workflow := _agent_workflows.get(models)) is None:
+        with _agent_workflow_lock:
+            if (workflow := _agent_workflows.get(models)) is None:
+                workflow = _agent_workflows[models] = compile_graph(models=models)
+    return workflow
+
+
+def set_agent_workflow(workflow):
+    """Replaces the agent graph of every model combination, e.g. with one compiled from fake components"""
+    global _agent_workflow_override
+    with _agent_workflow_lock:
+        _agent_workflow_override = workflow
@@ -0,0 +1,66 @@
+import asyncio
+import time
+import weakref
+from functools import lru_cache
+from typing import Any
+
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from backend.config import settings
+from backend.research_agent.metrics import LIMIT_WAIT
+
+
+class ConcurrencyLimit:
+    """
+    A limit on the calls in flight to one LLM provider, shared by every graph of the process.
+
+    asyncio semaphores belong to the event loop they are first used in, so each running loop gets its own.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max(1, max_concurrency)
+        self._semaphores: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore] = weakref.WeakKeyDictionary()
+
+    def semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if (semaphore := self._semaphores.get(loop)) is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+
+@lru_cache
+def get_provider_limit() -> ConcurrencyLimit:
+    return ConcurrencyLimit(settings.LLM_MAX_CONCURRENCY)
+
+
+class LimitedRunnable:
+    """
+    Calls a runnable under a provider-wide concurrency limit, so concurrent graph runs queue for the provider instead
+    of all sending their calls at once. Each call still goes out on its own, in its caller's context where its
+    callbacks and request metrics live: chat models have no batched endpoint, `Runnable.abatch` would only gather one
+    `ainvoke` per input.
+
+    Only async calls are limited. `invoke` goes straight to the runnable, the sync graph bounds its grading calls with
+    its own thread pool (GRADER_MAX_CONCURRENCY per run).
+    """
+
+    def __init__(self, runnable: Runnable, name: str, limit: ConcurrencyLimit):
+        """
+        Args:
+            runnable (Runnable): The chain to call, e.g. the retrieval grader
+            name (str): Name of the runnable in the metrics
+            limit (ConcurrencyLimit): Provider-wide limit on the calls in flight
+        """
+        self.runnable = runnable
+        self.name = name
+        self.limit = limit
+
+    def invoke(self, input: Any, config: RunnableConfig | None = None, **kwargs) -> Any:
+        return self.runnable.invoke(input, config, **kwargs)
+
+    async def ainvoke(self, input: Any, config: RunnableConfig | None = None, **kwargs) -> Any:
+        queued_at = time.perf_counter()
+        # Cancelling the wait, e.g. on a grading timeout, gives up the call's place in the queue
+        async with self.limit.semaphore():
+            LIMIT_WAIT.labels(self.name).observe(time.perf_counter() - queued_at)
+            return await self.runnable.ainvoke(input, config, **kwargs)
@@ -0,0 +1,110 @@
+import logging
+from dataclasses import replace
+from functools import lru_cache
+
+import tiktoken
+
+from backend.cache import normalize_text
+from backend.research_agent.graph import Resource
+
+logger = logging.getLogger(__name__)
+
+# Rough characters per token for English text, used when no tokenizer is available
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache
+def get_encoding(model: str) -> tiktoken.Encoding | None:
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # tiktoken downloads encodings on first use, fall back to estimating when that isn't possible
+        logger.warning(f"Tokenizer for {model} unavailable, estimating token counts: {str(e)}")
+        return None
+
+
+def count_tokens(text: str, model: str) -> int:
+    if (encoding := get_encoding(model)) is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, model: str, max_tokens: int) -> str:
+    if (encoding := get_encoding(model)) is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+
+
+def _shingles(text: str, size: int = 3) -> set[tuple[str, ...]]:
+    words = normalize_text(text).split()
+    if len(words) <= size:
+        return {tuple(words)}
+    return {tuple(words[index:index + size]) for index in range(len(words) - size + 1)}
+
+
+def _jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def pack_context(resources: list[Resource], model: str, token_budget: int,
+                 near_duplicate_threshold: float = 0.9) -> tuple[list[Resource], dict]:
+    """
+    Selects the resources to put in the generation prompt.
+
+    Resources are taken in the order given, which is their relevance order. Exact duplicates (after normalizing case and
+    whitespace) and near duplicates (word 3-gram Jaccard similarity at or above `near_duplicate_threshold` with a
+    resource already kept) are dropped. The rest are kept while they fit in `token_budget`, counted with the tokenizer
+    of `model`. If the most relevant resource alone is over budget it is truncated, so the context is never empty.
+
+    Args:
+        resources (list[Resource]): Candidate resources, most relevant first
+        model (str): Model whose tokenizer is used for counting
+        token_budget (int): Maximum number of tokens across the kept resources
+        near_duplicate_threshold (float): Similarity from which a resource counts as a near duplicate
+
+    Returns:
+        tuple[list[Resource], dict]: The kept resources in order, and stats on what was kept and dropped
+    """
+    stats = {
+        "resources": len(resources), "kept": 0, "exact_duplicates": 0, "near_duplicates": 0, "over_budget": 0,
+        "truncated": 0, "tokens": 0, "dropped_tokens": 0, "token_budget": token_budget,
+    }
+    packed, seen, kept_shingles = [], set(), []
+
+    for resource in resources:
+        text = resource.content
+        key = normalize_text(text)
+        if key in seen:
+            stats["exact_duplicates"] += 1
+            stats["dropped_tokens"] += count_tokens(text, model)
+            continue
+        seen.add(key)
+
+        shingles = _shingles(text)
+        if any(_jaccard(shingles, kept) >= near_duplicate_threshold for kept in kept_shingles):
+            stats["near_duplicates"] += 1
+            stats["dropped_tokens"] += count_tokens(text, model)
+            continue
+
+        tokens = count_tokens(text, model)
+        if stats["tokens"] + tokens > token_budget:
+            if packed:
+                stats["over_budget"] += 1
+                stats["dropped_tokens"] += tokens
+                continue
+            resource = replace(resource, content=truncate_tokens(text, model, token_budget))
+            stats["truncated"] += 1
+            stats["dropped_tokens"] += tokens - token_budget
+            tokens = token_budget
+
+        packed.append(resource)
+        kept_shingles.append(shingles)
+        stats["tokens"] += tokens
+
+    stats["kept"] = len(packed)
+    return packed, stats
@@ -1,10 +1,81 @@
 from backend.research_agent import GraphState
+from backend.research_agent.nodes import format_resources
 
 
 class GraphEdges:
-    def __init__(self, hallucination_grader, code_evaluator):
+    def __init__(self, hallucination_grader, code_evaluator, skip_grading_threshold: float | None = None,
+                 paper_search_threshold: float | None = None, score_top_n: int = 3):
+        """
+        Args:
+            hallucination_grader: Grader checking a generation is grounded in its resources
+            code_evaluator: Grader checking a generation answers the question
+            skip_grading_threshold (float): Similarity the top `score_top_n` vector store resources must all reach to
+                generate from them without grading, None to always grade
+            paper_search_threshold (float): Similarity every vector store resource must fall below to go straight to
+                paper search without grading, None to always grade
+            score_top_n (int): Number of top-scored resources checked against `skip_grading_threshold`
+        """
         self.hallucination_grader = hallucination_grader
         self.code_evaluator = code_evaluator
+        self.skip_grading_threshold = skip_grading_threshold
+        self.paper_search_threshold = paper_search_threshold
+        self.score_top_n = score_top_n
+
+    @property
+    def has_score_policy(self) -> bool:
+        return self.skip_grading_threshold is not None or self.paper_search_threshold is not None
+
+    def route_question(self, state: GraphState):
+        """
+        Decides where a question enters the graph.
+
+        Args:
+            state (dict): The current graph state
+
+        Returns:
+            str: "reuse" for follow-ups answered from the previous turn's resources, "rewrite" for follow-ups to rewrite
+                before retrieval, "retrieve" otherwise
+        """
+        match state.get("follow_up"):
+            case "reuse" if state.get("resources"):
+                print("---DECISION: FOLLOW-UP, REUSE PREVIOUS RESOURCES---")
+                return "reuse"
+            case "reuse" | "rewrite":
+                print("---DECISION: FOLLOW-UP, REWRITE QUESTION---")
+                return "rewrite"
+            case _:
+                return "retrieve"
+
+    def vector_search_decide_to_grade(self, state: GraphState):
+        """
+        Decides from the vector store similarity scores whether the resources need grading at all.
+
+        Args:
+            state (dict): The current graph state
+
+        Returns:
+            str: "generate" when the top scores clear the skip threshold, "paper_search" when there are no resources
+                or every score is below the paper search threshold, "grade" otherwise
+        """
+        resources = state["resources"]
+        if len(resources) < 1:
+            print("---DECISION: NO VECTOR STORE RESOURCES, PAPER SEARCH---")
+            return "paper_search"
+
+        # Resources found only by lexical search have no similarity, decide from the others
+        scores = sorted((resource.score for resource in resources if resource.score is not None), reverse=True)
+        if not scores:
+            return "grade"
+
+        top_scores = scores[:self.score_top_n]
+        if self.skip_grading_threshold is not None and len(top_scores) == min(self.score_top_n, len(resources)) \
+                and top_scores[-1] >= self.skip_grading_threshold:
+            print("---DECISION: VECTOR STORE SCORES ARE HIGH, GENERATE WITHOUT GRADING---")
+            return "generate"
+        if self.paper_search_threshold is not None and len(scores) == len(resources) and scores[0] < self.paper_search_threshold:
+            print("---DECISION: VECTOR STORE SCORES ARE LOW, PAPER SEARCH WITHOUT GRADING---")
+            return "paper_search"
+        return "grade"
 
     def vector_search_decide_to_generate(self, state: GraphState):
         resources = state["resources"]
@@ -46,37 +117,51 @@ class GraphEdges:
             print("---DECISION: GENERATE---")
             return "generate"
 
-    def grade_generation_v_documents_and_question(self, state):
+    def grade_generation_v_documents_and_question(self, state: GraphState):
         """
-        Determines whether the generation is grounded in the document and answers question.
+        Determines whether the generation is grounded in the resources and answers the prompt.
 
         Args:
             state (dict): The current graph state
 
         Returns:
-            str: Decision for next node to call
+            str: "useful" when it is both, "not useful" when it is grounded but doesn't answer the prompt, and
+                "not supported" when it isn't grounded
         """
         print("---CHECK HALLUCINATIONS---")
-        question = state["input"]
-        documents = state["documents"]
+        documents = format_resources(state["resources"])
         generation = state["generation"]
 
         score = self.hallucination_grader.invoke({"documents": documents, "generation": generation})
-        grade = score["score"]
+        if not self._grounded(score):
+            return "not supported"
+        score = self.code_evaluator.invoke({"input": state["prompt"], "generation": generation, "documents": documents})
+        return self._useful(score)
+
+    async def agrade_generation_v_documents_and_question(self, state: GraphState):
+        print("---CHECK HALLUCINATIONS---")
+        documents = format_resources(state["resources"])
+        generation = state["generation"]
 
-        # Check hallucination
-        if grade == "yes":
+        score = await self.hallucination_grader.ainvoke({"documents": documents, "generation": generation})
+        if not self._grounded(score):
+            return "not supported"
+        score = await self.code_evaluator.ainvoke({"input": state["prompt"], "generation": generation, "documents": documents})
+        return self._useful(score)
+
+    @staticmethod
+    def _grounded(score: dict) -> bool:
+        if str(score.get("score", "")).strip().lower() == "yes":
             print("---DECISION: GENERATION IS GROUNDED IN DOCUMENTS---")
-            # Check question-answering
-            print("---GRADE GENERATION vs QUESTION---")
-            score = self.code_evaluator.invoke({"input": question, "generation": generation, "documents": documents})
-            grade = score["score"]
-            if grade == "yes":
-                print("---DECISION: GENERATION ADDRESSES QUESTION---")
-                return "useful"
-            else:
-                print("---DECISION: GENERATION DOES NOT ADDRESS QUESTION---")
-                return "not useful"
-        else:
-            print("---DECISION: GENERATIONS ARE HALLUCINATED, RE-TRY---")
-            return "not supported"
\ No newline at end of file
+            return True
+        print("---DECISION: GENERATIONS ARE HALLUCINATED, RE-TRY---")
+        return False
+
+    @staticmethod
+    def _useful(score: dict) -> str:
+        print("---GRADE GENERATION vs QUESTION---")
+        if str(score.get("score", "")).strip().lower() == "yes":
+            print("---DECISION: GENERATION ADDRESSES QUESTION---")
+            return "useful"
+        print("---DECISION: GENERATION DOES NOT ADDRESS QUESTION---")
+        return "not useful"
@@ -16,13 +16,15 @@ def create_generate_chain(llm):
     
     Context:
     Documents: {resources}
-    
+    {history}
     Question:
     {prompt}
     
     Answer:  """
 
-    generate_prompt = PromptTemplate(template=generate_template, input_variables=["prompt", "resources"])
+    # `history` is the conversation a follow-up question belongs to, if any
+    generate_prompt = PromptTemplate(template=generate_template, input_variables=["prompt", "resources"],
+                                     partial_variables={"history": ""})
 
     # Create the generate chain
     generate_chain = generate_prompt | llm | StrOutputParser()
@@ -34,6 +34,65 @@ class GraderUtils:
 
         return retriever_grader
 
+    def create_listwise_retrieval_grader(self):
+        """
+        Creates a listwise retrieval grader that assesses the relevance of every retrieved document to a user question
+        in a single call.
+
+        Returns:
+            A callable function that takes a numbered list of documents and a question as input and returns a JSON object mapping each document number to a binary score.
+        """
+        grade_prompt = PromptTemplate(
+            template="""You are an evaluator tasked with determining whether each of the numbered retrieved documents matches the user prompt. Your role is to analyze every document for keywords relevant to the user prompt, and grade it as relevant.
+            Return a binary score of "yes" if a document matches the user prompt and "no" if it does not match. Format the scores in JSON with one key per document number, e.g. {{"1": "yes", "2": "no"}}, covering every document and with no preamble or explanation.
+
+            Context:
+            Retrieved Documents:
+            {resources}
+
+            User Prompt: {prompt}
+
+            Question:
+            Does each retrieved document match the user prompt?
+
+            Answer:
+            """,
+            input_variables=["resources", "prompt"],
+        )
+
+        listwise_grader = grade_prompt | self.llm | JsonOutputParser()
+
+        return listwise_grader
+
+    @staticmethod
+    def parse_listwise_scores(scores, count: int) -> list[bool] | None:
+        """
+        Validates the output of the listwise retrieval grader.
+
+        Args:
+            scores: The parsed JSON returned by the listwise grader
+            count (int): The number of documents that were graded
+
+        Returns:
+            list[bool] | None: Relevance of each document in order, or None if the output does not score exactly documents 1 to `count` with "yes"/"no"
+        """
+        if not isinstance(scores, dict):
+            return None
+
+        grades = {}
+        for key, value in scores.items():
+            try:
+                index = int(key)
+            except (TypeError, ValueError):
+                return None
+            if not isinstance(value, str) or value.strip().lower() not in ("yes", "no"):
+                return None
+            grades[index] = value.strip().lower() == "yes"
+
+        if sorted(grades) != list(range(1, count + 1)):
+            return None
+        return [grades[index] for index in range(1, count + 1)]
+
     def create_hallucination_grader(self):
         """
         Creates a hallucination grader that assesses whether an answer is grounded in/supported by a set of facts.
@@ -90,6 +149,29 @@ class GraderUtils:
 
         return code_evaluator
 
+    def create_follow_up_rewriter(self):
+        """
+        Creates a rewriter that turns a follow-up question into a standalone question, using the conversation so far.
+
+        Returns:
+            A callable function that takes the conversation history and a follow-up question as input and returns the standalone question.
+        """
+        rewrite_prompt = PromptTemplate(
+            template="""You are given a conversation about research papers and a follow-up question. Rewrite the follow-up question as a standalone question that can be understood, and searched for, without the conversation. Resolve every reference to the conversation, such as "it", "that" or "the second point", to what it refers to.
+            Return only the standalone question, with no preamble or explanation.
+
+            Conversation:
+            {history}
+
+            Follow-up Question: {prompt}
+
+            Standalone Question:
+            """,
+            input_variables=["history", "prompt"],
+        )
+
+        return rewrite_prompt | self.llm | StrOutputParser()
+
     def create_question_rewriter(self):
         """
         Creates a question rewriter chain that rewrites a given question to improve its clarity and relevance.
@@ -9,6 +9,28 @@ class GraphStep(TypedDict):
     step_name: str
 
 
+@dataclass
+class Resource:
+    """
+    A retrieved passage with where it came from. Formats as its content, so resources can go straight into prompts.
+
+    Attributes:
+        content: The passage text.
+        source: The retrieval source, "vector_store", "paper_search" or "web_search".
+        score: Similarity to the prompt as reported by the source, None if it doesn't report one.
+        node_id: Identifier of the passage at the source: the chunk's node id, the arXiv entry id or the web page URL.
+        article_id: The article a vector store passage belongs to.
+    """
+    content: str
+    source: str
+    score: float | None = None
+    node_id: str | None = None
+    article_id: str | None = None
+
+    def __str__(self) -> str:
+        return self.content
+
+
 class GraphState(TypedDict):
     """
     Represents the state of our graph.
@@ -16,18 +38,37 @@ class GraphState(TypedDict):
     Attributes:
         prompt: The prompt that was used to generate the response.
         generation: LLM generation
-        resources: A list of resources that were used to generate the response.
+        resources: A list of resources (Resource) that were used to generate the response.
         steps: A list of steps that were taken to generate the response.
         web_search_performed: A list of web searches that were performed during the execution of the graph.
         paper_search_performed: A list of research paper searches that were performed during the execution of the graph.
+        retrieval_source: The source the resources came from when retrieving in fan-out mode.
+        context_stats: What context packing kept and dropped from the resources before generation.
+        resource_grades: Relevance decided by the reranker for each resource, None where it left it to the grader.
+        grader_calls_avoided: Resources graded by the reranker instead of an LLM grader call.
+        article_ids: The articles a multi-article question is about, searched instead of `article_id` when set.
+        history: The conversation a follow-up question belongs to, given to the generator (and rewriter) when set.
+        follow_up: How a follow-up question is answered, "reuse" the resources passed in or "rewrite" it and retrieve.
+        draft_generation: Answer drafted from the vector store resources while they were graded, kept when grading kept
+            every resource.
+        speculation: Whether the draft was kept and the latency it saved, when drafting speculatively.
     """
     prompt: str
     generation: str
-    resources: list
+    resources: list[Resource]
     steps: list[str]
     perform_web_search: bool
     perform_paper_search: bool
     article_id: str
+    retrieval_source: str
+    context_stats: dict
+    resource_grades: list[bool | None]
+    grader_calls_avoided: int
+    article_ids: list[str]
+    history: str
+    follow_up: str
+    draft_generation: str | None
+    speculation: dict
 
 
 class Steps(StrEnum):
@@ -37,3 +78,6 @@ class Steps(StrEnum):
     PAPER_SEARCH_EVALUATION: str = "paper_search_evaluation"
     WEB_SEARCH_RETRIEVAL: str = "web_search_retrieval"
     LLM_GENERATION: str = "llm_generation"
+    ARTICLE_DIGEST: str = "article_digest"
+    CONVERSATION_REUSE: str = "conversation_reuse"
+    FOLLOW_UP_REWRITE: str = "follow_up_rewrite"
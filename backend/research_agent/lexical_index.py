@@ -0,0 +1,283 @@
+"""
+BM25 lexical index of the article chunks, and its publication on S3.
+
+Only depends on numpy and botocore: the PDF indexing DAG, which runs without the backend package, imports this module as
+`lexical_index` (it is mounted into the Airflow containers, see docker-compose-airflow.yaml) to build and publish the
+index the backend searches.
+"""
+import json
+import logging
+import math
+import os
+import re
+import tempfile
+from collections import Counter
+from typing import Hashable
+
+import numpy as np
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+BM25_FILE = "bm25.json"
+TEXTS_FILE = "texts.jsonl"
+# Holds the version of the latest published index, next to the prefixes of every published version
+LATEST_FILE = "LATEST"
+
+# Words, keeping hyphenated and dotted names such as "gpt-4o", "bert-base" or "v1.5" together
+TOKEN_PATTERN = re.compile(r"\w+(?:[-.]\w+)*")
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Case-folded terms of `text`. Compound names are indexed whole and as their parts, so "GPT-4o" matches both "gpt-4o"
+    and "gpt".
+    """
+    terms = []
+    for term in TOKEN_PATTERN.findall(text.casefold()):
+        terms.append(term)
+        if "-" in term or "." in term:
+            terms.extend(re.split(r"[-.]", term))
+    return terms
+
+
+def reciprocal_rank_fusion(rankings: list[list[Hashable]], k: int = 60) -> list[Hashable]:
+    """
+    Merges rankings by summing 1 / (k + rank) for every ranking an item appears in.
+
+    Args:
+        rankings (list[list[Hashable]]): Rankings to merge, best first
+        k (int): Damping constant, higher values flatten the contribution of the top ranks
+
+    Returns:
+        list[Hashable]: Every item across the rankings, best fused score first
+    """
+    scores = Counter()
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] += 1 / (k + rank)
+    return [item for item, _ in scores.most_common()]
+
+
+def build_bm25(texts: list[str], articles: dict[str, tuple[int, int]], k1: float = 1.5, b: float = 0.75) -> dict:
+    """
+    Builds the contents of bm25.json: each article's postings, document lengths and IDF over its rows.
+
+    Args:
+        texts (list[str]): Chunk texts, rows grouped by article
+        articles (dict[str, tuple[int, int]]): Each article's [start, end) row range
+        k1 (float): Term frequency saturation
+        b (float): Document length normalization
+
+    Returns:
+        dict: The index, as stored in bm25.json
+    """
+    data = {"k1": k1, "b": b, "articles": {}}
+    for article_id, (start, end) in articles.items():
+        postings, lengths = {}, []
+        for index, text in enumerate(texts[start:end]):
+            terms = tokenize(text)
+            lengths.append(len(terms))
+            for term, frequency in Counter(terms).items():
+                postings.setdefault(term, ([], []))
+                postings[term][0].append(index)
+                postings[term][1].append(frequency)
+
+        count = end - start
+        data["articles"][article_id] = {
+            "start": start,
+            "lengths": lengths,
+            "average_length": (sum(lengths) / count if count else 0) or 1,
+            "postings": {
+                term: (math.log(1 + (count - len(rows) + 0.5) / (len(rows) + 0.5)), rows, frequencies)
+                for term, (rows, frequencies) in postings.items()
+            },
+        }
+    return data
+
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index over the chunks of each article, stored next to the local vector index.
+
+    Rows are numbered like the rows of texts.jsonl, and each article keeps its own postings, document lengths and IDF,
+    since every search is scoped to one article.
+    """
+
+    def __init__(self, directory: str, node_ids: list[str] | None = None, texts: list[str] | None = None):
+        """
+        Args:
+            directory (str): Index directory
+            node_ids (list[str]): Node ids of the rows, read from texts.jsonl when not passed
+            texts (list[str]): Texts of the rows, read from texts.jsonl when not passed
+        """
+        with open(os.path.join(directory, BM25_FILE)) as f:
+            data = json.load(f)
+        self.k1: float = data["k1"]
+        self.b: float = data["b"]
+        self.articles: dict[str, dict] = data["articles"]
+
+        if node_ids is None or texts is None:
+            node_ids, texts = [], []
+            with open(os.path.join(directory, TEXTS_FILE)) as f:
+                for line in f:
+                    row = json.loads(line)
+                    node_ids.append(row["node_id"])
+                    texts.append(row["text"])
+        self.node_ids = node_ids
+        self.texts = texts
+
+    def search(self, query: str, article_id: str, top_k: int = 5) -> list[tuple[int, float]]:
+        """
+        Finds the chunks of an article that best match the terms of a query.
+
+        Args:
+            query (str): Query text
+            article_id (str): Article to search in
+            top_k (int): Maximum number of chunks to return
+
+        Returns:
+            list[tuple[int, float]]: Row numbers and BM25 scores of the matching chunks, best first
+        """
+        article = self.articles.get(article_id)
+        if article is None or top_k <= 0:
+            return []
+
+        lengths = np.asarray(article["lengths"], dtype=np.float32)
+        norm = self.k1 * (1 - self.b + self.b * lengths / article["average_length"])
+        scores = np.zeros(len(lengths), dtype=np.float32)
+        for term in set(tokenize(query)):
+            if (posting := article["postings"].get(term)) is None:
+                continue
+            idf, rows, frequencies = posting
+            rows, frequencies = np.asarray(rows), np.asarray(frequencies, dtype=np.float32)
+            scores[rows] += idf * frequencies * (self.k1 + 1) / (frequencies + norm[rows])
+
+        matched = np.flatnonzero(scores)
+        top = matched[np.argsort(-scores[matched])[:top_k]]
+        return [(article["start"] + int(index), float(scores[index])) for index in top]
+
+    @classmethod
+    def build(cls, texts: list[str], articles: dict[str, tuple[int, int]], directory: str, node_ids: list[str] | None = None,
+              k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        """
+        Writes the BM25 index of the given chunks to `directory` and opens it.
+
+        Args:
+            texts (list[str]): Chunk texts, rows grouped by article
+            articles (dict[str, tuple[int, int]]): Each article's [start, end) row range
+            directory (str): Index directory, where texts.jsonl is expected to hold the same rows
+            node_ids (list[str]): Node ids of the rows, to avoid reading texts.jsonl back
+            k1 (float): Term frequency saturation
+            b (float): Document length normalization
+
+        Returns:
+            BM25Index: The built index
+        """
+        data = build_bm25(texts, articles, k1=k1, b=b)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, BM25_FILE), "w") as f:
+            json.dump(data, f)
+
+        logger.info(f"Built BM25 index for {len(articles)} articles in {directory}")
+        return cls(directory, node_ids=node_ids, texts=texts)
+
+
+def merge_chunks(rows: list[dict], chunks: list[dict]) -> list[dict]:
+    """
+    Replaces the rows of the articles that `chunks` belong to with them, keeping the rows of every other article.
+
+    Args:
+        rows (list[dict]): {"article_id", "node_id", "text"} rows of the published index
+        chunks (list[dict]): Chunks of the articles indexed since, with the same keys
+
+    Returns:
+        list[dict]: The merged rows, grouped by article
+    """
+    reindexed = {chunk["article_id"] for chunk in chunks}
+    merged = [row for row in rows if row["article_id"] not in reindexed] + list(chunks)
+    # Stable, chunks keep their order within an article
+    return sorted(merged, key=lambda row: row["article_id"])
+
+
+def article_ranges(rows: list[dict]) -> dict[str, tuple[int, int]]:
+    """Each article's [start, end) row range in rows grouped by article"""
+    articles = {}
+    for index, row in enumerate(rows):
+        start, _ = articles.get(row["article_id"], (index, index))
+        articles[row["article_id"]] = (start, index + 1)
+    return articles
+
+
+def _published_version(s3_client, bucket: str, prefix: str) -> str | None:
+    try:
+        response = s3_client.get_object(Bucket=bucket, Key=f"{prefix}/{LATEST_FILE}")
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+            return None
+        raise
+    return response["Body"].read().decode("utf-8").strip()
+
+
+def publish_index(s3_client, bucket: str, prefix: str, chunks: list[dict], version: str) -> str:
+    """
+    Merges chunks into the index published on S3 under `prefix` (see `merge_chunks`) and publishes the result as
+    `version`. Each version's texts.jsonl and bm25.json are written under their own prefix and LATEST is pointed at it
+    last, so readers never mix the files of two versions.
+
+    Args:
+        s3_client: boto3 S3 client
+        bucket (str): S3 bucket
+        prefix (str): Key prefix of the index
+        chunks (list[dict]): {"article_id", "node_id", "text"} chunks of the articles indexed since the last version
+        version (str): Name of the new version, such as the indexing run's timestamp
+
+    Returns:
+        str: Key prefix of the new version
+    """
+    rows = []
+    if (published := _published_version(s3_client, bucket, prefix)) is not None:
+        response = s3_client.get_object(Bucket=bucket, Key=f"{prefix}/{published}/{TEXTS_FILE}")
+        rows = [json.loads(line) for line in response["Body"].read().decode("utf-8").splitlines() if line.strip()]
+    rows = merge_chunks(rows, chunks)
+
+    version_prefix = f"{prefix}/{version}"
+    s3_client.put_object(
+        Bucket=bucket, Key=f"{version_prefix}/{TEXTS_FILE}", Body="".join(json.dumps(row) + "\n" for row in rows),
+        ContentType="application/x-ndjson"
+    )
+    s3_client.put_object(
+        Bucket=bucket, Key=f"{version_prefix}/{BM25_FILE}",
+        Body=json.dumps(build_bm25([row["text"] for row in rows], article_ranges(rows))), ContentType="application/json"
+    )
+    s3_client.put_object(Bucket=bucket, Key=f"{prefix}/{LATEST_FILE}", Body=version, ContentType="text/plain")
+    logger.info(f"Published BM25 index {version} with {len(rows)} chunks to s3://{bucket}/{version_prefix}")
+    return version_prefix
+
+
+def fetch_index(s3_client, bucket: str, prefix: str, directory: str) -> str:
+    """
+    Downloads the latest version of the index published under `prefix` to `directory`. Its files are only replaced
+    once both are downloaded, so a failed download leaves the previous copy whole.
+
+    Args:
+        s3_client: boto3 S3 client
+        bucket (str): S3 bucket
+        prefix (str): Key prefix of the index
+        directory (str): Directory to download the index to
+
+    Returns:
+        str: The downloaded version
+
+    Raises:
+        FileNotFoundError: When no index was published
+    """
+    if (version := _published_version(s3_client, bucket, prefix)) is None:
+        raise FileNotFoundError(f"No BM25 index was published to s3://{bucket}/{prefix}")
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=directory) as download_dir:
+        for filename in (TEXTS_FILE, BM25_FILE):
+            s3_client.download_file(bucket, f"{prefix}/{version}/{filename}", os.path.join(download_dir, filename))
+        for filename in (TEXTS_FILE, BM25_FILE):
+            os.replace(os.path.join(download_dir, filename), os.path.join(directory, filename))
+    return version
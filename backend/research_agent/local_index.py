@@ -0,0 +1,172 @@
+import argparse
+import json
+import logging
+import os
+from collections import defaultdict
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from backend.config import settings
+from backend.research_agent.graph import Resource
+from backend.research_agent.lexical_index import TEXTS_FILE, BM25Index
+from backend.research_agent.vector_store import Retriever
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+EMBEDDINGS_FILE = "embeddings.npy"
+
+
+class LocalVectorIndex:
+    """
+    In-process replacement for the Pinecone index, searched with NumPy.
+
+    All chunk embeddings live in one float32 matrix, L2-normalized so a dot product is the cosine similarity, with the
+    rows of each article stored contiguously. The matrix is memory-mapped, so only the pages of the articles that are
+    actually queried are read from disk, and a search scores a single article's slice.
+
+    Layout of `directory`:
+        manifest.json   Embedding dimension and each article's [start, end) row range
+        embeddings.npy  The embedding matrix
+        texts.jsonl     One {"node_id", "text"} object per row
+        bm25.json       BM25 index of the same rows, see BM25Index
+    """
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        self.directory = directory
+        self.dimension: int = manifest["dimension"]
+        self.articles: dict[str, tuple[int, int]] = {article_id: (start, end) for article_id, (start, end) in manifest["articles"].items()}
+        self.embeddings = np.load(os.path.join(directory, EMBEDDINGS_FILE), mmap_mode="r")
+
+        self.node_ids, self.texts = [], []
+        with open(os.path.join(directory, TEXTS_FILE)) as f:
+            for line in f:
+                row = json.loads(line)
+                self.node_ids.append(row["node_id"])
+                self.texts.append(row["text"])
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def search(self, embedding: list[float], article_id: str, top_k: int = 5) -> list[tuple[int, float]]:
+        """
+        Finds the chunks of an article most similar to a query embedding.
+
+        Args:
+            embedding (list[float]): Query embedding
+            article_id (str): Article to search in
+            top_k (int): Number of chunks to return
+
+        Returns:
+            list[tuple[int, float]]: Row numbers and cosine similarities of the best chunks, most similar first
+        """
+        if article_id not in self.articles or top_k <= 0:
+            return []
+        start, end = self.articles[article_id]
+
+        query = np.asarray(embedding, dtype=np.float32)
+        # Not in place, `embedding` may be a float32 array the caller keeps, such as a cached query embedding
+        query = query / (np.linalg.norm(query) or 1.0)
+        scores = self.embeddings[start:end] @ query
+
+        top_k = min(top_k, end - start)
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+        return [(start + int(index), float(scores[index])) for index in top]
+
+    @classmethod
+    def build(cls, records: Iterable[dict], directory: str) -> "LocalVectorIndex":
+        """
+        Writes an index, along with the BM25 index of the same chunks, to `directory` and opens it.
+
+        Args:
+            records (Iterable[dict]): Chunks with "article_id", "node_id", "text" and "embedding" keys
+            directory (str): Directory to write the index files to, created if missing
+
+        Returns:
+            LocalVectorIndex: The built index
+        """
+        by_article = defaultdict(list)
+        for record in records:
+            by_article[record["article_id"]].append(record)
+        rows = [record for article_records in by_article.values() for record in article_records]
+        if not rows:
+            raise ValueError("Cannot build a local vector index without records")
+
+        embeddings = np.asarray([record["embedding"] for record in rows], dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings /= np.where(norms == 0, 1.0, norms)
+
+        articles, start = {}, 0
+        for article_id, article_records in by_article.items():
+            articles[article_id] = (start, start + len(article_records))
+            start += len(article_records)
+
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, EMBEDDINGS_FILE), embeddings)
+        with open(os.path.join(directory, TEXTS_FILE), "w") as f:
+            for record in rows:
+                f.write(json.dumps({"node_id": record["node_id"], "text": record["text"]}) + "\n")
+        BM25Index.build([record["text"] for record in rows], articles, directory,
+                        node_ids=[record["node_id"] for record in rows])
+        # Written last, so a half-written index fails to open instead of serving stale rows
+        with open(os.path.join(directory, MANIFEST_FILE), "w") as f:
+            json.dump({"dimension": embeddings.shape[1], "articles": articles}, f)
+
+        logger.info(f"Built local vector index with {len(rows)} chunks from {len(articles)} articles in {directory}")
+        return cls(directory)
+
+
+def load_exported_chunks(paths: Iterable[str]) -> Iterator[dict]:
+    """
+    Reads the chunk exports written by the PDF indexing DAG, one JSON object per line. When a chunk appears in
+    several exports the last one wins, so re-indexed articles replace their old chunks.
+    """
+    chunks = {}
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    chunk = json.loads(line)
+                    chunks[chunk["node_id"]] = chunk
+    yield from chunks.values()
+
+
+class LocalRetriever(Retriever):
+    """Retriever backed by a LocalVectorIndex instead of Pinecone"""
+
+    def __init__(self, index: LocalVectorIndex, embed_model, **kwargs):
+        """
+        Args:
+            index (LocalVectorIndex): Index to search
+            embed_model (BaseEmbedding): Model used to embed queries, must match the one the index was built with
+            **kwargs: Search options of Retriever, such as `top_k` and `mode`
+        """
+        super().__init__(vector_store=index, embed_model=embed_model, pool_size=0, **kwargs)
+        self.index = index
+
+    def _dense_search(self, query, article_id) -> list[tuple[str, str, float]]:
+        matches = self.index.search(self.embed_query(query), article_id, self.candidates)
+        return [(self.index.node_ids[row], self.index.texts[row], score) for row, score in matches]
+
+    async def asearch(self, query, article_id) -> list[Resource]:
+        # Only the query embedding is I/O, the search itself is in memory, so embed first and then search inline
+        await self.aembed_query(query)
+        return self.search(query, article_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the local vector index from PDF indexing DAG exports")
+    parser.add_argument("exports", nargs="+", help="Chunk export files (.jsonl) written by the DAG")
+    parser.add_argument("--out", default=settings.LOCAL_INDEX_DIR, help="Index directory")
+    args = parser.parse_args()
+
+    index = LocalVectorIndex.build(load_exported_chunks(args.exports), args.out)
+    print(f"Indexed {len(index)} chunks from {len(index.articles)} articles into {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+import contextvars
+import functools
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+from uuid import UUID
+
+import httpx
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from prometheus_client import Counter, Histogram
+
+from backend.rate_limiter import rate_limited_http_clients
+
+NODE_DURATION = Histogram(
+    "research_agent_node_duration_seconds", "Time spent in each graph node", ["node"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+NODE_RUNS = Counter("research_agent_node_runs", "Graph node runs", ["node", "status"])
+LLM_CALLS = Counter("research_agent_llm_calls", "LLM calls", ["node", "model"])
+LLM_TOKENS = Counter("research_agent_llm_tokens", "LLM tokens", ["node", "model", "kind"])
+LLM_COST = Counter("research_agent_llm_cost_usd", "Estimated LLM cost in USD", ["node", "model"])
+RETRIES = Counter("research_agent_retries", "Retried or fallen back calls", ["node", "kind"])
+EDGE_DECISIONS = Counter("research_agent_edge_decisions", "Branches taken by the graph edges", ["edge", "decision"])
+QA_REQUESTS = Counter("research_agent_qa_requests", "Q/A requests by how they were answered", ["outcome"])
+SPECULATIONS = Counter(
+    "research_agent_speculative_generations", "Answers drafted while grading, by whether the draft was kept", ["outcome"]
+)
+SPECULATION_SAVED = Counter("research_agent_speculation_saved_seconds", "Latency saved by kept speculative drafts")
+# The cost side of speculation: drafts drafted in a thread can't be interrupted and always generate in full
+SPECULATION_WASTED = Counter(
+    "research_agent_speculation_wasted_seconds", "Generation time spent on discarded speculative drafts"
+)
+VERIFICATIONS = Counter("research_agent_verifications", "Background grounding and relevance checks of answers by verdict", ["status"])
+LIMIT_WAIT = Histogram(
+    "research_agent_llm_limit_wait_seconds", "Time LLM calls wait for the provider-wide concurrency limit", ["runnable"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+
+# USD per million prompt and completion tokens
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+
+# Responses the OpenAI client retries
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+_current_node: contextvars.ContextVar[str] = contextvars.ContextVar("current_node", default="unknown")
+_request_metrics: contextvars.ContextVar["RequestMetrics | None"] = contextvars.ContextVar("request_metrics", default=None)
+
+
+def llm_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    # Match dated snapshots such as "gpt-4o-mini-2024-07-18", longest name first so gpt-4o-mini isn't priced as gpt-4o
+    for name in sorted(MODEL_PRICES, key=len, reverse=True):
+        if model.startswith(name):
+            prompt_price, completion_price = MODEL_PRICES[name]
+            return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+    return 0.0
+
+
+class RequestMetrics:
+    """Per-request totals of everything recorded in Prometheus while the request's graph runs"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        # Set when the request ends
+        self.duration_seconds: float | None = None
+        self.nodes: dict[str, dict] = defaultdict(lambda: {"runs": 0, "seconds": 0.0})
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost_usd = 0.0
+        self.retries: dict[str, int] = defaultdict(int)
+        self.decisions: dict[str, str] = {}
+        # Answered by a graph run another request started
+        self.coalesced = False
+        # Nodes, grader threads and fan-out tasks of the same request record concurrently
+        self._lock = threading.Lock()
+
+    def summary(self) -> dict:
+        # Requests that report their metrics before they end, like streamed ones, report the time so far
+        duration = self.duration_seconds if self.duration_seconds is not None else time.perf_counter() - self.started_at
+        with self._lock:
+            return {
+                "duration_seconds": round(duration, 4),
+                "nodes": {node: {"runs": stats["runs"], "seconds": round(stats["seconds"], 4)} for node, stats in self.nodes.items()},
+                "llm_calls": self.llm_calls,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "cost_usd": round(self.cost_usd, 6),
+                "retries": dict(self.retries),
+                "decisions": dict(self.decisions),
+                "coalesced": self.coalesced,
+            }
+
+
+@contextmanager
+def track_request() -> Iterator[RequestMetrics]:
+    """Collects the metrics recorded in this context, including the tasks and context-copying threads it starts"""
+    metrics = RequestMetrics()
+    token = _request_metrics.set(metrics)
+    try:
+        yield metrics
+    finally:
+        metrics.duration_seconds = time.perf_counter() - metrics.started_at
+        try:
+            _request_metrics.reset(token)
+        except ValueError:
+            # An async generator tracking a request can be closed from another context than the one it started in
+            pass
+
+
+def record_node(node: str, seconds: float, status: str):
+    NODE_DURATION.labels(node).observe(seconds)
+    NODE_RUNS.labels(node, status).inc()
+    if (metrics := _request_metrics.get()) is not None:
+        with metrics._lock:
+            metrics.nodes[node]["runs"] += 1
+            metrics.nodes[node]["seconds"] += seconds
+
+
+def record_llm_call(model: str, prompt_tokens: int, completion_tokens: int, node: str | None = None):
+    node = node or _current_node.get()
+    cost = llm_cost(model, prompt_tokens, completion_tokens)
+    LLM_CALLS.labels(node, model).inc()
+    LLM_TOKENS.labels(node, model, "prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels(node, model, "completion").inc(completion_tokens)
+    LLM_COST.labels(node, model).inc(cost)
+    if (metrics := _request_metrics.get()) is not None:
+        with metrics._lock:
+            metrics.llm_calls += 1
+            metrics.prompt_tokens += prompt_tokens
+            metrics.completion_tokens += completion_tokens
+            metrics.cost_usd += cost
+
+
+def record_retry(kind: str, node: str | None = None):
+    RETRIES.labels(node or _current_node.get(), kind).inc()
+    if (metrics := _request_metrics.get()) is not None:
+        with metrics._lock:
+            metrics.retries[kind] += 1
+
+
+def record_decision(edge: str, decision: str):
+    EDGE_DECISIONS.labels(edge, decision).inc()
+    if (metrics := _request_metrics.get()) is not None:
+        with metrics._lock:
+            metrics.decisions[edge] = decision
+
+
+def record_qa_request(outcome: str):
+    """
+    Counts a Q/A request as "cached", "digest" (answered from the article's digest), "executed" (ran the graph),
+    "coalesced" (shared another request's run) or "follow_up" (ran the graph as a follow-up in a conversation)
+    """
+    QA_REQUESTS.labels(outcome).inc()
+    if outcome == "coalesced" and (metrics := _request_metrics.get()) is not None:
+        metrics.coalesced = True
+
+
+def instrument_node(node: str, func: Callable, afunc: Callable) -> tuple[Callable, Callable]:
+    """Wraps a node's sync and async implementations to record their duration and outcome under `node`"""
+
+    @functools.wraps(func)
+    def wrapper(state):
+        token = _current_node.set(node)
+        start, status = time.perf_counter(), "ok"
+        try:
+            return func(state)
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            record_node(node, time.perf_counter() - start, status)
+            _current_node.reset(token)
+
+    @functools.wraps(afunc)
+    async def awrapper(state):
+        token = _current_node.set(node)
+        start, status = time.perf_counter(), "ok"
+        try:
+            return await afunc(state)
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            record_node(node, time.perf_counter() - start, status)
+            _current_node.reset(token)
+
+    return wrapper, awrapper
+
+
+def instrument_edge(edge: str, func: Callable[[Any], str]) -> Callable[[Any], str]:
+    """Wraps a conditional edge to count the branch it takes, `edge` being the node the edge leaves from"""
+
+    @functools.wraps(func)
+    def wrapper(state):
+        decision = func(state)
+        record_decision(edge, decision)
+        return decision
+
+    return wrapper
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Records the calls and token usage of chat models, attributed to the graph node they run in"""
+    # Only updates counters, no need to hop to an executor thread from async runs
+    run_inline = True
+
+    def __init__(self):
+        self._runs: dict[UUID, tuple[str, str]] = {}
+
+    def on_chat_model_start(self, serialized: dict, messages: list, *, run_id: UUID, metadata: dict | None = None,
+                            **kwargs: Any):
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model_name") or params.get("model") or "unknown"
+        node = (metadata or {}).get("langgraph_node") or _current_node.get()
+        self._runs[run_id] = (node, model)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        node, model = self._runs.pop(run_id, (None, "unknown"))
+        prompt_tokens = completion_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                if usage := getattr(message, "usage_metadata", None):
+                    prompt_tokens += usage.get("input_tokens", 0)
+                    completion_tokens += usage.get("output_tokens", 0)
+                # The model that actually served the call, e.g. a dated snapshot
+                model = getattr(message, "response_metadata", {}).get("model_name") or model
+        llm_output = response.llm_output or {}
+        if not (prompt_tokens or completion_tokens) and (usage := llm_output.get("token_usage")):
+            prompt_tokens, completion_tokens = usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+        model = llm_output.get("model_name") or model
+        record_llm_call(model, prompt_tokens, completion_tokens, node=node)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._runs.pop(run_id, None)
+
+    def on_retry(self, retry_state: Any, *, run_id: UUID, **kwargs: Any):
+        record_retry("runnable")
+
+
+def _count_retryable_response(response: httpx.Response):
+    if response.status_code in RETRYABLE_STATUS_CODES or response.status_code >= 500:
+        record_retry(f"http_{response.status_code}")
+
+
+async def _acount_retryable_response(response: httpx.Response):
+    _count_retryable_response(response)
+
+
+def instrumented_http_clients() -> tuple[httpx.Client, httpx.AsyncClient]:
+    """
+    HTTP clients for the OpenAI SDK that count the responses it retries (rate limits, timeouts and server errors),
+    which otherwise happen silently inside the SDK. Their requests go through the process-wide OpenAI rate limiter.
+    """
+    return rate_limited_http_clients(
+        event_hooks={"response": [_count_retryable_response]},
+        async_event_hooks={"response": [_acount_retryable_response]},
+    )
@@ -0,0 +1,46 @@
+import logging
+from functools import lru_cache
+from typing import NamedTuple
+
+from langchain_openai import ChatOpenAI
+
+from backend.config import settings
+from backend.research_agent.metrics import instrumented_http_clients
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRoles(NamedTuple):
+    """The model of each LLM role in the graph"""
+    grader: str
+    generator: str
+    rewriter: str
+
+
+def resolve_generator(model: str | None = None) -> str:
+    """
+    Picks the generator for a request's `model`, which names either a tier of GENERATOR_TIERS or one of its models.
+    Empty and unknown values get the default tier, so requests can't run arbitrary models.
+    """
+    tiers = settings.GENERATOR_TIERS
+    if model in tiers:
+        return tiers[model]
+    if model in tiers.values():
+        return model
+    if model:
+        logger.warning(f"Unknown generator model {model}, using the {settings.DEFAULT_GENERATOR_TIER} tier")
+    return tiers[settings.DEFAULT_GENERATOR_TIER]
+
+
+def resolve_models(model: str | None = None) -> ModelRoles:
+    """Models of a request's graph, its `model` picking the generator tier and settings the other roles"""
+    return ModelRoles(grader=settings.GRADER_MODEL, generator=resolve_generator(model), rewriter=settings.REWRITER_MODEL)
+
+
+@lru_cache
+def get_chat_model(model: str) -> ChatOpenAI:
+    """OpenAI chat model shared by every graph and role using `model`"""
+    http_client, http_async_client = instrumented_http_clients()
+    # stream_usage reports token usage for streamed generations too
+    return ChatOpenAI(model=model, temperature=0, openai_api_key=settings.OPENAI_API_KEY, stream_usage=True,
+                      http_client=http_client, http_async_client=http_async_client)
@@ -1,11 +1,22 @@
+import asyncio
+import time
+
 from langchain_community.retrievers import ArxivRetriever
 from langchain_community.tools import TavilySearchResults
+from langchain_core.callbacks import adispatch_custom_event, dispatch_custom_event
 from langchain_core.language_models import BaseChatModel
+from langchain_core.runnables.config import ContextThreadPoolExecutor
 from langchain_core.vectorstores import VectorStoreRetriever
 
-from backend.research_agent import GraphState, Retriever
+from backend.rate_limiter import Priority, priority
+from backend.research_agent import GraphState
+from backend.research_agent.context import pack_context
 from backend.research_agent.generate_chain import create_generate_chain
-from backend.research_agent.graph import Steps
+from backend.research_agent.grader import GraderUtils
+from backend.research_agent.graph import Resource, Steps
+from backend.research_agent.metrics import SPECULATION_SAVED, SPECULATION_WASTED, SPECULATIONS, record_retry
+from backend.research_agent.reranker import ResourceReranker
+from backend.research_agent.vector_store import Retriever
 
 from langchain.schema import Document
 
@@ -14,13 +25,50 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+# Retrieval sources in the order the serial graph falls back through them
+FANOUT_SOURCES = ("vector_store", "paper_search", "web_search")
+# Tag of the speculative draft's LLM calls, and the custom event dispatched once the draft is kept
+DRAFT_TAG = "speculative_draft"
+DRAFT_KEPT_EVENT = "speculative_draft_kept"
+
+
+def format_history(state: GraphState) -> str:
+    # Follow-up questions are answered knowing the conversation they refer to
+    if not state.get("history"):
+        return ""
+    return f"Conversation so far:\n{state['history']}\n"
+
+
+def format_resources(resources: list[Resource]) -> str:
+    # Passages of multi-article questions are labelled with their article, so the answer can tell the papers apart
+    labelled = len({item.article_id for item in resources if item.article_id}) > 1
+    return '\n\n'.join(
+        f"{index + 1}. " + (f"[Article {item.article_id}] " if labelled and item.article_id else "") + str(item)
+        for index, item in enumerate(resources)
+    )
+
+
 class GraphNodes:
-    def __init__(self, llm: BaseChatModel, retriever: Retriever, retrieval_grader, web_search_tool: TavilySearchResults, paper_search_tool: ArxivRetriever):
+    def __init__(self, llm: BaseChatModel, retriever: Retriever, retrieval_grader, web_search_tool: TavilySearchResults, paper_search_tool: ArxivRetriever,
+                 rewriter_llm: BaseChatModel | None = None, grading_concurrency: int = 8, grading_timeout: float = 30.0, listwise_grader=None,
+                 context_token_budget: int = 6000, near_duplicate_threshold: float = 0.9,
+                 reranker: ResourceReranker | None = None, article_quota: int = 3):
         self.llm = llm
         self.retriever = retriever
         self.retrieval_grader = retrieval_grader
         self.web_search_tool = web_search_tool
         self.paper_search_tool = paper_search_tool
+        self.grading_concurrency = max(1, grading_concurrency)
+        self.grading_timeout = grading_timeout
+        self.listwise_grader = listwise_grader
+        self.context_token_budget = context_token_budget
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.reranker = reranker
+        self.article_quota = article_quota
+        self.rewriter_llm = rewriter_llm or llm
+        self._question_rewriter = None
+        self._follow_up_rewriter = None
+        self.context_model = getattr(llm, "model_name", None) or "gpt-4o-mini"
 
         self.generate_chain = create_generate_chain(llm)
 
@@ -39,12 +87,51 @@ class GraphNodes:
         article_id = state["article_id"]
 
         # Retrieval
-        documents = self.retriever.sim_search(prompt, article_id)
-        state["resources"] = documents
-        state["steps"] = [Steps.VECTOR_STORE_RETRIEVAL.value]
+        resources = self._vector_search(prompt, article_id, state.get("article_ids"))
+        return self._apply_retrieval(state, resources)
+
+    async def avector_store_retrieve(self, state):
+        print("---RETRIEVE---")
+        resources = await self._avector_search(state["prompt"], state["article_id"], state.get("article_ids"))
+        return self._apply_retrieval(state, resources)
+
+    def _vector_search(self, prompt: str, article_id: str, article_ids: list[str] | None) -> list[Resource]:
+        # Multi-article questions search each of their articles, keeping `article_quota` chunks from every one
+        if article_ids:
+            return self.retriever.multi_search(prompt, article_ids, self.article_quota)
+        return self.retriever.search(prompt, article_id)
 
+    async def _avector_search(self, prompt: str, article_id: str, article_ids: list[str] | None) -> list[Resource]:
+        if article_ids:
+            return await self.retriever.amulti_search(prompt, article_ids, self.article_quota)
+        return await self.retriever.asearch(prompt, article_id)
+
+    def _apply_retrieval(self, state: GraphState, resources: list[Resource]):
+        state["resources"] = resources
+        state["resource_grades"] = []
+        state["grader_calls_avoided"] = 0
+        # Keeps the step of a follow-up rewrite that ran before retrieval
+        state["steps"] = state.get("steps", []) + [Steps.VECTOR_STORE_RETRIEVAL.value]
+        return state
+
+    def rerank_vector_store_documents(self, state: GraphState):
+        """
+        Accept or reject the retrieved resources that the reranker is confident about, leaving the rest to the grader.
+
+        Args:
+            state (dict): The current graph state
+
+        Returns:
+            state (dict): resource_grades set to the reranker's decision for each resource, None when undecided
+        """
+        print("---RERANK VECTOR STORE DOCUMENTS---")
+        state["resource_grades"] = self.reranker.triage(state["prompt"], state["resources"])
         return state
 
+    async def arerank_vector_store_documents(self, state: GraphState):
+        # Pure CPU work on a handful of resources, cheaper inline than in a thread
+        return self.rerank_vector_store_documents(state)
+
     def generate(self, state):
         """
         Generate answer
@@ -56,32 +143,213 @@ class GraphNodes:
             state (dict): New key added to state, generation, that contains LLM generation
         """
         print("---GENERATE---")
-        prompt = state["prompt"]
-        resources = state["resources"]
+        resources = self._pack_context(state)
+
+        # A draft kept by speculative grading was generated from these very resources
+        if (generation := state.get("draft_generation")) is None:
+            # RAG generation, ahead of any grading calls waiting on the rate limiter since the user is waiting on it
+            with priority(Priority.HIGH):
+                generation = self.generate_chain.invoke(self._generation_inputs(state, resources))
+        state["generation"] = generation
+        state["steps"].append(Steps.LLM_GENERATION.value)
+        return state
 
-        # RAG generation
-        generation = self.generate_chain.invoke({"resources": '\n\n'.join(f"{index + 1}. {item}" for index, item in enumerate(resources)), "prompt": prompt})
+    async def agenerate(self, state):
+        print("---GENERATE---")
+        resources = self._pack_context(state)
+        if (generation := state.get("draft_generation")) is None:
+            with priority(Priority.HIGH):
+                generation = await self.generate_chain.ainvoke(self._generation_inputs(state, resources))
         state["generation"] = generation
         state["steps"].append(Steps.LLM_GENERATION.value)
         return state
 
+    @staticmethod
+    def _generation_inputs(state: GraphState, resources: list[Resource]) -> dict:
+        return {"resources": format_resources(resources), "prompt": state["prompt"], "history": format_history(state)}
+
+    def _draft_inputs(self, state: GraphState) -> dict:
+        # Packed exactly as `generate` will pack the resources if grading keeps all of them
+        resources, _ = pack_context(
+            state["resources"], model=self.context_model, token_budget=self.context_token_budget,
+            near_duplicate_threshold=self.near_duplicate_threshold,
+        )
+        return self._generation_inputs(state, resources)
+
+    def _timed_draft(self, inputs: dict) -> tuple[str, float]:
+        start = time.perf_counter()
+        return self.generate_chain.invoke(inputs, config={"tags": [DRAFT_TAG]}), time.perf_counter() - start
+
+    async def _atimed_draft(self, inputs: dict) -> tuple[str, float]:
+        start = time.perf_counter()
+        return await self.generate_chain.ainvoke(inputs, config={"tags": [DRAFT_TAG]}), time.perf_counter() - start
+
+    def _pack_context(self, state: GraphState) -> list[Resource]:
+        """Dedupe the resources and fit them into the context token budget, recording what was dropped in the state"""
+        resources, stats = pack_context(
+            state["resources"], model=self.context_model, token_budget=self.context_token_budget,
+            near_duplicate_threshold=self.near_duplicate_threshold,
+        )
+        state["resources"] = resources
+        state["context_stats"] = stats
+        return resources
+
+    def _grade_resources(self, prompt: str, resources: list[Resource]) -> list[bool]:
+        """
+        Grade every resource against the prompt. Uses a single listwise grader call when one is configured, and falls
+        back to grading each resource on its own if the listwise output is malformed.
+
+        Args:
+            prompt (str): The user prompt
+            resources (list): The resources to grade
+
+        Returns:
+            list[bool]: Whether each resource is relevant, in the same order as `resources`
+        """
+        if not resources:
+            return []
+
+        if self.listwise_grader is not None and len(resources) > 1:
+            if (grades := self._grade_resources_listwise(prompt, resources)) is not None:
+                return grades
+            logger.warning("Listwise grading returned malformed output, falling back to per-resource grading")
+            record_retry("listwise_fallback")
+
+        return self._grade_resources_pointwise(prompt, resources)
+
+    async def _agrade_resources(self, prompt: str, resources: list[Resource]) -> list[bool]:
+        if not resources:
+            return []
+
+        if self.listwise_grader is not None and len(resources) > 1:
+            if (grades := await self._agrade_resources_listwise(prompt, resources)) is not None:
+                return grades
+            logger.warning("Listwise grading returned malformed output, falling back to per-resource grading")
+            record_retry("listwise_fallback")
+
+        return await self._agrade_resources_pointwise(prompt, resources)
+
+    def _grade_resources_listwise(self, prompt: str, resources: list[Resource]) -> list[bool] | None:
+        executor = ContextThreadPoolExecutor(max_workers=1, thread_name_prefix="listwise-grader")
+        try:
+            future = executor.submit(self.listwise_grader.invoke, {"prompt": prompt, "resources": format_resources(resources)})
+            scores = future.result(timeout=self.grading_timeout)
+        except TimeoutError:
+            logger.warning("Listwise grading timed out")
+            return None
+        except Exception as e:
+            logger.error(f"Listwise grading failed: {e}")
+            return None
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        return GraderUtils.parse_listwise_scores(scores, len(resources))
+
+    async def _agrade_resources_listwise(self, prompt: str, resources: list[Resource]) -> list[bool] | None:
+        try:
+            scores = await asyncio.wait_for(
+                self.listwise_grader.ainvoke({"prompt": prompt, "resources": format_resources(resources)}),
+                timeout=self.grading_timeout,
+            )
+        except TimeoutError:
+            logger.warning("Listwise grading timed out")
+            return None
+        except Exception as e:
+            logger.error(f"Listwise grading failed: {e}")
+            return None
+
+        return GraderUtils.parse_listwise_scores(scores, len(resources))
+
+    def _grade_resources_pointwise(self, prompt: str, resources: list[Resource]) -> list[bool]:
+        """
+        Grade every resource with its own grader call, waiting on at most `grading_concurrency` calls at once. Each call
+        gets `grading_timeout` seconds from when it starts, as on the async path.
+
+        Args:
+            prompt (str): The user prompt
+            resources (list[Resource]): The resources to grade
+
+        Returns:
+            list[bool]: Whether each resource is relevant, in the same order as `resources`
+        """
+        if not resources:
+            return []
+
+        def grade(index: int, resource: Resource) -> bool:
+            # Threads can't be cancelled: the call runs in its own thread so that, like on the async path, it gets
+            # `grading_timeout` seconds from when it starts and its worker moves on to the next resource when it times out
+            call = ContextThreadPoolExecutor(max_workers=1, thread_name_prefix="retrieval-grader-call")
+            try:
+                future = call.submit(self.retrieval_grader.invoke, {"prompt": prompt, "resources": resource.content})
+                score = future.result(timeout=self.grading_timeout)
+                return score["score"].lower() == "yes"
+            except TimeoutError:
+                logger.warning(f"Grading resource {index} timed out, treating it as irrelevant")
+                return False
+            except Exception as e:
+                logger.error(f"Grading resource {index} failed, treating it as irrelevant: {e}")
+                return False
+            finally:
+                # Don't hold the graph run hostage to a grader call that already timed out
+                call.shutdown(wait=False)
+
+        executor = ContextThreadPoolExecutor(
+            max_workers=min(self.grading_concurrency, len(resources)), thread_name_prefix="retrieval-grader"
+        )
+        with executor:
+            return list(executor.map(grade, range(len(resources)), resources))
+
+    async def _agrade_resources_pointwise(self, prompt: str, resources: list[Resource]) -> list[bool]:
+        semaphore = asyncio.Semaphore(self.grading_concurrency)
+
+        async def grade(index: int, resource: Resource) -> bool:
+            async with semaphore:
+                try:
+                    score = await asyncio.wait_for(
+                        self.retrieval_grader.ainvoke({"prompt": prompt, "resources": resource.content}),
+                        timeout=self.grading_timeout,
+                    )
+                    return score["score"].lower() == "yes"
+                except TimeoutError:
+                    logger.warning(f"Grading resource {index} timed out, treating it as irrelevant")
+                    return False
+                except Exception as e:
+                    logger.error(f"Grading resource {index} failed, treating it as irrelevant: {e}")
+                    return False
+
+        return list(await asyncio.gather(*(grade(index, resource) for index, resource in enumerate(resources))))
+
+    def _prior_grades(self, state: GraphState) -> list[bool | None]:
+        """
+        Takes the grades the reranker already decided, counting each as a grader call avoided. Resources without one
+        are None and still go to the grader.
+        """
+        prior = state.get("resource_grades") or [None] * len(state["resources"])
+        state["resource_grades"] = []
+        state["grader_calls_avoided"] = state.get("grader_calls_avoided", 0) + sum(grade is not None for grade in prior)
+        return prior
+
+    @staticmethod
+    def _merge_grades(prior: list[bool | None], grades: list[bool]) -> list[bool]:
+        remaining = iter(grades)
+        return [next(remaining) if grade is None else grade for grade in prior]
+
     def _base_grade_documents(self, state: GraphState, previous_state: str):
-        prompt = state["prompt"]
-        resources = state["resources"]
+        prior = self._prior_grades(state)
+        pending = [resource for resource, grade in zip(state["resources"], prior) if grade is None]
+        grades = self._merge_grades(prior, self._grade_resources(state["prompt"], pending))
+        return self._apply_grades(state, grades, previous_state)
 
-        filtered_resources = []
-        next_search = False
+    async def _abase_grade_documents(self, state: GraphState, previous_state: str):
+        prior = self._prior_grades(state)
+        pending = [resource for resource, grade in zip(state["resources"], prior) if grade is None]
+        grades = self._merge_grades(prior, await self._agrade_resources(state["prompt"], pending))
+        return self._apply_grades(state, grades, previous_state)
 
-        for resource in resources:
-            score = self.retrieval_grader.invoke({
-                "prompt": prompt, "resources": resource
-            })
-            # print(f"{resource} || {score}")
-            if score["score"].lower() == "yes":
-                filtered_resources.append(resource)
-            else:
-                next_search = True
-                continue
+    def _apply_grades(self, state: GraphState, grades: list[bool], previous_state: str):
+        resources = state["resources"]
+        filtered_resources = [resource for resource, relevant in zip(resources, grades) if relevant]
+        next_search = not all(grades)
 
         if next_search:
             match previous_state:
@@ -99,27 +367,325 @@ class GraphNodes:
         print("---GRADE VECTOR STORE DOCUMENTS---")
         return self._base_grade_documents(state, "vector_store")
 
+    async def agrade_vector_store_documents(self, state: GraphState):
+        print("---GRADE VECTOR STORE DOCUMENTS---")
+        return await self._abase_grade_documents(state, "vector_store")
+
+    def speculative_grade_vector_store_documents(self, state: GraphState):
+        """
+        Grade the vector store resources while drafting the answer from all of them. The draft is kept for `generate`
+        when grading keeps every resource, and discarded otherwise.
+
+        Args:
+            state (dict): The current graph state
+
+        Returns:
+            state (dict): resources filtered by grading, draft_generation set when the draft was kept, and speculation
+                recording whether it was and the latency it saved
+        """
+        print("---GRADE VECTOR STORE DOCUMENTS, DRAFTING ANSWER---")
+        inputs, kept = self._draft_inputs(state), len(state["resources"])
+        start = time.perf_counter()
+        executor = ContextThreadPoolExecutor(max_workers=1, thread_name_prefix="draft")
+        # Not waited for on discard: a running draft can't be interrupted in a thread, its result is dropped
+        draft = executor.submit(self._timed_draft, inputs)
+        executor.shutdown(wait=False)
+        try:
+            state = self._base_grade_documents(state, "vector_store")
+        except BaseException:
+            self._discard_draft(draft, start)
+            raise
+        grading_seconds = time.perf_counter() - start
+
+        if not self._keeps_draft(state, kept):
+            self._discard_draft(draft, start)
+            return self._apply_speculation(state, None, grading_seconds, None)
+        # Lets a streaming caller release the draft's tokens while it is still being generated
+        dispatch_custom_event(DRAFT_KEPT_EVENT, {})
+        generation, generation_seconds = draft.result()
+        return self._apply_speculation(state, generation, grading_seconds, generation_seconds)
+
+    async def aspeculative_grade_vector_store_documents(self, state: GraphState):
+        print("---GRADE VECTOR STORE DOCUMENTS, DRAFTING ANSWER---")
+        inputs, kept = self._draft_inputs(state), len(state["resources"])
+        start = time.perf_counter()
+        draft = asyncio.create_task(self._atimed_draft(inputs))
+        try:
+            state = await self._abase_grade_documents(state, "vector_store")
+        except BaseException:
+            self._discard_draft(draft, start)
+            raise
+        grading_seconds = time.perf_counter() - start
+
+        if not self._keeps_draft(state, kept):
+            self._discard_draft(draft, start)
+            return self._apply_speculation(state, None, grading_seconds, None)
+        await adispatch_custom_event(DRAFT_KEPT_EVENT, {})
+        generation, generation_seconds = await draft
+        return self._apply_speculation(state, generation, grading_seconds, generation_seconds)
+
+    @staticmethod
+    def _discard_draft(draft, start: float):
+        """
+        Cancel a draft that won't be used, recording the generation time spent on it once it ends. A draft task is
+        interrupted, but a draft already running in a thread can't be and generates in full. Its exception is
+        retrieved should it fail, nothing awaits it.
+        """
+        def record_waste(future):
+            if future.cancelled():
+                # A cancelled task was interrupted mid-generation, a cancelled thread future never started
+                wasted = time.perf_counter() - start if isinstance(future, asyncio.Future) else 0.0
+            elif (e := future.exception()) is not None:
+                logger.debug(f"Discarded draft failed: {str(e)}")
+                wasted = time.perf_counter() - start
+            else:
+                _, wasted = future.result()
+            SPECULATION_WASTED.inc(wasted)
+
+        draft.cancel()
+        draft.add_done_callback(record_waste)
+
+    @staticmethod
+    def _keeps_draft(state: GraphState, resource_count: int) -> bool:
+        # Grading only filters, so the draft's resources are unchanged when none were dropped
+        return resource_count > 0 and len(state["resources"]) == resource_count and not state.get("perform_paper_search")
+
+    @staticmethod
+    def _apply_speculation(state: GraphState, generation: str | None, grading_seconds: float,
+                           generation_seconds: float | None):
+        # Grading then generating would have taken both durations, overlapping them takes the longer of the two
+        saved = min(grading_seconds, generation_seconds) if generation is not None else 0.0
+        state["draft_generation"] = generation
+        state["speculation"] = {
+            "succeeded": generation is not None,
+            "grading_seconds": round(grading_seconds, 4),
+            "latency_saved_seconds": round(saved, 4),
+        }
+        SPECULATIONS.labels("kept" if generation is not None else "discarded").inc()
+        SPECULATION_SAVED.inc(saved)
+        return state
+
     def grade_paper_search_documents(self, state: GraphState):
         return self._base_grade_documents(state, "paper_search")
 
+    async def agrade_paper_search_documents(self, state: GraphState):
+        return await self._abase_grade_documents(state, "paper_search")
+
+    @staticmethod
+    def _web_resource(result: dict) -> Resource:
+        return Resource(content=result["content"], source="web_search", score=result.get("score"), node_id=result.get("url"))
+
+    def _web_resources_from(self, web_results) -> list[Resource]:
+        # Tavily returns the error as a string instead of raising when its API fails
+        if not isinstance(web_results, list):
+            logger.error(f"Web search failed: {web_results}")
+            return []
+        return [self._web_resource(result) for result in web_results]
+
+    def _web_resources(self, prompt: str) -> list[Resource]:
+        return self._web_resources_from(self.web_search_tool.invoke({"query": prompt}))
+
+    async def _aweb_resources(self, prompt: str) -> list[Resource]:
+        return self._web_resources_from(await self.web_search_tool.ainvoke({"query": prompt}))
+
     def web_search(self, state: GraphState):
-        prompt = state["prompt"]
-        web_results = self.web_search_tool.invoke({"query": prompt})
-        state["resources"] = [
-           result["content"] for result in web_results
-        ]
+        state["resources"] = self._web_resources(state["prompt"])
         state["steps"].append(Steps.WEB_SEARCH_RETRIEVAL.value)
         return state
 
-    def paper_search(self, state: GraphState):
-        prompt = state["prompt"]
+    async def aweb_search(self, state: GraphState):
+        state["resources"] = await self._aweb_resources(state["prompt"])
+        state["steps"].append(Steps.WEB_SEARCH_RETRIEVAL.value)
+        return state
+
+    @staticmethod
+    def _paper_resource(paper: Document) -> Resource:
+        # arXiv doesn't score its results
+        return Resource(content=paper.page_content, source="paper_search", node_id=paper.metadata.get("Entry ID"))
+
+    def _paper_resources(self, prompt: str) -> list[Resource]:
         arxiv_papers = self.paper_search_tool.invoke(prompt)
-        state["resources"] = [
-            paper.page_content for paper in arxiv_papers
-        ]
+        return [self._paper_resource(paper) for paper in arxiv_papers]
+
+    async def _apaper_resources(self, prompt: str) -> list[Resource]:
+        arxiv_papers = await self.paper_search_tool.ainvoke(prompt)
+        return [self._paper_resource(paper) for paper in arxiv_papers]
+
+    def paper_search(self, state: GraphState):
+        state["resources"] = self._paper_resources(state["prompt"])
         state["steps"].append(Steps.PAPER_SEARCH_RETRIEVAL.value)
         return state
 
+    async def apaper_search(self, state: GraphState):
+        state["resources"] = await self._apaper_resources(state["prompt"])
+        state["steps"].append(Steps.PAPER_SEARCH_RETRIEVAL.value)
+        return state
+
+    def _fanout_source(self, source: str, prompt: str, article_id: str,
+                       article_ids: list[str] | None = None) -> tuple[list[Resource], list[bool] | None]:
+        match source:
+            case "vector_store":
+                resources = self._vector_search(prompt, article_id, article_ids)
+            case "paper_search":
+                resources = self._paper_resources(prompt)
+            case _:
+                # Web results are the last resort and are used ungraded, as in the serial graph
+                return self._web_resources(prompt), None
+        return resources, self._grade_resources(prompt, resources)
+
+    async def _afanout_source(self, source: str, prompt: str, article_id: str,
+                              article_ids: list[str] | None = None) -> tuple[list[Resource], list[bool] | None]:
+        match source:
+            case "vector_store":
+                resources = await self._avector_search(prompt, article_id, article_ids)
+            case "paper_search":
+                resources = await self._apaper_resources(prompt)
+            case _:
+                return await self._aweb_resources(prompt), None
+        return resources, await self._agrade_resources(prompt, resources)
+
+    def _apply_fanout_source(self, state: GraphState, source: str, resources: list[Resource], grades: list[bool] | None) -> bool:
+        """
+        Record a fan-out source's graded results in the state exactly as the serial graph would.
+
+        Returns:
+            bool: Whether the serial graph would have generated from this source
+        """
+        state["resources"] = resources
+        # Fan-out grades every resource itself, reranker grades left from an earlier retrieval don't apply
+        state["resource_grades"] = []
+        state["grader_calls_avoided"] = 0
+        state["retrieval_source"] = source
+        match source:
+            case "vector_store":
+                state["steps"] = state.get("steps", []) + [Steps.VECTOR_STORE_RETRIEVAL.value]
+                self._apply_grades(state, grades, "vector_store")
+                return bool(state["resources"]) and not state.get("perform_paper_search", False)
+            case "paper_search":
+                state["steps"].append(Steps.PAPER_SEARCH_RETRIEVAL.value)
+                self._apply_grades(state, grades, "paper_search")
+                return bool(state["resources"]) and not state.get("perform_web_search", False)
+            case _:
+                state["steps"].append(Steps.WEB_SEARCH_RETRIEVAL.value)
+                return True
+
+    def fanout_search(self, state: GraphState):
+        """
+        Retrieve from the vector store, arXiv and the web at the same time, grading each source as soon as it lands,
+        and keep the highest-priority source that the serial graph would have generated from.
+
+        Args:
+            state (dict): The current graph state
+
+        Returns:
+            state (dict): The selected source's resources, with steps and search flags matching the serial graph
+        """
+        print("---FAN-OUT SEARCH---")
+        prompt = state["prompt"]
+        article_id = state["article_id"]
+
+        executor = ContextThreadPoolExecutor(max_workers=len(FANOUT_SOURCES), thread_name_prefix="fanout-search")
+        try:
+            futures = {
+                source: executor.submit(self._fanout_source, source, prompt, article_id, state.get("article_ids"))
+                for source in FANOUT_SOURCES
+            }
+            for source in FANOUT_SOURCES:
+                try:
+                    resources, grades = futures[source].result()
+                except Exception as e:
+                    logger.error(f"Fan-out {source} retrieval failed: {e}")
+                    resources, grades = [], []
+                if self._apply_fanout_source(state, source, resources, grades):
+                    break
+        finally:
+            # Lower-priority sources still running are ignored
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        return state
+
+    async def afanout_search(self, state: GraphState):
+        print("---FAN-OUT SEARCH---")
+        prompt = state["prompt"]
+        article_id = state["article_id"]
+
+        tasks = {
+            source: asyncio.create_task(self._afanout_source(source, prompt, article_id, state.get("article_ids")))
+            for source in FANOUT_SOURCES
+        }
+        try:
+            for source in FANOUT_SOURCES:
+                try:
+                    resources, grades = await tasks[source]
+                except Exception as e:
+                    logger.error(f"Fan-out {source} retrieval failed: {e}")
+                    resources, grades = [], []
+                if self._apply_fanout_source(state, source, resources, grades):
+                    break
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+        return state
+
+    def reuse_conversation_resources(self, state: GraphState):
+        """
+        Answer a follow-up question from the resources of the previous turn, passed in with the question, skipping
+        retrieval and grading.
+
+        Args:
+            state (dict): The current graph state
+
+        Returns:
+            state (dict): steps started with the reuse step
+        """
+        print("---REUSE CONVERSATION RESOURCES---")
+        state["steps"] = [Steps.CONVERSATION_REUSE.value]
+        return state
+
+    async def areuse_conversation_resources(self, state: GraphState):
+        return self.reuse_conversation_resources(state)
+
+    @property
+    def follow_up_rewriter(self):
+        if self._follow_up_rewriter is None:
+            self._follow_up_rewriter = GraderUtils(llm=self.rewriter_llm).create_follow_up_rewriter()
+        return self._follow_up_rewriter
+
+    def rewrite_follow_up(self, state: GraphState):
+        """
+        Rewrite a follow-up question into a standalone one before retrieval, so it is searched for with the context the
+        conversation gives it.
+
+        Args:
+            state (dict): The current graph state
+
+        Returns:
+            state (dict): prompt replaced by the standalone question
+        """
+        print("---REWRITE FOLLOW-UP---")
+        rewritten = self.follow_up_rewriter.invoke({"history": state["history"], "prompt": state["prompt"]})
+        return self._apply_rewrite(state, rewritten)
+
+    async def arewrite_follow_up(self, state: GraphState):
+        print("---REWRITE FOLLOW-UP---")
+        rewritten = await self.follow_up_rewriter.ainvoke({"history": state["history"], "prompt": state["prompt"]})
+        return self._apply_rewrite(state, rewritten)
+
+    @staticmethod
+    def _apply_rewrite(state: GraphState, rewritten: str):
+        # An empty rewrite searches for the question as asked
+        state["prompt"] = rewritten.strip() or state["prompt"]
+        state["steps"] = [Steps.FOLLOW_UP_REWRITE.value]
+        return state
+
+    @property
+    def question_rewriter(self):
+        # Created on first use, its prompt is pulled from the LangChain hub
+        if self._question_rewriter is None:
+            self._question_rewriter = GraderUtils(llm=self.rewriter_llm).create_question_rewriter()
+        return self._question_rewriter
+
     def transform_query(self, state):
         """
         Transform the query to produce a better question.
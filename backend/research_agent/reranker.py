@@ -0,0 +1,68 @@
+from backend.research_agent.graph import Resource
+from backend.research_agent.lexical_index import tokenize
+
+# Question words and fillers that say nothing about whether a passage is on topic
+STOP_WORDS = frozenset({
+    "a", "about", "an", "and", "are", "as", "at", "be", "by", "can", "did", "do", "does", "for", "from", "how", "in",
+    "is", "it", "its", "of", "on", "or", "paper", "that", "the", "their", "this", "to", "used", "uses", "was", "were",
+    "what", "when", "which", "who", "why", "with", "authors", "article", "explain", "describe", "main",
+})
+
+
+def content_terms(text: str) -> set[str]:
+    return {term for term in tokenize(text) if term not in STOP_WORDS and len(term) > 1}
+
+
+class ResourceReranker:
+    """
+    CPU-only triage of retrieved resources ahead of the LLM retrieval grader.
+
+    Each resource gets a confidence score combining its embedding similarity to the prompt with its lexical overlap,
+    the share of the prompt's content terms that appear in it. Resources scoring at or above `accept_threshold` are
+    accepted and those below `reject_threshold` rejected without an LLM call; the rest, and resources without a
+    similarity score, are left for the grader.
+    """
+
+    def __init__(self, accept_threshold: float = 0.7, reject_threshold: float = 0.25, similarity_weight: float = 0.7):
+        """
+        Args:
+            accept_threshold (float): Confidence from which a resource is accepted
+            reject_threshold (float): Confidence under which a resource is rejected
+            similarity_weight (float): Weight of the embedding similarity in the confidence, the rest goes to overlap
+        """
+        if reject_threshold > accept_threshold:
+            raise ValueError("The reject threshold must not be above the accept threshold")
+        self.accept_threshold = accept_threshold
+        self.reject_threshold = reject_threshold
+        self.similarity_weight = similarity_weight
+
+    def confidence(self, prompt_terms: set[str], resource: str, similarity: float | None) -> float | None:
+        if similarity is None:
+            return None
+        overlap = len(prompt_terms & content_terms(resource)) / len(prompt_terms) if prompt_terms else 0.0
+        return self.similarity_weight * similarity + (1 - self.similarity_weight) * overlap
+
+    def triage(self, prompt: str, resources: list[Resource]) -> list[bool | None]:
+        """
+        Decides the resources that are clearly relevant or irrelevant to the prompt.
+
+        Args:
+            prompt (str): The user prompt
+            resources (list[Resource]): Retrieved resources, scored with their embedding similarity to the prompt
+
+        Returns:
+            list[bool | None]: True for accepted, False for rejected and None for undecided resources
+        """
+        prompt_terms = content_terms(prompt)
+        grades = []
+        for resource in resources:
+            confidence = self.confidence(prompt_terms, resource.content, resource.score)
+            if confidence is None:
+                grades.append(None)
+            elif confidence >= self.accept_threshold:
+                grades.append(True)
+            elif confidence < self.reject_threshold:
+                grades.append(False)
+            else:
+                grades.append(None)
+        return grades
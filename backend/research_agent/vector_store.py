@@ -1,16 +1,48 @@
+import asyncio
+import logging
+import os
+from functools import lru_cache
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from langchain_core.runnables.config import ContextThreadPoolExecutor
 from langchain_openai import OpenAIEmbeddings
 
-from llama_index.core import VectorStoreIndex
+from llama_index.core import VectorStoreIndex, QueryBundle
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.embeddings.utils import resolve_embed_model
 from llama_index.core.indices.vector_store import VectorIndexRetriever
 from llama_index.core.vector_stores import MetadataFilters, MetadataFilter, FilterOperator
 from llama_index.vector_stores.pinecone import PineconeVectorStore
 from pinecone import Pinecone
 
+from backend.cache import LRUCache
 from backend.config import settings
+from backend.research_agent.graph import Resource
+from backend.research_agent.lexical_index import BM25_FILE, TEXTS_FILE, BM25Index, fetch_index, reciprocal_rank_fusion
+from backend.research_agent.metrics import instrumented_http_clients
+from backend.utils import get_s3_client, load_s3_bucket
+
+logger = logging.getLogger(__name__)
+
+def _collapse_whitespace(query: str) -> str:
+    # Queries are embedded as asked: casing tells apart names such as "BERT" and acronyms from common words, so unlike
+    # prompt cache keys (see `normalize_text`) query embeddings are only shared across whitespace differences
+    return " ".join(query.split())
+
+
+def get_embed_model() -> BaseEmbedding:
+    """Query embedding model, the same one the ingestion DAG embeds chunks with"""
+    http_client, http_async_client = instrumented_http_clients()
+    return resolve_embed_model(OpenAIEmbeddings(
+        model=settings.OPENAI_EMBEDDINGS_MODEL, api_key=settings.OPENAI_API_KEY, http_client=http_client,
+        http_async_client=http_async_client
+    ))
+
 
 # Use llama-index to retrieve docs as they were indexed using same strategy
 def get_pinecone_vector_store():
-    embeddings = OpenAIEmbeddings(model=settings.OPENAI_EMBEDDINGS_MODEL, api_key=settings.OPENAI_API_KEY)
+    embeddings = get_embed_model()
     pinecone_client = Pinecone(api_key=settings.PINECONE_API_KEY)
     pinecone_index = pinecone_client.Index(settings.PINECONE_INDEX_NAME)
     vector_store = PineconeVectorStore(pinecone_index=pinecone_index)
@@ -19,15 +51,212 @@ def get_pinecone_vector_store():
     return vector_index
 
 class Retriever:
-    def __init__(self, vector_store):
+    def __init__(self, vector_store, embedding_model: str = settings.OPENAI_EMBEDDINGS_MODEL,
+                 pool_size: int = 128, embedding_cache_size: int = 1024, embed_model=None, top_k: int = 5,
+                 mode: str = "dense", lexical_index: BM25Index | None = None, hybrid_candidates: int = 20, rrf_k: int = 60):
+        """
+        In "dense" mode searches return the `top_k` most similar chunks. In "hybrid" mode the `hybrid_candidates` best
+        chunks by embedding similarity and by BM25 are merged with reciprocal rank fusion and the top `top_k` returned,
+        so chunks quoting the exact terms of the query (dataset names, acronyms, equation names) are found even when
+        their embedding is not among the closest.
+
+        Args:
+            vector_store (VectorStoreIndex): Index to search
+            embedding_model (str): Name of the embedding model, part of the query embedding cache key
+            pool_size (int): Number of per-article retrievers to keep
+            embedding_cache_size (int): Number of query embeddings to keep
+            embed_model (BaseEmbedding): Model used to embed queries, defaults to the embed model of the index
+            top_k (int): Number of chunks returned per search
+            mode (str): "dense" or "hybrid"
+            lexical_index (BM25Index): Lexical index of the same chunks, required in hybrid mode
+            hybrid_candidates (int): Candidates taken from each ranking in hybrid mode
+            rrf_k (int): Reciprocal rank fusion damping constant
+        """
+        if mode not in ("dense", "hybrid"):
+            raise ValueError(f"Unknown retriever mode: {mode}")
+        if mode == "hybrid" and lexical_index is None:
+            raise ValueError("Hybrid retrieval needs a lexical index")
+
         self.vector_store = vector_store
+        self.embedding_model = embedding_model
+        self.embed_model = embed_model or vector_store._embed_model
+        self.top_k = top_k
+        self.mode = mode
+        self.lexical_index = lexical_index
+        self.rrf_k = rrf_k
+        # Dense results fetched per search
+        self.candidates = max(top_k, hybrid_candidates) if mode == "hybrid" else top_k
         # self.vector_store = VectorIndexRetriever(index=vector_store, similarity_top_k=5)
+        self._retrievers = LRUCache(maxsize=pool_size)
+        self._query_embeddings = LRUCache(maxsize=embedding_cache_size)
+
+    def _article_retriever(self, article_id) -> VectorIndexRetriever:
+        retriever = self._retrievers.get(article_id)
+        if retriever is None:
+            retriever = VectorIndexRetriever(index=self.vector_store, similarity_top_k=self.candidates,
+                                             filters=MetadataFilters(filters=[MetadataFilter(key="doc_id", operator=FilterOperator.EQ, value=article_id)]))
+            self._retrievers.put(article_id, retriever)
+        return retriever
+
+    def embed_query(self, query: str) -> list[float]:
+        text = _collapse_whitespace(query)
+        key = (self.embedding_model, text)
+        embedding = self._query_embeddings.get(key)
+        if embedding is None:
+            embedding = self.embed_model.get_query_embedding(text)
+            self._query_embeddings.put(key, embedding)
+        return embedding
+
+    async def aembed_query(self, query: str) -> list[float]:
+        text = _collapse_whitespace(query)
+        key = (self.embedding_model, text)
+        embedding = self._query_embeddings.get(key)
+        if embedding is None:
+            embedding = await self.embed_model.aget_query_embedding(text)
+            self._query_embeddings.put(key, embedding)
+        return embedding
+
+    def cache_stats(self) -> dict:
+        return {"retrievers": self._retrievers.stats(), "query_embeddings": self._query_embeddings.stats()}
+
+    def _dense_search(self, query, article_id) -> list[tuple[str, str, float]]:
+        """Node ids, texts and similarity scores of the `candidates` chunks most similar to the query, best first"""
+        query_bundle = QueryBundle(query_str=query, embedding=self.embed_query(query))
+        response = self._article_retriever(article_id).retrieve(query_bundle)
+        return [(i.node.node_id, i.get_content(), i.score) for i in response]
+
+    def _lexical_search(self, query, article_id) -> list[tuple[str, str]]:
+        matches = self.lexical_index.search(query, article_id, self.candidates)
+        return [(self.lexical_index.node_ids[row], self.lexical_index.texts[row]) for row, _ in matches]
+
+    def search(self, query, article_id) -> list[Resource]:
+        """
+        Searches an article for the chunks that best match the query.
+
+        Args:
+            query (str): Query text
+            article_id (str): Article to search in
+
+        Returns:
+            list[Resource]: The chunks, best first, scored with their embedding similarity to the query. The score is
+                None for chunks that only the lexical ranking found in hybrid mode.
+        """
+        dense = self._dense_search(query, article_id)
+        if self.mode == "dense":
+            return [Resource(content=text, source="vector_store", score=score, node_id=node_id, article_id=article_id)
+                    for node_id, text, score in dense]
+
+        lexical = self._lexical_search(query, article_id)
+        texts = dict(lexical) | {node_id: text for node_id, text, _ in dense}
+        scores = {node_id: score for node_id, _, score in dense}
+        fused = reciprocal_rank_fusion([[node_id for node_id, _, _ in dense], [node_id for node_id, _ in lexical]], k=self.rrf_k)
+        return [Resource(content=texts[node_id], source="vector_store", score=scores.get(node_id), node_id=node_id,
+                         article_id=article_id)
+                for node_id in fused[:self.top_k]]
+
+    async def asearch(self, query, article_id) -> list[Resource]:
+        # The Pinecone vector store has no native async query, so run the blocking search off the event loop
+        return await asyncio.to_thread(self.search, query, article_id)
+
+    @staticmethod
+    def _merge_articles(results: list[list[Resource]], quota: int) -> list[Resource]:
+        # Take each article's best `quota` chunks and interleave them by rank, so trimming the tail (e.g. when packing
+        # the context) costs every article alike
+        results = [resources[:quota] for resources in results]
+        return [resources[rank] for rank in range(quota) for resources in results if rank < len(resources)]
+
+    def multi_search(self, query, article_ids: list[str], quota: int = 3) -> list[Resource]:
+        """
+        Searches several articles for the chunks that best match the query, each article searched on its own so
+        every one of them is represented.
+
+        Args:
+            query (str): Query text
+            article_ids (list[str]): Articles to search in
+            quota (int): Chunks kept from each article
+
+        Returns:
+            list[Resource]: The articles' best chunks interleaved by rank, each article's best first
+        """
+        # Embed once up front, the searches then share the cached embedding
+        self.embed_query(query)
+        with ContextThreadPoolExecutor(max_workers=len(article_ids), thread_name_prefix="article-search") as executor:
+            results = list(executor.map(lambda article_id: self.search(query, article_id), article_ids))
+        return self._merge_articles(results, quota)
+
+    async def amulti_search(self, query, article_ids: list[str], quota: int = 3) -> list[Resource]:
+        await self.aembed_query(query)
+        results = await asyncio.gather(*(self.asearch(query, article_id) for article_id in article_ids))
+        return self._merge_articles(list(results), quota)
 
     def sim_search(self, query, article_id):
-        retriever = VectorIndexRetriever(index=self.vector_store, similarity_top_k=5,
-                                         filters=MetadataFilters(filters=[MetadataFilter(key="doc_id", operator=FilterOperator.EQ, value=article_id)]))
-        response = retriever.retrieve(query)
-        return [i.get_content() for i in response]
+        return [resource.content for resource in self.search(query, article_id)]
+
+    async def asim_search(self, query, article_id):
+        return [resource.content for resource in await self.asearch(query, article_id)]
+
+
+def download_lexical_index(directory: str) -> BM25Index:
+    """
+    Downloads the latest BM25 index of the Pinecone chunks, which the indexing DAG publishes to S3 under
+    LEXICAL_INDEX_S3_PREFIX after every run, to `directory` and opens it. The copy already in `directory` is opened
+    instead when S3 can't be read.
+
+    Args:
+        directory (str): Directory to download the index to
+
+    Returns:
+        BM25Index: The index
+
+    Raises:
+        FileNotFoundError: When the index can't be downloaded and there is no copy in `directory`
+    """
+    bucket = load_s3_bucket()
+    try:
+        version = fetch_index(get_s3_client(), bucket, settings.LEXICAL_INDEX_S3_PREFIX, directory)
+        logger.info(f"Downloaded BM25 index {version} from S3 to {directory}")
+    except (BotoCoreError, ClientError, FileNotFoundError) as e:
+        if not all(os.path.exists(os.path.join(directory, filename)) for filename in (TEXTS_FILE, BM25_FILE)):
+            raise FileNotFoundError(
+                f"Hybrid retrieval over Pinecone needs the BM25 index the indexing DAG publishes to "
+                f"s3://{bucket}/{settings.LEXICAL_INDEX_S3_PREFIX}, which couldn't be downloaded ({e}). Run the DAG, "
+                f"or set RETRIEVER_MODE=dense"
+            ) from e
+        logger.warning(f"Failed to download the BM25 index from S3, using the copy in {directory}: {str(e)}")
+    return BM25Index(directory)
+
+
+def create_retriever(mode: str | None = None) -> Retriever:
+    """
+    Builds a retriever from settings. VECTOR_BACKEND selects Pinecone or the in-process index at LOCAL_INDEX_DIR, and
+    `mode` (RETRIEVER_MODE by default) dense or hybrid search. The BM25 index of hybrid search is read from
+    LOCAL_INDEX_DIR with the local index, and downloaded from S3 with Pinecone (see `download_lexical_index`).
+    """
+    mode = mode or settings.RETRIEVER_MODE
+    options = dict(mode=mode, embedding_cache_size=settings.QUERY_EMBEDDING_CACHE_SIZE,
+                   hybrid_candidates=settings.HYBRID_CANDIDATES, rrf_k=settings.RRF_K)
+
+    match settings.VECTOR_BACKEND:
+        case "pinecone":
+            lexical_index = download_lexical_index(settings.LEXICAL_INDEX_DIR) if mode == "hybrid" else None
+            return Retriever(vector_store=get_pinecone_vector_store(), pool_size=settings.RETRIEVER_POOL_SIZE,
+                             lexical_index=lexical_index, **options)
+        case "local":
+            # Imported here so the Pinecone backend doesn't pay for loading the index module
+            from backend.research_agent.local_index import LocalRetriever, LocalVectorIndex
+
+            index = LocalVectorIndex(settings.LOCAL_INDEX_DIR)
+            # Share the rows already loaded by the vector index
+            lexical_index = BM25Index(settings.LOCAL_INDEX_DIR, node_ids=index.node_ids, texts=index.texts) if mode == "hybrid" else None
+            return LocalRetriever(index=index, embed_model=get_embed_model(), lexical_index=lexical_index, **options)
+        case _:
+            raise ValueError(f"Unknown vector backend: {settings.VECTOR_BACKEND}")
+
+
+@lru_cache
+def get_retriever() -> Retriever:
+    """Process-wide retriever, shared so every caller reuses the same query embedding cache"""
+    return create_retriever()
 
 
 # def create_vector_store(docs, store_path: Optional[str] = None) -> FAISS:
@@ -4,3 +4,13 @@ from pydantic import BaseModel
 class QARequest(BaseModel):
     question: str
     model: str
+    bypass_cache: bool = False
+    session_id: str | None = None
+
+
+class MultiQARequest(BaseModel):
+    article_ids: list[str]
+    question: str
+    model: str
+    bypass_cache: bool = False
+    session_id: str | None = None
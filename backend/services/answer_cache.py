@@ -0,0 +1,144 @@
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from itertools import count
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedAnswer:
+    article_id: str
+    prompt: str
+    embedding: np.ndarray
+    generation: str
+    steps: list[str]
+    tools_used: list[str]
+    created_at: float = field(default_factory=time.time)
+
+
+def _unit(embedding) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticAnswerCache:
+    """
+    Stores generated answers per article, keyed by the embedding of the prompt that produced them. A lookup returns
+    the stored answer whose prompt is most similar to the new one, provided the cosine similarity clears `threshold`.
+
+    Entries expire after `ttl_seconds`, and the least recently used entry is evicted once `max_entries` is reached.
+    When `path` is set the cache is loaded from it on creation and written back by `save`.
+    """
+
+    def __init__(self, threshold: float = 0.95, ttl_seconds: float = 60 * 60 * 24, max_entries: int = 1000,
+                 path: str | None = None):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+
+        self._articles: dict[str, dict[int, CachedAnswer]] = {}
+        self._lru: OrderedDict[int, str] = OrderedDict()
+        self._ids = count()
+        self._lock = threading.Lock()
+
+        if path and os.path.exists(path):
+            self.load()
+
+    def _remove(self, entry_id: int):
+        article_id = self._lru.pop(entry_id)
+        entries = self._articles[article_id]
+        del entries[entry_id]
+        if not entries:
+            del self._articles[article_id]
+
+    def _expired(self, entry: CachedAnswer, now: float) -> bool:
+        return now - entry.created_at > self.ttl_seconds
+
+    def lookup(self, article_id: str, embedding) -> CachedAnswer | None:
+        query = _unit(embedding)
+        now = time.time()
+        with self._lock:
+            for entry_id, entry in list(self._articles.get(article_id, {}).items()):
+                if self._expired(entry, now):
+                    self._remove(entry_id)
+
+            entries = self._articles.get(article_id)
+            if not entries:
+                self.misses += 1
+                return None
+
+            entry_ids = list(entries)
+            similarities = np.stack([entries[entry_id].embedding for entry_id in entry_ids]) @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._lru.move_to_end(entry_ids[best])
+            return entries[entry_ids[best]]
+
+    def put(self, article_id: str, prompt: str, embedding, generation: str, steps: list[str], tools_used: list[str]):
+        if self.max_entries <= 0:
+            return
+        entry = CachedAnswer(
+            article_id=article_id, prompt=prompt, embedding=_unit(embedding), generation=generation,
+            steps=list(steps), tools_used=list(tools_used),
+        )
+        with self._lock:
+            entry_id = next(self._ids)
+            self._articles.setdefault(article_id, {})[entry_id] = entry
+            self._lru[entry_id] = article_id
+            while len(self._lru) > self.max_entries:
+                self._remove(next(iter(self._lru)))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._lru), "max_entries": self.max_entries}
+
+    def save(self):
+        if not self.path:
+            return
+        now = time.time()
+        with self._lock:
+            entries = [
+                self._articles[article_id][entry_id] for entry_id, article_id in self._lru.items()
+                if not self._expired(self._articles[article_id][entry_id], now)
+            ]
+        # Write to a temporary file first so a crash mid-write never leaves a truncated cache behind
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(entries, f)
+        os.replace(tmp_path, self.path)
+        logger.info(f"Saved {len(entries)} cached answers to {self.path}")
+
+    def load(self):
+        try:
+            with open(self.path, "rb") as f:
+                entries: list[CachedAnswer] = pickle.load(f)
+        except Exception as e:
+            logger.error(f"Failed to load answer cache from {self.path}: {str(e)}")
+            return
+
+        now = time.time()
+        with self._lock:
+            for entry in entries:
+                if self._expired(entry, now):
+                    continue
+                entry_id = next(self._ids)
+                self._articles.setdefault(entry.article_id, {})[entry_id] = entry
+                self._lru[entry_id] = entry.article_id
+            while len(self._lru) > self.max_entries:
+                self._remove(next(iter(self._lru)))
+        logger.info(f"Loaded {len(self._lru)} cached answers from {self.path}")
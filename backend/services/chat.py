@@ -1,13 +1,271 @@
 
-from backend.research_agent import agent_workflow
+import json
+import logging
+from typing import AsyncIterator
+
+from backend.cache import SingleFlight, normalize_text
+from backend.config import settings
+from backend.research_agent import agent_run_config, get_agent_workflow
+from backend.research_agent.models import resolve_generator
+from backend.research_agent.metrics import RequestMetrics, record_qa_request, track_request
+from backend.research_agent.nodes import DRAFT_KEPT_EVENT, DRAFT_TAG
+from backend.research_agent.vector_store import get_retriever
+from backend.services.answer_cache import SemanticAnswerCache, CachedAnswer
+from backend.services.conversations import ConversationSession, ConversationStore, FollowUp
+from backend.services.digests import DigestStore
+from backend.services.verification import AnswerVerifier
+
+logger = logging.getLogger(__name__)
+
+answer_cache = SemanticAnswerCache(
+    threshold=settings.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+    ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+    max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+    path=settings.ANSWER_CACHE_PATH,
+)
+digest_store = DigestStore(
+    threshold=settings.DIGEST_MATCH_THRESHOLD,
+    ttl_seconds=settings.DIGEST_CACHE_TTL_SECONDS,
+    max_entries=settings.DIGEST_CACHE_MAX_ENTRIES,
+)
+conversations = ConversationStore(
+    ttl_seconds=settings.CONVERSATION_TTL_SECONDS,
+    max_sessions=settings.CONVERSATION_MAX_SESSIONS,
+    history_turns=settings.CONVERSATION_HISTORY_TURNS,
+    answer_max_chars=settings.CONVERSATION_ANSWER_MAX_CHARS,
+    reuse_max_words=settings.FOLLOW_UP_REUSE_MAX_WORDS,
+)
+_answer_verifier = AnswerVerifier(
+    model=settings.VERIFICATION_MODEL,
+    ttl_seconds=settings.VERIFICATION_TTL_SECONDS,
+    max_entries=settings.VERIFICATION_MAX_ENTRIES,
+    max_concurrency=settings.VERIFICATION_MAX_CONCURRENCY,
+)
+# Graph runs of the questions being answered, keyed by (article key, normalized prompt, generator model, bypass_cache)
+qa_flights = SingleFlight()
+
+
+def _tools_used(response: dict) -> list[str]:
+    tools_used = ["vector_search"]
+    if response.get("perform_web_search", False):
+        tools_used.append("web_search")
+    if response.get("paper_search", False):
+        tools_used.append("paper_search")
+    return tools_used
+
+
+def _format_response(generation: str, tools_used: list[str]) -> str:
+    return generation + f"\n\n### Tools used to generate response:\n\t{', '.join(tools_used)}"
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _qa_response(generation: str, tools_used: list[str], steps: list[str], cached: bool, metrics: dict,
+                 session: ConversationSession | None = None, verification_id: str | None = None) -> dict:
+    return {
+        "response": _format_response(generation, tools_used),
+        "tools_used": ", ".join(tools_used),
+        "steps": steps,
+        "cached": cached,
+        "metrics": metrics,
+        "session_id": session.session_id if session is not None else None,
+        # Poll /chat/verifications/{verification_id} for whether the answer is grounded in its resources, None when unchecked
+        "verification_id": verification_id,
+    }
+
+
+def get_answer_verifier() -> AnswerVerifier:
+    return _answer_verifier
+
+
+def set_answer_verifier(verifier: AnswerVerifier):
+    """Replaces the verifier of generated answers, e.g. with one whose grader is a fake"""
+    global _answer_verifier
+    _answer_verifier = verifier
+
+
+def _verify_answer(response: dict) -> str | None:
+    """
+    Starts the background check of an answer the graph generated, returning its verification id. Answers served from
+    the answer cache or digests aren't checked, and requests coalesced into a graph run share its check.
+    """
+    if not settings.VERIFICATION_ENABLED or not response.get("resources"):
+        return None
+    return _answer_verifier.submit(response["prompt"], response["generation"], response["resources"]).verification_id
+
+
+async def _embed_prompt(prompt: str, bypass_cache: bool) -> list[float] | None:
+    """
+    Embedding used as the answer cache key and to match digest questions, or None when neither should be used for
+    this request
+    """
+    if bypass_cache or not (settings.ANSWER_CACHE_ENABLED or settings.DIGEST_ANSWERS_ENABLED):
+        return None
+    try:
+        return await get_retriever().aembed_query(prompt)
+    except Exception as e:
+        logger.error(f"Failed to embed prompt for the answer cache: {str(e)}", exc_info=True)
+        return None
+
+
+def _article_key(article_ids: list[str]) -> str:
+    # Multi-article questions are cached and coalesced by their set of articles, in any order
+    return "+".join(sorted(article_ids))
+
+
+def _graph_input(article_ids: list[str], prompt: str) -> dict:
+    graph_input = {"prompt": prompt, "article_id": article_ids[0]}
+    if len(article_ids) > 1:
+        graph_input["article_ids"] = article_ids
+    return graph_input
+
+
+def _resume_session(article_ids: list[str], session_id: str | None) -> ConversationSession | None:
+    if not settings.CONVERSATION_SESSIONS_ENABLED:
+        return None
+    return conversations.resume(session_id, _article_key(article_ids))
+
+
+def _follow_up(session: ConversationSession | None, prompt: str) -> FollowUp:
+    return conversations.classify(session, prompt) if session is not None else FollowUp.NEW
+
+
+def _follow_up_input(article_ids: list[str], prompt: str, session: ConversationSession, follow_up: FollowUp) -> dict:
+    graph_input = _graph_input(article_ids, prompt) | {
+        "follow_up": follow_up.value, "history": conversations.history(session)
+    }
+    if follow_up == FollowUp.REUSE:
+        graph_input["resources"] = list(session.resources)
+    return graph_input
+
+
+def _record_turn(session: ConversationSession | None, prompt: str, generation: str, resources: list):
+    if session is not None:
+        conversations.record(session, prompt, generation, resources)
+
+
+def _answer_scope(article_id: str, generator: str) -> str:
+    # Answers are only reused for requests of the same generator, a larger model's shouldn't be served from a smaller's
+    return f"{article_id}/{generator}"
+
+
+def _lookup_cached_answer(article_id: str, generator: str, embedding: list[float] | None) -> CachedAnswer | None:
+    if embedding is None or not settings.ANSWER_CACHE_ENABLED:
+        return None
+    return answer_cache.lookup(_answer_scope(article_id, generator), embedding)
+
+
+async def _lookup_digest_answer(article_id: str, generator: str, embedding: list[float] | None) -> CachedAnswer | None:
+    if embedding is None or not settings.DIGEST_ANSWERS_ENABLED:
+        return None
+    return await digest_store.lookup(article_id, generator, embedding)
+
+
+async def _lookup_answer(article_ids: list[str], generator: str, embedding: list[float] | None) -> CachedAnswer | None:
+    """
+    An earlier answer from the answer cache, or else the article's ingest-time answer to a matching question. Digests
+    cover a single article, so multi-article questions are only answered from the cache.
+    """
+    if (cached := _lookup_cached_answer(_article_key(article_ids), generator, embedding)) is not None:
+        record_qa_request("cached")
+        return cached
+    if len(article_ids) > 1:
+        return None
+    if (cached := await _lookup_digest_answer(article_ids[0], generator, embedding)) is not None:
+        record_qa_request("digest")
+    return cached
+
+
+def _cache_answer(article_id: str, generator: str, prompt: str, embedding: list[float] | None, response: dict):
+    if embedding is not None and settings.ANSWER_CACHE_ENABLED:
+        answer_cache.put(
+            _answer_scope(article_id, generator), prompt, embedding, response["generation"], response["steps"], _tools_used(response)
+        )
+
+
+async def _run_agent(article_ids: list[str], prompt: str, generator: str, embedding: list[float] | None) -> dict:
+    response = await get_agent_workflow(generator).ainvoke(_graph_input(article_ids, prompt), config=agent_run_config())
+    _cache_answer(_article_key(article_ids), generator, prompt, embedding, response)
+    # Checked once per run, requests coalesced into it share the verdict
+    response["verification_id"] = _verify_answer(response)
+    return response
+
+
+async def _answer(article_ids: list[str], prompt: str, generator: str, embedding: list[float] | None,
+                  bypass_cache: bool) -> dict:
+    """
+    Runs the graph for a question, or joins the run of an identical question that is already in flight. Errors of a
+    shared run are raised to every request waiting on it. Requests bypassing the cache only join each other's runs,
+    whose answers aren't cached.
+    """
+    if not settings.QA_SINGLE_FLIGHT:
+        record_qa_request("executed")
+        return await _run_agent(article_ids, prompt, generator, embedding)
+
+    response, coalesced = await qa_flights.do(
+        (_article_key(article_ids), normalize_text(prompt), generator, bypass_cache),
+        lambda: _run_agent(article_ids, prompt, generator, embedding)
+    )
+    record_qa_request("coalesced" if coalesced else "executed")
+    return response
+
 
 async def process_qa_query(
-    article_id: str, prompt: str, model: str, user_id: int
+    article_id: str, prompt: str, model: str, user_id: int, bypass_cache: bool = False, session_id: str | None = None
 ):
-    """Process a Q/A query and store the result"""
-    response = agent_workflow.invoke({"prompt": prompt, "article_id": article_id})
+    """
+    Process a Q/A query and store the result, `model` picking the generator tier (see `resolve_generator`).
+
+    The query is a turn of the conversation `session_id`, or of a new one whose id is returned when that is None or
+    expired. Follow-ups to the previous turn are answered from its resources, or rewritten with the conversation before
+    retrieval (see `ConversationStore.classify`).
+    """
+    return await _process_qa_query([article_id], prompt, model, user_id, bypass_cache, session_id)
 
-    print(response["steps"])
+
+async def process_multi_qa_query(
+    article_ids: list[str], prompt: str, model: str, user_id: int, bypass_cache: bool = False,
+    session_id: str | None = None
+):
+    """
+    Process a Q/A query about several articles, answered from the best chunks of each of them (MULTI_ARTICLE_QUOTA
+    per article) retrieved concurrently
+    """
+    return await _process_qa_query(article_ids, prompt, model, user_id, bypass_cache, session_id)
+
+
+async def _process_qa_query(article_ids: list[str], prompt: str, model: str, user_id: int, bypass_cache: bool,
+                            session_id: str | None):
+    generator = resolve_generator(model)
+    session = _resume_session(article_ids, session_id)
+    follow_up = _follow_up(session, prompt)
+    with track_request() as request_metrics:
+        if follow_up == FollowUp.NEW:
+            embedding = await _embed_prompt(prompt, bypass_cache)
+            cached = await _lookup_answer(article_ids, generator, embedding)
+            if cached is None:
+                response = await _answer(article_ids, prompt, generator, embedding, bypass_cache)
+        else:
+            # Follow-ups depend on their conversation, so they are neither cached nor shared with other requests
+            cached = None
+            record_qa_request("follow_up")
+            response = await get_agent_workflow(generator).ainvoke(
+                _follow_up_input(article_ids, prompt, session, follow_up), config=agent_run_config()
+            )
+            response["verification_id"] = _verify_answer(response)
+
+    if cached is not None:
+        _record_turn(session, prompt, cached.generation, [])
+        return _qa_response(
+            cached.generation, cached.tools_used, cached.steps, cached=True, metrics=request_metrics.summary(),
+            session=session
+        )
+
+    _record_turn(session, prompt, response["generation"], response.get("resources", []))
+
+    logger.debug(f"Answered from steps {response['steps']}")
 
     # qa_history = QAHistory(
     #     id=uuid.uuid4().hex,
@@ -22,13 +280,103 @@ async def process_qa_query(
     # with db_session() as session:
     #     session.add(qa_history)
     #     session.commit()
-    tools_used = ["vector_search"]
-    if response.get("perform_web_search", False):
-        tools_used.append("web_search")
-    if response.get("paper_search", False):
-        tools_used.append("paper_search")
 
-    return {
-        "response": response["generation"] + f"\n\n### Tools used to generate response:\n\t{', '.join(tools_used)}",
-        "tools_used": ", ".join(tools_used),
-    }
+    return _qa_response(
+        response["generation"], _tools_used(response), response["steps"], cached=False,
+        metrics=request_metrics.summary(), session=session, verification_id=response["verification_id"]
+    )
+
+
+async def stream_qa_query(
+    article_id: str, prompt: str, model: str, user_id: int, bypass_cache: bool = False, session_id: str | None = None
+) -> AsyncIterator[str]:
+    """
+    Process a Q/A query, yielding server-sent events as the graph runs:
+
+    - `step`: a graph step (see `Steps`) has completed, `{"step": ...}`
+    - `token`: a chunk of the generated answer, `{"token": ...}`. With SPECULATIVE_GENERATION, the chunks of a draft
+      generated while grading are sent once grading keeps it, and never if it is discarded
+    - `done`: the graph has finished, with the same body as `process_qa_query`, the answer's grounding check still
+      running in the background
+    - `error`: the graph failed, `{"detail": ...}`
+    """
+    with track_request() as request_metrics:
+        async for event in _stream_qa_events(
+            article_id, prompt, resolve_generator(model), bypass_cache, request_metrics,
+            _resume_session([article_id], session_id)
+        ):
+            yield event
+
+
+async def _stream_qa_events(
+    article_id: str, prompt: str, generator: str, bypass_cache: bool, request_metrics: RequestMetrics,
+    session: ConversationSession | None
+) -> AsyncIterator[str]:
+    follow_up = _follow_up(session, prompt)
+    if follow_up == FollowUp.NEW:
+        embedding = await _embed_prompt(prompt, bypass_cache)
+        if cached := await _lookup_answer([article_id], generator, embedding):
+            _record_turn(session, prompt, cached.generation, [])
+            for step in cached.steps:
+                yield _sse("step", {"step": step})
+            yield _sse("token", {"token": cached.generation})
+            yield _sse("done", _qa_response(
+                cached.generation, cached.tools_used, cached.steps, cached=True, metrics=request_metrics.summary(),
+                session=session
+            ))
+            return
+        # Streamed runs aren't coalesced, each client needs the events of its own run
+        record_qa_request("executed")
+        graph_input = _graph_input([article_id], prompt)
+    else:
+        # Without an embedding the answer isn't cached, it depends on the conversation
+        embedding = None
+        record_qa_request("follow_up")
+        graph_input = _follow_up_input([article_id], prompt, session, follow_up)
+
+    steps_sent = 0
+    tokens_sent = False
+    # Tokens of a speculative draft are held back until grading keeps it, and streamed as they come after that
+    draft_tokens, draft_kept = [], False
+    try:
+        async for event in get_agent_workflow(generator).astream_events(
+            graph_input, config=agent_run_config(), version="v2"
+        ):
+            node = event["metadata"].get("langgraph_node")
+            match event["event"]:
+                case "on_chat_model_stream" if node == "generate":
+                    if token := event["data"]["chunk"].content:
+                        tokens_sent = True
+                        yield _sse("token", {"token": token})
+                case "on_chat_model_stream" if DRAFT_TAG in event.get("tags", []):
+                    if token := event["data"]["chunk"].content:
+                        if draft_kept:
+                            tokens_sent = True
+                            yield _sse("token", {"token": token})
+                        else:
+                            draft_tokens.append(token)
+                case "on_custom_event" if event["name"] == DRAFT_KEPT_EVENT:
+                    draft_kept = True
+                    for token in draft_tokens:
+                        tokens_sent = True
+                        yield _sse("token", {"token": token})
+                case "on_chain_end" if not event["parent_ids"]:
+                    response = event["data"]["output"]
+                    if not tokens_sent:
+                        # The generator model didn't stream, send the whole answer as one chunk
+                        yield _sse("token", {"token": response["generation"]})
+                    _cache_answer(article_id, generator, prompt, embedding, response)
+                    _record_turn(session, prompt, response["generation"], response.get("resources", []))
+                    yield _sse("done", _qa_response(
+                        response["generation"], _tools_used(response), response["steps"], cached=False,
+                        metrics=request_metrics.summary(), session=session, verification_id=_verify_answer(response)
+                    ))
+                case "on_chain_end" if node:
+                    output = event["data"].get("output")
+                    steps = output.get("steps", []) if isinstance(output, dict) else []
+                    for step in steps[steps_sent:]:
+                        yield _sse("step", {"step": step})
+                    steps_sent = max(steps_sent, len(steps))
+    except Exception as e:
+        logger.error(f"Error streaming answer for article {article_id}: {str(e)}", exc_info=True)
+        yield _sse("error", {"detail": "Failed to generate a response"})
@@ -0,0 +1,154 @@
+import re
+import uuid
+from dataclasses import dataclass, field
+from enum import StrEnum
+
+from backend.cache import TTLCache
+from backend.research_agent.graph import Resource
+
+# Pronouns a question opens with, after its question words, when they stand for something said in the conversation,
+# as in "What does it mean?", "Why are these needed?" or "Which of them is best?". Further into a question they usually
+# refer to its own subject, as in "How does the model compute its loss?".
+_LEADING_PRONOUN_PATTERN = re.compile(
+    r"^\W*(?:(?:and|but|so|ok|okay|then|now|please|what|why|how|where|when|who|which|is|are|was|were|does|do|did|can|"
+    r"could|would|should|will|has|have|you|of|explain|describe|clarify|simplify|summari[sz]e)\W+)*"
+    r"(?:it|its|they|them|their|this|that|these|those)\b",
+    re.IGNORECASE,
+)
+# Pronouns a question ends on, with nothing they could stand for in the question itself, as in "Can you simplify that?"
+_TRAILING_PRONOUN_PATTERN = re.compile(r"\b(?:it|them|this|that|these|those)\W*$", re.IGNORECASE)
+# Phrases that point back at the previous answer wherever they appear
+_BACK_REFERENCE_PATTERN = re.compile(
+    r"\b(?:you\s+(?:said|mentioned|meant|described)|(?:above|previous|earlier|last)\s+(?:answer|response|question)|"
+    r"the\s+(?:former|latter)|elaborate|expand\s+on|tell\s+me\s+more|go\s+on|another\s+example|"
+    r"(?:first|second|third|last)\s+(?:one|point|part|step|item|option))\b",
+    re.IGNORECASE,
+)
+# "this paper" and the like refer to the article, which every question is about, not to the conversation
+_ARTICLE_REFERENCE_PATTERN = re.compile(
+    r"\b(this|that|the)\s+(paper|article|work|study|document|papers|articles)\b", re.IGNORECASE
+)
+# Words of a follow-up that ask for more of the previous answer rather than about something new
+_FOLLOW_UP_WORDS = {
+    "about", "again", "also", "another", "detail", "details", "does", "elaborate", "else", "example", "examples",
+    "expand", "explain", "first", "further", "give", "last", "mean", "means", "meant", "more", "part", "please",
+    "point", "points", "previous", "said", "second", "show", "simpler", "simply", "tell", "terms", "that", "their",
+    "them", "there", "these", "they", "third", "this", "those", "what", "which", "with", "would", "could", "should",
+}
+# Questions of the turns compressed out of a session's history that are still kept
+MAX_EARLIER_QUESTIONS = 10
+
+
+def _words(*texts: str) -> set[str]:
+    return {word for text in texts for word in re.findall(r"[a-z0-9]+", text.lower())}
+
+
+def _refers_back(prompt: str) -> bool:
+    prompt = _ARTICLE_REFERENCE_PATTERN.sub("", prompt).strip()
+    return any(
+        pattern.search(prompt)
+        for pattern in (_LEADING_PRONOUN_PATTERN, _TRAILING_PRONOUN_PATTERN, _BACK_REFERENCE_PATTERN)
+    )
+
+
+class FollowUp(StrEnum):
+    NEW = "new"
+    REUSE = "reuse"
+    REWRITE = "rewrite"
+
+
+@dataclass
+class Turn:
+    question: str
+    answer: str
+
+
+@dataclass
+class ConversationSession:
+    session_id: str
+    article_key: str
+    # Questions of the turns compressed out of `turns`, oldest first
+    earlier_questions: list[str] = field(default_factory=list)
+    turns: list[Turn] = field(default_factory=list)
+    # Graded resources the last answer was generated from, empty if it came from a cache or digest
+    resources: list[Resource] = field(default_factory=list)
+    # Words of the last turn's question, answer and resources
+    vocabulary: set[str] = field(default_factory=set)
+
+
+class ConversationStore:
+    """
+    Server-side conversation sessions, each keeping the graded resources of its last turn and a rolling history: the
+    last `history_turns` turns with their answers clipped to `answer_max_chars`, and only the questions of older ones.
+
+    Follow-up questions are told apart from new ones without an LLM call (see `classify`), so that they can skip
+    retrieval and grading, or at least be searched for with the context of the conversation.
+    """
+
+    def __init__(self, ttl_seconds: float = 30 * 60, max_sessions: int = 10_000, history_turns: int = 3,
+                 answer_max_chars: int = 800, reuse_max_words: int = 12):
+        """
+        Args:
+            ttl_seconds (float): Time a session is kept after its last turn
+            max_sessions (int): Sessions kept at most, the least recently used are dropped first
+            history_turns (int): Turns kept with their answers in the history
+            answer_max_chars (int): Length answers are clipped to in the history
+            reuse_max_words (int): Longest follow-up answered from the previous turn's resources
+        """
+        self.history_turns = history_turns
+        self.answer_max_chars = answer_max_chars
+        self.reuse_max_words = reuse_max_words
+        self._sessions = TTLCache(maxsize=max_sessions, ttl_seconds=ttl_seconds)
+
+    def resume(self, session_id: str | None, article_key: str) -> ConversationSession:
+        """The session of `session_id`, or a new one if there is none, it expired or it was about other articles"""
+        session = self._sessions.get(session_id) if session_id else None
+        if session is None or session.article_key != article_key:
+            session = ConversationSession(session_id=uuid.uuid4().hex, article_key=article_key)
+            self._sessions.put(session.session_id, session)
+        return session
+
+    def classify(self, session: ConversationSession, prompt: str) -> FollowUp:
+        """
+        Decides how a question relates to the conversation.
+
+        Args:
+            session (ConversationSession): The conversation
+            prompt (str): The question
+
+        Returns:
+            FollowUp: NEW for questions that don't refer back to the conversation: ordinary words such as "first" or
+                "example" don't, only pronouns without anything to stand for in the question and phrases such as
+                "you said" or "another example" do. REUSE for short follow-ups that only
+                use words of the last turn, answerable from its resources. REWRITE for other follow-ups, which bring in
+                something the last turn's resources may not cover.
+        """
+        if not session.turns or not _refers_back(prompt):
+            return FollowUp.NEW
+        new_words = {word for word in _words(prompt) - session.vocabulary if len(word) > 3} - _FOLLOW_UP_WORDS
+        if session.resources and not new_words and len(prompt.split()) <= self.reuse_max_words:
+            return FollowUp.REUSE
+        return FollowUp.REWRITE
+
+    def history(self, session: ConversationSession) -> str:
+        lines = []
+        if session.earlier_questions:
+            lines.append("Earlier questions: " + "; ".join(session.earlier_questions))
+        for turn in session.turns:
+            lines += [f"User: {turn.question}", f"Assistant: {turn.answer}"]
+        return "\n".join(lines)
+
+    def record(self, session: ConversationSession, question: str, answer: str, resources: list[Resource]):
+        """Adds a turn to the session, compressing the turns that fall out of the history to their questions"""
+        clipped = answer if len(answer) <= self.answer_max_chars else answer[:self.answer_max_chars] + "..."
+        session.turns.append(Turn(question=question, answer=clipped))
+        while len(session.turns) > self.history_turns:
+            session.earlier_questions.append(session.turns.pop(0).question)
+        del session.earlier_questions[:-MAX_EARLIER_QUESTIONS]
+        session.resources = list(resources)
+        session.vocabulary = _words(question, answer, *(resource.content for resource in resources))
+        # Stored again to restart its expiry
+        self._sessions.put(session.session_id, session)
+
+    def stats(self) -> dict:
+        return self._sessions.stats()
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+
+import numpy as np
+from sqlalchemy import select
+
+from backend.cache import TTLCache
+from backend.config import settings
+from backend.database import db_session
+from backend.database.articles import ArticleDigestModel
+from backend.research_agent.graph import Steps
+from backend.services.answer_cache import CachedAnswer, _unit
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ArticleDigest:
+    article_id: str
+    digest: str
+    model: str
+    questions: list[str]
+    answers: list[str]
+    # Unit-normalized question embeddings, one row per question
+    embeddings: np.ndarray
+
+
+def _load_digest(article_id: str) -> ArticleDigest | None:
+    with db_session() as session:
+        row = session.execute(
+            select(ArticleDigestModel).where(ArticleDigestModel.a_id == article_id)
+        ).scalar_one_or_none()
+        if row is None:
+            return None
+        if row.embedding_model != settings.OPENAI_EMBEDDINGS_MODEL or not row.faq:
+            # Prompts are embedded with another model, their similarities to these questions are meaningless
+            return None
+        return ArticleDigest(
+            article_id=article_id, digest=row.digest, model=row.model,
+            questions=[item["question"] for item in row.faq], answers=[item["answer"] for item in row.faq],
+            embeddings=np.stack([_unit(item["embedding"]) for item in row.faq]),
+        )
+
+
+class DigestStore:
+    """
+    Answers prompts that match one of an article's canonical questions with the answer generated for it at ingest
+    time (see `dags/pdf_processor_indexer.py`), stored in Postgres by the article's a_id.
+
+    Digests are read from Postgres once and then served from memory for `ttl_seconds`, articles without one included,
+    so matching a prompt costs a matrix-vector product.
+    """
+
+    def __init__(self, threshold: float = 0.88, ttl_seconds: float = 5 * 60, max_entries: int = 1000):
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._digests = TTLCache(maxsize=max_entries, ttl_seconds=ttl_seconds)
+
+    async def get(self, article_id: str) -> ArticleDigest | None:
+        # Articles without a digest are cached like those with one, failed reads aren't, so the next request retries
+        try:
+            return await self._digests.aget_or_compute(article_id, lambda: asyncio.to_thread(_load_digest, article_id))
+        except Exception as e:
+            logger.error(f"Error fetching the digest of article {article_id}: {str(e)}", exc_info=True)
+            return None
+
+    async def lookup(self, article_id: str, generator: str, embedding) -> CachedAnswer | None:
+        """
+        Args:
+            article_id (str): The article asked about
+            generator (str): Model the request would generate with, digests written by other models aren't served
+            embedding: Embedding of the prompt
+
+        Returns:
+            CachedAnswer | None: The answer to the most similar canonical question, if it clears the threshold
+        """
+        digest = await self.get(article_id)
+        if digest is None or digest.model != generator:
+            self.misses += 1
+            return None
+
+        similarities = digest.embeddings @ _unit(embedding)
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return CachedAnswer(
+            article_id=article_id, prompt=digest.questions[best], embedding=digest.embeddings[best],
+            generation=digest.answers[best], steps=[Steps.ARTICLE_DIGEST.value], tools_used=["article_digest"],
+        )
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "articles": self._digests.stats()}
@@ -0,0 +1,139 @@
+import asyncio
+import contextvars
+import logging
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from enum import StrEnum
+
+from backend.cache import TTLCache
+from langchain_core.runnables import RunnableLambda
+
+from backend.research_agent.concurrency import ConcurrencyLimit
+from backend.research_agent.edges import GraphEdges
+from backend.research_agent.grader import GraderUtils
+from backend.research_agent.graph import Resource
+from backend.research_agent.metrics import VERIFICATIONS, MetricsCallbackHandler, instrument_node
+from backend.research_agent.models import get_chat_model
+
+logger = logging.getLogger(__name__)
+
+
+class VerificationStatus(StrEnum):
+    PENDING = "pending"
+    GROUNDED = "grounded"
+    # Grounded, but doesn't answer the question
+    NOT_USEFUL = "not_useful"
+    NOT_GROUNDED = "not_grounded"
+    FAILED = "failed"
+
+
+@dataclass
+class Verification:
+    verification_id: str
+    status: VerificationStatus = VerificationStatus.PENDING
+    created_at: float = field(default_factory=time.time)
+    completed_at: float | None = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class AnswerVerifier:
+    """
+    Checks that answers are grounded in the resources they were generated from and answer the question, with
+    `GraphEdges.grade_generation_v_documents_and_question`, after they have been returned. The check costs up to two
+    LLM round trips that answers don't wait for: `submit` starts it in the background and returns a pending
+    verification, whose verdict is polled for with `get` for `ttl_seconds`.
+    """
+
+    def __init__(self, model: str, ttl_seconds: float = 60 * 60, max_entries: int = 10_000, max_concurrency: int = 8,
+                 edges: GraphEdges | None = None):
+        """
+        Args:
+            model (str): Model of the hallucination grader
+            ttl_seconds (float): Time verdicts are kept
+            max_entries (int): Verdicts kept at most
+            max_concurrency (int): Checks in flight at once, later ones wait so checks can't crowd out requests
+            edges (GraphEdges): Edges holding the hallucination grader and the answer evaluator, created from `model`
+                on first use by default
+        """
+        self.model = model
+        self._edges = edges
+        self._limit = ConcurrencyLimit(max_concurrency)
+        self._verifications = TTLCache(maxsize=max_entries, ttl_seconds=ttl_seconds)
+        self._tasks: set[asyncio.Task] = set()
+        self._grade, self._agrade = instrument_node("verify_answer", self._grade, self._agrade)
+
+    @property
+    def edges(self) -> GraphEdges:
+        if self._edges is None:
+            grader = GraderUtils(llm=get_chat_model(self.model))
+            self._edges = GraphEdges(grader.create_hallucination_grader(), grader.create_code_evaluator())
+        return self._edges
+
+    def _check(self):
+        # Run as a runnable so the graders' LLM calls inherit the metrics callbacks
+        return RunnableLambda(
+            self.edges.grade_generation_v_documents_and_question, afunc=self.edges.agrade_generation_v_documents_and_question
+        )
+
+    def _grade(self, state: dict) -> str:
+        return self._check().invoke(state, config={"callbacks": [MetricsCallbackHandler()]})
+
+    async def _agrade(self, state: dict) -> str:
+        return await self._check().ainvoke(state, config={"callbacks": [MetricsCallbackHandler()]})
+
+    def submit(self, prompt: str, generation: str, resources: list[Resource]) -> Verification:
+        """
+        Starts checking an answer on the running event loop.
+
+        Args:
+            prompt (str): The question
+            generation (str): The answer
+            resources (list[Resource]): The resources it was generated from
+
+        Returns:
+            Verification: The pending verification, updated in place once the check completes
+        """
+        verification = Verification(verification_id=uuid.uuid4().hex)
+        self._verifications.put(verification.verification_id, verification)
+        # Runs in a context of its own: the request's metrics are summarized before the check ends, and the check's
+        # OpenAI requests go through the rate limiter at low priority rather than the answer's high one
+        task = asyncio.get_running_loop().create_task(
+            self._verify(verification, prompt, generation, resources), context=contextvars.Context()
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return verification
+
+    async def _verify(self, verification: Verification, prompt: str, generation: str, resources: list[Resource]):
+        async with self._limit.semaphore():
+            try:
+                verdict = await self._agrade({"prompt": prompt, "generation": generation, "resources": resources})
+                match verdict:
+                    case "useful":
+                        status = VerificationStatus.GROUNDED
+                    case "not useful":
+                        status = VerificationStatus.NOT_USEFUL
+                    case _:
+                        status = VerificationStatus.NOT_GROUNDED
+            except Exception as e:
+                logger.error(f"Failed to verify answer {verification.verification_id}: {str(e)}", exc_info=True)
+                status = VerificationStatus.FAILED
+
+        verification.status = status
+        verification.completed_at = time.time()
+        VERIFICATIONS.labels(status.value).inc()
+
+    def get(self, verification_id: str) -> Verification | None:
+        return self._verifications.get(verification_id)
+
+    async def aclose(self):
+        """Cancels the checks still running, at shutdown"""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._tasks), "verifications": self._verifications.stats()}
@@ -10,7 +10,9 @@ from langchain_openai import OpenAIEmbeddings
 from langchain_pinecone import PineconeVectorStore
 from passlib.context import CryptContext
 
+from backend.cache import TTLCache, normalize_text
 from backend.config import settings
+from backend.rate_limiter import rate_limited_http_clients
 
 LOCAL_EXTRACTS_DIRECTORY = os.path.join("resources", "extracts")
 BASE_RESOURCES_PATH = os.path.join("resources")
@@ -78,14 +80,65 @@ def fetch_file_from_s3(key: str, dest_filename: str | None):
 
 @lru_cache
 def get_pinecone_vector_store():
-    embeddings = OpenAIEmbeddings(model=settings.OPENAI_EMBEDDINGS_MODEL)
+    http_client, http_async_client = rate_limited_http_clients()
+    embeddings = OpenAIEmbeddings(
+        model=settings.OPENAI_EMBEDDINGS_MODEL, http_client=http_client, http_async_client=http_async_client
+    )
     return PineconeVectorStore(index=settings.PINECONE_INDEX_NAME, embedding=embeddings)
 
 
+class CachedSearchTool:
+    """
+    Wraps a search tool or retriever so that identical queries with identical tool parameters share one result for the
+    lifetime of the cache, and concurrent identical queries share a single outbound call. Only non-empty lists of
+    results are cached: Tavily reports API failures by returning the error as a string, which is retried next time.
+    """
+
+    def __init__(self, tool, cache: TTLCache, name: str, params: dict):
+        self.tool = tool
+        self.cache = cache
+        self.name = name
+        self.params = tuple(sorted(params.items()))
+
+    def _key(self, tool_input) -> tuple:
+        query = tool_input["query"] if isinstance(tool_input, dict) else tool_input
+        return self.name, normalize_text(query), self.params
+
+    @staticmethod
+    def _cacheable(results) -> bool:
+        return isinstance(results, list) and len(results) > 0
+
+    def invoke(self, tool_input, config=None):
+        return self.cache.get_or_compute(
+            self._key(tool_input), lambda: self.tool.invoke(tool_input, config), cacheable=self._cacheable
+        )
+
+    async def ainvoke(self, tool_input, config=None):
+        return await self.cache.aget_or_compute(
+            self._key(tool_input), lambda: self.tool.ainvoke(tool_input, config), cacheable=self._cacheable
+        )
+
+
+@lru_cache
+def get_tool_cache(name: str) -> TTLCache:
+    path = None
+    if settings.TOOL_CACHE_DIR:
+        ensure_directory_exists(settings.TOOL_CACHE_DIR)
+        path = os.path.join(settings.TOOL_CACHE_DIR, f"{name}.pkl")
+    return TTLCache(maxsize=settings.TOOL_CACHE_MAX_ENTRIES, ttl_seconds=settings.TOOL_CACHE_TTL_SECONDS, path=path)
+
+
+def save_tool_caches():
+    for name in ("tavily", "arxiv"):
+        get_tool_cache(name).save()
+
+
 def get_tavily_web_search_tool():
     os.environ["TAVILY_API_KEY"] = settings.TAVILY_API_KEY
-    return TavilySearchResults(max_results=5, search_depth="advanced", include_answer=True)
+    params = {"max_results": 5, "search_depth": "advanced", "include_answer": True}
+    return CachedSearchTool(TavilySearchResults(**params), cache=get_tool_cache("tavily"), name="tavily", params=params)
 
 
 def get_arxiv_search_tool():
-    return ArxivRetriever(load_max_docs=2, get_full_documents=False)
+    params = {"load_max_docs": 2, "get_full_documents": False}
+    return CachedSearchTool(ArxivRetriever(**params), cache=get_tool_cache("arxiv"), name="arxiv", params=params)
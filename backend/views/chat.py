@@ -1,16 +1,44 @@
 from typing import List
 
 from fastapi import APIRouter, status, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 
-from backend.schemas.chat import QARequest
+from backend.config import settings
+from backend.schemas.chat import MultiQARequest, QARequest
 from backend.services.auth_bearer import get_current_user_id
 from backend.services.chat import (
+    get_answer_verifier,
+    process_multi_qa_query,
     process_qa_query,
+    stream_qa_query,
 )
 
 chat_router = APIRouter(prefix="/chat", tags=["chat"])
 
 
+@chat_router.post(
+    "/qa",
+)
+async def multi_article_question_answer(
+    request: MultiQARequest,
+        # user_id: int = Depends(get_current_user_id)
+):
+    """
+    Process a Q/A query spanning several articles, e.g. comparing papers
+    """
+    # Dedupe keeping the order, the first article is the one single-article steps fall back to
+    article_ids = list(dict.fromkeys(request.article_ids))
+    if not 1 <= len(article_ids) <= settings.MULTI_ARTICLE_MAX_ARTICLES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Between 1 and {settings.MULTI_ARTICLE_MAX_ARTICLES} articles can be asked about at once",
+        )
+    return await process_multi_qa_query(
+            article_ids, request.question, request.model, 1, bypass_cache=request.bypass_cache,
+            session_id=request.session_id
+        )
+
+
 @chat_router.post(
     "/{article_id}/qa",
 )
@@ -22,5 +50,42 @@ async def question_answer(
     Process a Q/A query for a specific article using multi-modal RAG
     """
     return await process_qa_query(
-            article_id, request.question, request.model, 1
+            article_id, request.question, request.model, 1, bypass_cache=request.bypass_cache,
+            session_id=request.session_id
         )
+
+
+@chat_router.post(
+    "/{article_id}/qa/stream",
+    response_class=StreamingResponse,
+)
+async def question_answer_stream(
+    article_id: str, request: QARequest,
+        # user_id: int = Depends(get_current_user_id)
+):
+    """
+    Process a Q/A query for a specific article, streaming graph progress and answer tokens as server-sent events
+    """
+    return StreamingResponse(
+        stream_qa_query(article_id, request.question, request.model, 1, bypass_cache=request.bypass_cache,
+                        session_id=request.session_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@chat_router.get(
+    "/verifications/{verification_id}",
+)
+async def answer_verification(
+    verification_id: str,
+        # user_id: int = Depends(get_current_user_id)
+):
+    """
+    Status of the background check of whether an answer is grounded in the resources it was generated from and answers
+    the question: "pending", "grounded", "not_useful" (grounded but off the question), "not_grounded" or "failed"
+    """
+    verification = get_answer_verifier().get(verification_id)
+    if verification is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Verification not found or expired")
+    return verification.to_dict()
@@ -0,0 +1,174 @@
+"""
+Offline end-to-end benchmark of the research agent.
+
+Builds the real graph with compile_graph from deterministic fakes (chat model with a time to first token and a token
+rate, vector store retriever, arXiv and Tavily tools), drives process_qa_query with a stream of questions at a given
+concurrency, and reports throughput, latency percentiles and LLM calls per question as JSON. Nothing touches the
+network, and any setting the backend requires but the environment doesn't define gets a placeholder, so it runs
+without a .env. Graph settings such as RETRIEVAL_MODE or GRADER_LISTWISE are still read from the environment.
+
+Commit a baseline report and compare it with a new run to catch regressions from changes to the graph topology or the
+grading logic: the report includes the graph's nodes and edges and is reproducible for a given configuration.
+
+Usage:
+    python -m benchmarks.agent --questions 200 --concurrency 16 --output report.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+
+from prometheus_client import REGISTRY
+
+# Placeholders for the settings the backend can't start without, none of which are used with fake components
+REQUIRED_SETTINGS = (
+    "AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_REGION", "AWS_S3_BUCKET", "JWT_SECRET_KEY",
+    "POSTGRES_CONN_STRING", "POSTGRES_HOSTNAME", "POSTGRES_USER", "POSTGRES_PASSWORD", "POSTGRES_DB",
+    "PINECONE_API_KEY", "PINECONE_ENVIRONMENT", "OPENAI_API_KEY", "TAVILY_API_KEY",
+)
+for name in REQUIRED_SETTINGS:
+    os.environ.setdefault(name, "benchmark")
+
+from backend.config import settings  # noqa: E402
+from backend.research_agent import compile_graph, set_agent_workflow  # noqa: E402
+from backend.research_agent.edges import GraphEdges  # noqa: E402
+from backend.research_agent.grader import GraderUtils  # noqa: E402
+from backend.services.chat import process_multi_qa_query, process_qa_query, set_answer_verifier  # noqa: E402
+from backend.services.verification import AnswerVerifier  # noqa: E402
+from benchmarks.fakes import FakeChatModel, FakePaperSearchTool, FakeRetriever, FakeWebSearchTool, Latency  # noqa: E402
+
+
+def percentile(values: list[float], q: int) -> float:
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1] if len(values) > 1 else values[0]
+
+
+def graph_topology(workflow) -> dict:
+    graph = workflow.get_graph()
+    return {
+        "nodes": sorted(graph.nodes),
+        "edges": sorted(f"{edge.source} -> {edge.target}" + (" (conditional)" if edge.conditional else "") for edge in graph.edges),
+    }
+
+
+async def run(args) -> dict:
+    workflow = compile_graph(
+        llm=FakeChatModel(latency=args.llm_latency, tokens_per_second=args.tokens_per_second),
+        retriever=FakeRetriever(Latency(args.vector_latency, args.jitter, seed=args.seed), hit_rate=args.vector_hit_rate, seed=args.seed),
+        paper_search_tool=FakePaperSearchTool(Latency(args.paper_latency, args.jitter, seed=args.seed + 1), hit_rate=args.paper_hit_rate, seed=args.seed + 1),
+        web_search_tool=FakeWebSearchTool(Latency(args.web_latency, args.jitter, seed=args.seed + 2), seed=args.seed + 2),
+        retrieval_mode=args.retrieval_mode,
+        speculative_generation=args.speculative_generation,
+    )
+    set_agent_workflow(workflow)
+    # Answers are verified in the background when VERIFICATION_ENABLED is set, which would otherwise call OpenAI
+    grader = GraderUtils(llm=FakeChatModel(latency=args.llm_latency))
+    verifier = AnswerVerifier(
+        model="fake-chat-model", edges=GraphEdges(grader.create_hallucination_grader(), grader.create_code_evaluator())
+    )
+    set_answer_verifier(verifier)
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, llm_calls, tokens, sources, errors = [], [], Counter(), Counter(), 0
+
+    async def ask(index: int):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                if args.articles_per_question > 1:
+                    article_ids = [f"article-{(index + offset) % args.articles}" for offset in range(args.articles_per_question)]
+                    response = await process_multi_qa_query(
+                        article_ids, f"Question {index} about the papers", "", 1, bypass_cache=True
+                    )
+                else:
+                    response = await process_qa_query(
+                        f"article-{index % args.articles}", f"Question {index} about the paper", "", 1, bypass_cache=True
+                    )
+            except Exception as e:
+                print(f"Question {index} failed: {e}", file=sys.stderr)
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - start)
+            metrics = response["metrics"]
+            llm_calls.append(metrics["llm_calls"])
+            tokens.update(prompt=metrics["prompt_tokens"], completion=metrics["completion_tokens"])
+            # The last source retrieved from is the one the answer was generated from
+            sources[next((step for step in reversed(response["steps"]) if step.endswith("_retrieval")), "none")] += 1
+
+    start = time.perf_counter()
+    # The graph nodes print progress banners, keep them off stdout so the report stays machine-readable
+    with contextlib.redirect_stdout(sys.stderr):
+        await asyncio.gather(*(ask(index) for index in range(args.questions)))
+    wall_seconds = time.perf_counter() - start
+    await verifier.aclose()
+
+    return {
+        "config": {
+            **{key: value for key, value in vars(args).items() if key != "output"},
+            "retrieval_mode": args.retrieval_mode or settings.RETRIEVAL_MODE,
+            "grader_listwise": settings.GRADER_LISTWISE,
+            "reranker_enabled": settings.RERANKER_ENABLED,
+            "speculative_generation": settings.SPECULATIVE_GENERATION if args.speculative_generation is None else args.speculative_generation,
+        },
+        "graph": graph_topology(workflow),
+        "questions": args.questions,
+        "errors": errors,
+        "wall_seconds": round(wall_seconds, 4),
+        "throughput_qps": round(len(latencies) / wall_seconds, 4),
+        "latency_seconds": {
+            "mean": round(statistics.fmean(latencies), 4),
+            "p50": round(percentile(latencies, 50), 4),
+            "p95": round(percentile(latencies, 95), 4),
+            "p99": round(percentile(latencies, 99), 4),
+            "max": round(max(latencies), 4),
+        } if latencies else None,
+        "llm_calls_per_question": round(statistics.fmean(llm_calls), 4) if llm_calls else None,
+        "tokens_per_question": {kind: round(count / len(latencies), 1) for kind, count in tokens.items()} if latencies else None,
+        "answered_from": dict(sources),
+        # Process-wide counters, the benchmark is the only thing running in the process
+        "speculation": {
+            "kept": REGISTRY.get_sample_value("research_agent_speculative_generations_total", {"outcome": "kept"}) or 0,
+            "discarded": REGISTRY.get_sample_value("research_agent_speculative_generations_total", {"outcome": "discarded"}) or 0,
+            "latency_saved_seconds": round(REGISTRY.get_sample_value("research_agent_speculation_saved_seconds_total") or 0.0, 4),
+            "wasted_generation_seconds": round(REGISTRY.get_sample_value("research_agent_speculation_wasted_seconds_total") or 0.0, 4),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--articles", type=int, default=10, help="Questions are spread over this many articles")
+    parser.add_argument("--articles-per-question", type=int, default=1,
+                        help="Ask multi-article questions spanning this many articles")
+    parser.add_argument("--retrieval-mode", choices=("serial", "fanout"), default=None, help="Defaults to RETRIEVAL_MODE")
+    parser.add_argument("--speculative-generation", action=argparse.BooleanOptionalAction, default=None,
+                        help="Defaults to SPECULATIVE_GENERATION")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Seconds to the first token of each LLM call")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="LLM output rate, 0 for instantaneous")
+    parser.add_argument("--vector-latency", type=float, default=0.1)
+    parser.add_argument("--paper-latency", type=float, default=1.0)
+    parser.add_argument("--web-latency", type=float, default=1.5)
+    parser.add_argument("--jitter", type=float, default=0.3, help="Spread of the search latencies, as a fraction")
+    parser.add_argument("--vector-hit-rate", type=float, default=0.7)
+    parser.add_argument("--paper-hit-rate", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    report = json.dumps(asyncio.run(run(args)), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
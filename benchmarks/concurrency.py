@@ -0,0 +1,70 @@
+"""
+Concurrency benchmark for /chat/{article_id}/qa.
+
+Runs the real agent graph with fake components whose LLM calls sleep for a fixed latency, sends N questions to the
+FastAPI app at once and reports the wall-clock time against a single request. With the async execution path the
+batch finishes in roughly one request latency, and unrelated endpoints stay responsive while it runs
+(tests/test_event_loop.py asserts both).
+
+Usage:
+    python -m benchmarks.concurrency --requests 20 --latency 0.5
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from backend.research_agent import compile_graph, set_agent_workflow
+from benchmarks.fakes import FakeChatModel, FakeRetriever, FakeWebSearchTool, FakePaperSearchTool
+
+
+async def ask(client: httpx.AsyncClient, article_id: str) -> float:
+    start = time.perf_counter()
+    response = await client.post(f"/chat/{article_id}/qa", json={"question": "What is the main contribution?", "model": "", "bypass_cache": True})
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def probe(client: httpx.AsyncClient) -> float:
+    start = time.perf_counter()
+    response = await client.get("/openapi.json")
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def run(requests: int, latency: float):
+    set_agent_workflow(compile_graph(
+        llm=FakeChatModel(latency=latency), retriever=FakeRetriever(latency=latency / 10),
+        web_search_tool=FakeWebSearchTool(latency=latency), paper_search_tool=FakePaperSearchTool(latency=latency),
+    ))
+    from backend.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        single = await ask(client, "article-0")
+
+        start = time.perf_counter()
+        batch = asyncio.gather(*(ask(client, f"article-{index}") for index in range(requests)))
+        await asyncio.sleep(latency / 2)
+        probe_latency = await probe(client)
+        latencies = await batch
+        elapsed = time.perf_counter() - start
+
+    print(f"single request:           {single:.3f}s")
+    print(f"{requests} concurrent requests:  {elapsed:.3f}s wall clock ({elapsed / single:.2f}x a single request)")
+    print(f"slowest concurrent:       {max(latencies):.3f}s")
+    print(f"/openapi.json during run: {probe_latency * 1000:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds each fake LLM and search call takes")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.requests, args.latency))
+
+
+if __name__ == "__main__":
+    main()
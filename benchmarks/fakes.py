@@ -0,0 +1,240 @@
+"""
+Deterministic, network-free stand-ins for the components that compile_graph wires together.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from typing import AsyncIterator, Iterator
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from llama_index.core.base.embeddings.base import BaseEmbedding
+
+from backend.research_agent.graph import Resource
+from backend.research_agent.vector_store import Retriever
+
+
+# Resources containing this marker are graded as irrelevant by FakeChatModel
+OFF_TOPIC = "off-topic"
+
+
+class Latency:
+    """Seconds to sleep per call, `latency` spread uniformly by +/- `jitter` (a fraction of `latency`)"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self._random = random.Random(seed)
+
+    def sample(self) -> float:
+        return max(0.0, self.latency * self._random.uniform(1 - self.jitter, 1 + self.jitter))
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model that answers the grader prompts with well-formed JSON and everything else with a fixed answer. Each call
+    waits `latency` seconds before the first token and then produces `tokens_per_second` tokens (0 for all at once),
+    streaming word by word when streamed. Documents are graded relevant unless `relevant` is False or they contain
+    OFF_TOPIC, answers grounded unless `grounded` is False, and answering the question unless `useful` is False. Token
+    usage is reported with roughly 4 characters per prompt token and one token per answer word.
+    """
+    latency: float = 0.0
+    tokens_per_second: float = 0.0
+    relevant: bool = True
+    grounded: bool = True
+    useful: bool = True
+    answer: str = "The paper proposes a retrieval augmented research agent."
+    model_name: str = "fake-chat-model"
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    def _score(self, document: str) -> str:
+        return "yes" if self.relevant and OFF_TOPIC not in document else "no"
+
+    def _content(self, messages) -> tuple[str, str]:
+        prompt = "\n".join(str(message.content) for message in messages)
+
+        if "one key per document number" in prompt:
+            documents = prompt.split("Retrieved Documents:", 1)[1].split("User Prompt:", 1)[0]
+            parts = re.split(r"(?m)^\s*(\d+)\. ", documents)
+            content = json.dumps({number: self._score(text) for number, text in zip(parts[1::2], parts[2::2])})
+        elif "grounded in / supported by" in prompt:
+            content = json.dumps({"score": "yes" if self.grounded else "no"})
+        elif "correct and relevant to the given question" in prompt:
+            content = json.dumps({"score": "yes" if self.useful else "no", "feedback": ""})
+        elif 'single key "score"' in prompt:
+            content = json.dumps({"score": self._score(prompt.split("User Prompt:", 1)[0])})
+        else:
+            content = self.answer
+        return prompt, content
+
+    def _usage(self, prompt: str, content: str) -> dict:
+        input_tokens, output_tokens = len(prompt) // 4, len(content.split())
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+    def _message(self, prompt: str, content: str) -> AIMessage:
+        return AIMessage(content=content, usage_metadata=self._usage(prompt, content),
+                         response_metadata={"model_name": self.model_name})
+
+    def _generation_time(self, content: str) -> float:
+        return self.latency + (len(content.split()) / self.tokens_per_second if self.tokens_per_second else 0.0)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        prompt, content = self._content(messages)
+        time.sleep(self._generation_time(content))
+        return ChatResult(generations=[ChatGeneration(message=self._message(prompt, content))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        prompt, content = self._content(messages)
+        await asyncio.sleep(self._generation_time(content))
+        return ChatResult(generations=[ChatGeneration(message=self._message(prompt, content))])
+
+    def _chunks(self, prompt: str, content: str) -> list[ChatGenerationChunk]:
+        words = content.split(" ")
+        chunks = [ChatGenerationChunk(message=AIMessageChunk(content=word if index == 0 else f" {word}"))
+                  for index, word in enumerate(words)]
+        # Usage and model name come with the last chunk, like OpenAI with stream_usage
+        chunks[-1] = ChatGenerationChunk(message=AIMessageChunk(
+            content=chunks[-1].message.content, usage_metadata=self._usage(prompt, content),
+            response_metadata={"model_name": self.model_name},
+        ))
+        return chunks
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        prompt, content = self._content(messages)
+        time.sleep(self.latency)
+        for chunk in self._chunks(prompt, content):
+            if self.tokens_per_second:
+                time.sleep(1 / self.tokens_per_second)
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.message.content, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        prompt, content = self._content(messages)
+        await asyncio.sleep(self.latency)
+        for chunk in self._chunks(prompt, content):
+            if self.tokens_per_second:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.message.content, chunk=chunk)
+            yield chunk
+
+
+class FakeEmbedding(BaseEmbedding):
+    """Embedding model that maps each text to a fixed pseudo-random unit vector, seeded by the text's hash"""
+    dimension: int = 1536
+
+    def _embed(self, text: str) -> list[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dimension)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def _get_query_embedding(self, query: str) -> list[float]:
+        return self._embed(query)
+
+    async def _aget_query_embedding(self, query: str) -> list[float]:
+        return self._embed(query)
+
+    def _get_text_embedding(self, text: str) -> list[float]:
+        return self._embed(text)
+
+
+class _FakeSource:
+    """
+    Base for fake retrieval sources. Each call sleeps for a sampled latency and, with probability `1 - hit_rate`,
+    returns results marked OFF_TOPIC.
+    """
+
+    def __init__(self, latency: float | Latency = 0.0, hit_rate: float = 1.0, seed: int = 0):
+        self.latency = latency if isinstance(latency, Latency) else Latency(latency, seed=seed)
+        self.hit_rate = hit_rate
+        self._random = random.Random(seed)
+
+    def _topic(self) -> str:
+        return "" if self._random.random() < self.hit_rate else f" ({OFF_TOPIC})"
+
+
+class FakeRetriever(_FakeSource):
+    """Fake Retriever whose similarity scores are drawn from a higher range for relevant results than OFF_TOPIC ones"""
+
+    def __init__(self, latency: float | Latency = 0.0, top_k: int = 5, hit_rate: float = 1.0, seed: int = 0):
+        super().__init__(latency, hit_rate, seed)
+        self.top_k = top_k
+
+    def _results(self, query, article_id):
+        topic = self._topic()
+        low, high = (0.05, 0.3) if topic else (0.45, 0.75)
+        return [
+            Resource(content=f"Passage {index} of article {article_id} about {query}{topic}", source="vector_store",
+                     score=self._random.uniform(low, high), node_id=f"{article_id}-{index}", article_id=article_id)
+            for index in range(self.top_k)
+        ]
+
+    def search(self, query, article_id):
+        time.sleep(self.latency.sample())
+        return self._results(query, article_id)
+
+    async def asearch(self, query, article_id):
+        await asyncio.sleep(self.latency.sample())
+        return self._results(query, article_id)
+
+    def multi_search(self, query, article_ids, quota=3):
+        # The articles are searched concurrently, so the whole search takes one search latency
+        time.sleep(self.latency.sample())
+        return Retriever._merge_articles([self._results(query, article_id) for article_id in article_ids], quota)
+
+    async def amulti_search(self, query, article_ids, quota=3):
+        results = await asyncio.gather(*(self.asearch(query, article_id) for article_id in article_ids))
+        return Retriever._merge_articles(list(results), quota)
+
+    def sim_search(self, query, article_id):
+        return [resource.content for resource in self.search(query, article_id)]
+
+    async def asim_search(self, query, article_id):
+        return [resource.content for resource in await self.asearch(query, article_id)]
+
+
+class FakeWebSearchTool(_FakeSource):
+    def __init__(self, latency: float | Latency = 0.0, max_results: int = 5, hit_rate: float = 1.0, seed: int = 0):
+        super().__init__(latency, hit_rate, seed)
+        self.max_results = max_results
+
+    def _results(self, query):
+        topic = self._topic()
+        return [{"url": f"https://example.com/{index}", "content": f"Web result {index} for {query}{topic}", "score": 0.5}
+                for index in range(self.max_results)]
+
+    def invoke(self, inputs, config=None):
+        time.sleep(self.latency.sample())
+        return self._results(inputs["query"])
+
+    async def ainvoke(self, inputs, config=None):
+        await asyncio.sleep(self.latency.sample())
+        return self._results(inputs["query"])
+
+
+class FakePaperSearchTool(_FakeSource):
+    def __init__(self, latency: float | Latency = 0.0, load_max_docs: int = 2, hit_rate: float = 1.0, seed: int = 0):
+        super().__init__(latency, hit_rate, seed)
+        self.load_max_docs = load_max_docs
+
+    def _results(self, query):
+        topic = self._topic()
+        return [Document(page_content=f"Abstract of paper {index} on {query}{topic}") for index in range(self.load_max_docs)]
+
+    def invoke(self, query, config=None):
+        time.sleep(self.latency.sample())
+        return self._results(query)
+
+    async def ainvoke(self, query, config=None):
+        await asyncio.sleep(self.latency.sample())
+        return self._results(query)
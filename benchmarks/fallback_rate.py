@@ -0,0 +1,83 @@
+"""
+Measures how often each retriever mode avoids the paper/web search fallback on a recorded question set.
+
+Runs only the vector_search and vector_search_evaluate nodes of the serial graph for every question, with the dense
+and the hybrid (BM25 + dense) retriever, and counts the questions for which the graph would go on to generate from
+the vector store instead of falling back to arXiv. Retrieval uses VECTOR_BACKEND and LOCAL_INDEX_DIR, and grading
+the real LLM grader, so this needs the same .env as the backend and a local index built with
+backend.research_agent.local_index for the BM25 side.
+
+The question set is a JSONL file of {"article_id": ..., "question": ...} objects.
+
+Usage:
+    python -m benchmarks.fallback_rate questions.jsonl
+"""
+import argparse
+import asyncio
+import json
+
+from langchain_openai import ChatOpenAI
+
+from backend.config import settings
+from backend.research_agent.edges import GraphEdges
+from backend.research_agent.grader import GraderUtils
+from backend.research_agent.nodes import GraphNodes
+from backend.research_agent.vector_store import create_retriever
+
+
+def load_questions(path: str) -> list[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def run_mode(mode: str, questions: list[dict], llm) -> list[bool]:
+    grader = GraderUtils(llm=llm)
+    graph_nodes = GraphNodes(
+        llm=llm, retriever=create_retriever(mode), retrieval_grader=grader.create_retrieval_grader(),
+        web_search_tool=None, paper_search_tool=None, grading_concurrency=settings.GRADER_MAX_CONCURRENCY,
+        grading_timeout=settings.GRADER_TIMEOUT_SECONDS,
+        listwise_grader=grader.create_listwise_retrieval_grader() if settings.GRADER_LISTWISE else None,
+    )
+    graph_edges = GraphEdges(None, None)
+
+    avoided = []
+    for question in questions:
+        state = {"prompt": question["question"], "article_id": question["article_id"]}
+        state = await graph_nodes.avector_store_retrieve(state)
+        state = await graph_nodes.agrade_vector_store_documents(state)
+        avoided.append(graph_edges.vector_search_decide_to_generate(state) == "relevant")
+    return avoided
+
+
+async def run(args):
+    questions = load_questions(args.questions)
+    llm = ChatOpenAI(model=args.model, temperature=0, openai_api_key=settings.OPENAI_API_KEY)
+
+    results = {mode: await run_mode(mode, questions, llm) for mode in ("dense", "hybrid")}
+
+    print(f"{len(questions)} questions")
+    print(f"{'mode':<8} {'fallback avoided':>17}")
+    for mode, avoided in results.items():
+        print(f"{mode:<8} {sum(avoided):>6}/{len(avoided):<4} {sum(avoided) / len(avoided):>6.1%}")
+
+    rescued = [q for q, dense, hybrid in zip(questions, results["dense"], results["hybrid"]) if hybrid and not dense]
+    lost = [q for q, dense, hybrid in zip(questions, results["dense"], results["hybrid"]) if dense and not hybrid]
+    print(f"answered from the vector store only with hybrid: {len(rescued)}, only with dense: {len(lost)}")
+    if args.verbose:
+        for label, items in (("hybrid only", rescued), ("dense only", lost)):
+            for question in items:
+                print(f"  [{label}] {question['article_id']}: {question['question']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("questions", help="JSONL file of {article_id, question} objects")
+    parser.add_argument("--model", default="gpt-4o-mini", help="Grader model")
+    parser.add_argument("--verbose", action="store_true", help="List the questions whose outcome differs between modes")
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
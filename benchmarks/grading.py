@@ -0,0 +1,72 @@
+"""
+Benchmark for relevance grading in GraphNodes.
+
+Grades a batch of resources with a fake grader whose calls sleep for a fixed latency, once with grading forced to
+run serially and once concurrently. Serial grading takes roughly the sum of all grader latencies, concurrent grading
+roughly the latency of the slowest call.
+
+Usage:
+    python -m benchmarks.grading --resources 7 --min-latency 0.2 --max-latency 0.8
+"""
+import argparse
+import random
+import time
+
+from langchain_core.language_models import FakeListChatModel
+
+from backend.research_agent.graph import Resource
+from backend.research_agent.nodes import GraphNodes
+
+
+class FakeSlowGrader:
+    def __init__(self, latencies: list[float]):
+        self.latencies = latencies
+
+    def invoke(self, inputs: dict):
+        resource = inputs["resources"]
+        time.sleep(self.latencies[int(resource.split("-")[-1])])
+        return {"score": "yes"}
+
+
+def run(resources: list[Resource], grader: FakeSlowGrader, concurrency: int) -> float:
+    graph_nodes = GraphNodes(
+        llm=FakeListChatModel(responses=[""]), retriever=None, retrieval_grader=grader, web_search_tool=None,
+        paper_search_tool=None, grading_concurrency=concurrency, grading_timeout=30.0
+    )
+    state = {"prompt": "What is the main contribution?", "resources": list(resources), "steps": []}
+
+    start = time.perf_counter()
+    state = graph_nodes.grade_vector_store_documents(state)
+    elapsed = time.perf_counter() - start
+
+    assert state["resources"] == resources, "grading must keep every resource in input order"
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resources", type=int, default=7)
+    parser.add_argument("--min-latency", type=float, default=0.2)
+    parser.add_argument("--max-latency", type=float, default=0.8)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    latencies = [random.uniform(args.min_latency, args.max_latency) for _ in range(args.resources)]
+    resources = [Resource(content=f"resource-{index}", source="vector_store") for index in range(args.resources)]
+    grader = FakeSlowGrader(latencies)
+
+    serial = run(resources, grader, concurrency=1)
+    concurrent = run(resources, grader, concurrency=args.concurrency)
+
+    print(f"resources:              {args.resources}")
+    print(f"sum of grader latency:  {sum(latencies):.3f}s")
+    print(f"max grader latency:     {max(latencies):.3f}s")
+    print(f"serial grading:         {serial:.3f}s")
+    print(f"concurrent grading:     {concurrent:.3f}s (concurrency={args.concurrency})")
+    print(f"speedup:                {serial / concurrent:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
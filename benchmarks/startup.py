@@ -0,0 +1,70 @@
+"""
+Startup benchmark for the FastAPI backend.
+
+Starts the app in a fresh interpreter once with the agent graph warmed up in the lifespan and once with it built
+lazily on the first request, and reports import time, lifespan startup time and first-request latency for each.
+The first request is a real /chat/{article_id}/qa call, so this needs the same .env as the backend.
+
+Usage:
+    python -m benchmarks.startup --article-id <a_id> --question "What is the main contribution?"
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+async def child(article_id: str, question: str):
+    start = time.perf_counter()
+    from backend.main import app
+    import_time = time.perf_counter() - start
+
+    import httpx
+
+    start = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        startup_time = time.perf_counter() - start
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            start = time.perf_counter()
+            response = await client.post(
+                f"/chat/{article_id}/qa", json={"question": question, "model": "", "bypass_cache": True}
+            )
+            response.raise_for_status()
+            first_request = time.perf_counter() - start
+
+    print(json.dumps({"import": import_time, "startup": startup_time, "first_request": first_request}))
+
+
+def run_mode(warmup: bool, args) -> dict:
+    env = os.environ | {"AGENT_WARMUP_ON_STARTUP": str(warmup).lower()}
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "--child", "--article-id", args.article_id, "--question", args.question],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--article-id", required=True)
+    parser.add_argument("--question", default="What is the main contribution of this paper?")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        asyncio.run(child(args.article_id, args.question))
+        return
+
+    print(f"{'mode':<8} {'import':>8} {'startup':>8} {'first request':>14}")
+    for mode, warmup in (("warm", True), ("lazy", False)):
+        timings = run_mode(warmup, args)
+        print(f"{mode:<8} {timings['import']:>7.3f}s {timings['startup']:>7.3f}s {timings['first_request']:>13.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Query latency and memory benchmark for the Pinecone and local vector backends of the Retriever.
+
+Both backends are loaded with the same synthetic corpus of articles and chunk embeddings. Pinecone is stood in for by
+llama-index's in-memory SimpleVectorStore behind the regular Retriever, so the query goes through the same
+VectorIndexRetriever, doc_id filter and docstore lookup as in production, plus a simulated network round trip
+(--pinecone-rtt). The local backend is the memory-mapped LocalVectorIndex. Memory is the Python heap held by each
+backend after loading, measured with tracemalloc; the local index's embedding matrix is memory-mapped and paged in
+by the OS, so its file size is reported separately.
+
+Usage:
+    python -m benchmarks.vector_backends --articles 50 --chunks 60 --queries 500
+"""
+import argparse
+import gc
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from llama_index.core import StorageContext, VectorStoreIndex
+from llama_index.core.schema import NodeRelationship, RelatedNodeInfo, TextNode
+from llama_index.core.vector_stores import SimpleVectorStore
+
+from backend.research_agent.local_index import EMBEDDINGS_FILE, LocalRetriever, LocalVectorIndex
+from backend.research_agent.vector_store import Retriever
+from benchmarks.fakes import FakeEmbedding
+
+
+class FakePineconeVectorStore(SimpleVectorStore):
+    """SimpleVectorStore that sleeps for a network round trip on every query"""
+    rtt: float = 0.0
+
+    def query(self, query, **kwargs):
+        time.sleep(self.rtt)
+        return super().query(query, **kwargs)
+
+
+def percentile(values: list[float], q: int) -> float:
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1] if len(values) > 1 else values[0]
+
+
+def make_chunks(args) -> list[dict]:
+    rng = np.random.default_rng(0)
+    return [
+        {
+            "article_id": f"article-{article}",
+            "node_id": f"article-{article}-chunk-{chunk}",
+            "text": f"Chunk {chunk} of article {article}. " * 20,
+            "embedding": rng.standard_normal(args.dimension).astype(np.float32).tolist(),
+        }
+        for article in range(args.articles) for chunk in range(args.chunks)
+    ]
+
+
+def build_pinecone(chunks: list[dict], embed_model, args) -> Retriever:
+    nodes = [
+        TextNode(id_=chunk["node_id"], text=chunk["text"], embedding=chunk["embedding"],
+                 relationships={NodeRelationship.SOURCE: RelatedNodeInfo(node_id=chunk["article_id"])})
+        for chunk in chunks
+    ]
+    vector_store = FakePineconeVectorStore()
+    # SimpleVectorStore's constructor doesn't forward extra fields
+    vector_store.rtt = args.pinecone_rtt
+    storage_context = StorageContext.from_defaults(vector_store=vector_store)
+    index = VectorStoreIndex(nodes, storage_context=storage_context, embed_model=embed_model)
+    return Retriever(vector_store=index)
+
+
+def build_local(chunks: list[dict], embed_model, directory: str) -> LocalRetriever:
+    LocalVectorIndex.build(chunks, directory)
+    # Reopen so the measured heap is what a fresh process holds, not what building needed
+    return LocalRetriever(index=LocalVectorIndex(directory), embed_model=embed_model)
+
+
+def measure(name: str, build, queries: list[tuple[str, str]]):
+    gc.collect()
+    tracemalloc.start()
+    retriever = build()
+    gc.collect()
+    heap = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # Embed every query up front so only the search is timed
+    for query, _ in queries:
+        retriever.embed_query(query)
+
+    latencies = []
+    for query, article_id in queries:
+        start = time.perf_counter()
+        results = retriever.sim_search(query, article_id)
+        latencies.append(time.perf_counter() - start)
+        assert len(results) == 5, f"{name} returned {len(results)} results for {article_id}"
+
+    print(f"{name:<10} {percentile(latencies, 50) * 1000:>8.2f}ms {percentile(latencies, 95) * 1000:>8.2f}ms "
+          f"{heap / 2 ** 20:>9.1f}MB")
+    return retriever
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=50)
+    parser.add_argument("--chunks", type=int, default=60, help="Chunks per article")
+    parser.add_argument("--dimension", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--pinecone-rtt", type=float, default=0.03, help="Simulated Pinecone round trip in seconds")
+    args = parser.parse_args()
+
+    chunks = make_chunks(args)
+    embed_model = FakeEmbedding(dimension=args.dimension)
+    rng = random.Random(0)
+    queries = [(f"Question {index}", f"article-{rng.randrange(args.articles)}") for index in range(args.queries)]
+
+    print(f"{len(chunks)} chunks, {args.dimension} dimensions, {args.queries} queries")
+    print(f"{'backend':<10} {'p50':>10} {'p95':>10} {'heap':>11}")
+    measure("pinecone", lambda: build_pinecone(chunks, embed_model, args), queries)
+    with tempfile.TemporaryDirectory() as directory:
+        measure("local", lambda: build_local(chunks, embed_model, directory), queries)
+        print(f"local index embedding file: {os.path.getsize(os.path.join(directory, EMBEDDINGS_FILE)) / 2 ** 20:.1f}MB (memory-mapped)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import json
 import os
 from datetime import datetime
 import psycopg2
@@ -132,4 +133,54 @@ def get_all_articles():
         return results
     finally:
         cursor.close()
-        conn.close()
\ No newline at end of file
+        conn.close()
+
+def upsert_article_digest(a_id, digest, faq, model, embedding_model):
+    """Store the ingest-time digest and canonical Q&A pairs of an article, replacing earlier ones"""
+    conn = psycopg2.connect(
+        host=db_host,
+        database=db_name,
+        user=db_user,
+        password=db_password,
+        port=db_port
+    )
+
+    cursor = conn.cursor()
+    success = False
+
+    try:
+        create_table_query = """
+        CREATE TABLE IF NOT EXISTS article_digests (
+            a_id TEXT PRIMARY KEY,
+            digest TEXT,
+            faq JSONB,
+            model TEXT,
+            embedding_model TEXT,
+            created_at TIMESTAMPTZ DEFAULT NOW()
+        );
+        """
+        cursor.execute(create_table_query)
+
+        upsert_query = """
+        INSERT INTO article_digests (a_id, digest, faq, model, embedding_model)
+        VALUES (%s, %s, %s::jsonb, %s, %s)
+        ON CONFLICT (a_id)
+        DO UPDATE SET digest = EXCLUDED.digest,
+            faq = EXCLUDED.faq,
+            model = EXCLUDED.model,
+            embedding_model = EXCLUDED.embedding_model,
+            created_at = NOW();
+        """
+
+        cursor.execute(upsert_query, (a_id, digest, json.dumps(faq), model, embedding_model))
+        conn.commit()
+        success = True
+
+    except Exception as e:
+        print(f"An error occurred storing the article digest: {e}")
+        conn.rollback()
+    finally:
+        cursor.close()
+        conn.close()
+
+    return success
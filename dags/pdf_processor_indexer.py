@@ -2,14 +2,31 @@ import os
 import json
 from datetime import datetime
 from llama_index.core import SimpleDirectoryReader, StorageContext, VectorStoreIndex
+from llama_index.core.ingestion import IngestionPipeline
+from llama_index.core.node_parser import SentenceSplitter
 from llama_index.readers.docling import DoclingReader
 from llama_index.embeddings.openai import OpenAIEmbedding
+from llama_index.llms.openai import OpenAI
 from llama_index.vector_stores.pinecone import PineconeVectorStore
 from pinecone import Pinecone
 from dotenv import load_dotenv
 import boto3
 from botocore.exceptions import ClientError
-from articles import update_processed_article
+from articles import update_processed_article, upsert_article_digest
+# backend/research_agent/lexical_index.py, mounted on the PYTHONPATH of the Airflow containers
+from lexical_index import publish_index
+
+# Opening questions readers of a new paper ask, answered once at ingest time
+CANONICAL_QUESTIONS = [
+    "What is the main contribution of the paper?",
+    "What problem does the paper address?",
+    "Summarize the method.",
+    "What datasets are used?",
+    "What are the main results?",
+    "What are the limitations of the approach?",
+]
+# Characters of an article given to the digest model, about 15k tokens
+DIGEST_MAX_CHARS = 60000
 
 class DocumentProcessor:
     def __init__(self):
@@ -28,6 +45,9 @@ class DocumentProcessor:
         self.aws_access_key = os.getenv('AWS_ACCESS_KEY_ID')
         self.aws_secret_key = os.getenv('AWS_SECRET_ACCESS_KEY')
         self.aws_s3_bucket = os.getenv('AWS_S3_BUCKET')
+        self.vector_export_dir = os.getenv('VECTOR_EXPORT_DIR', '/tmp/vector_exports')
+        self.lexical_index_s3_prefix = os.getenv('LEXICAL_INDEX_S3_PREFIX', 'lexical_index')
+        self.digest_model = os.getenv('DIGEST_MODEL', 'gpt-4o-mini')
 
         # Set OpenAI API key
         os.environ['OPENAI_API_KEY'] = self.openai_api_key
@@ -36,6 +56,7 @@ class DocumentProcessor:
         self._init_s3_client()
         self._init_pinecone()
         self._init_embedding_model()
+        self._init_llm()
         
         # Initialize readers
         self.docling_reader = DoclingReader()
@@ -61,13 +82,22 @@ class DocumentProcessor:
             embed_batch_size=10
         )
 
-    def save_to_s3(self, content, filename):
+    def _init_llm(self):
+        """Initialize the OpenAI model that writes the article digests"""
+        self.llm = OpenAI(
+            model=self.digest_model,
+            temperature=0,
+            additional_kwargs={"response_format": {"type": "json_object"}}
+        )
+
+    def save_to_s3(self, content, filename, content_type='text/markdown'):
         """
         Save content to S3 bucket
         
         Args:
             content (str): Content to save
             filename (str): Filename/key for S3 object
+            content_type (str): MIME type of the content
             
         Returns:
             str: S3 URL of saved object
@@ -77,13 +107,52 @@ class DocumentProcessor:
                 Bucket=self.aws_s3_bucket,
                 Key=filename,
                 Body=content,
-                ContentType='text/markdown'
+                ContentType=content_type
             )
             return f"s3://{self.aws_s3_bucket}/{filename}"
         except ClientError as e:
             print(f"Error uploading to S3: {e}")
             raise
 
+    def export_chunks(self, nodes, timestamp):
+        """
+        Save the embedded chunks locally, for building the backend's in-process vector index
+
+        Args:
+            nodes (list[BaseNode]): Chunks with their embeddings
+            timestamp (str): Run timestamp, used as the export filename
+
+        Returns:
+            str: Path of the export file
+        """
+        os.makedirs(self.vector_export_dir, exist_ok=True)
+        export_path = os.path.join(self.vector_export_dir, f"{timestamp}.jsonl")
+        with open(export_path, "w") as f:
+            for node in nodes:
+                f.write(json.dumps({
+                    "article_id": node.ref_doc_id,
+                    "node_id": node.node_id,
+                    "text": node.get_content(),
+                    "embedding": node.embedding
+                }) + "\n")
+        return export_path
+
+    def publish_lexical_index(self, nodes, timestamp):
+        """
+        Merge the chunks of this run into the BM25 index published on S3, which the backend downloads at startup for
+        hybrid search over Pinecone. Re-indexed articles replace their old chunks.
+
+        Args:
+            nodes (list[BaseNode]): Chunks indexed in this run
+            timestamp (str): Run timestamp, used as the version of the index
+
+        Returns:
+            str: S3 URL of the index
+        """
+        chunks = [{"article_id": node.ref_doc_id, "node_id": node.node_id, "text": node.get_content()} for node in nodes]
+        version_prefix = publish_index(self.s3_client, self.aws_s3_bucket, self.lexical_index_s3_prefix, chunks, timestamp)
+        return f"s3://{self.aws_s3_bucket}/{version_prefix}"
+
     def process_documents(self, directory_path):
         """
         Process PDFs, store as markdown in S3, and index in Pinecone
@@ -154,15 +223,78 @@ class DocumentProcessor:
         # Create storage context
         storage_context = StorageContext.from_defaults(vector_store=vector_store)
 
-        # Create index from documents
-        vector_index = VectorStoreIndex.from_documents(
-            processed_docs,
+        # Chunk and embed the documents the same way VectorStoreIndex.from_documents does, keeping the embedded nodes
+        pipeline = IngestionPipeline(transformations=[SentenceSplitter(), self.embed_model])
+        nodes = pipeline.run(documents=processed_docs)
+
+        # Create index from the embedded nodes, their embeddings are reused rather than recomputed
+        vector_index = VectorStoreIndex(
+            nodes,
             storage_context=storage_context,
             embed_model=self.embed_model
         )
 
         print("Documents have been indexed and stored in Pinecone")
 
+        export_path = self.export_chunks(nodes, timestamp)
+        print(f"Exported {len(nodes)} chunks to {export_path}")
+
+        lexical_index_url = self.publish_lexical_index(nodes, timestamp)
+        print(f"Published the BM25 index to {lexical_index_url}")
+
+        self.store_digests(processed_docs)
+
+    def generate_digest(self, doc):
+        """
+        Summarize an article and answer the canonical questions about it
+
+        Args:
+            doc (Document): The article
+
+        Returns:
+            tuple[str, list[dict]]: The digest, and {"question", "answer", "embedding"} objects for the canonical
+            questions and the digest itself, the questions embedded with the chunk embedding model
+        """
+        questions = "\n".join(f"{index + 1}. {question}" for index, question in enumerate(CANONICAL_QUESTIONS))
+        prompt = f"""You are given a research paper. Write a digest of the paper in markdown, covering its problem, method, datasets, results and limitations in at most 300 words. Then answer each of the numbered questions in markdown, solely based on the paper.
+Respond in JSON with a "digest" key holding the digest and an "answers" key holding a list with one answer per question, in order.
+
+Questions:
+{questions}
+
+Paper:
+{doc.text[:DIGEST_MAX_CHARS]}
+"""
+        response = json.loads(self.llm.complete(prompt).text)
+        digest, answers = response["digest"], response["answers"]
+        if len(answers) != len(CANONICAL_QUESTIONS):
+            raise ValueError(f"Expected {len(CANONICAL_QUESTIONS)} answers, got {len(answers)}")
+
+        faq = [
+            {"question": question, "answer": answer}
+            for question, answer in zip(CANONICAL_QUESTIONS + ["Summarize the paper."], answers + [digest])
+        ]
+        embeddings = self.embed_model.get_text_embedding_batch([item["question"] for item in faq])
+        for item, embedding in zip(faq, embeddings):
+            item["embedding"] = embedding
+        return digest, faq
+
+    def store_digests(self, documents):
+        """
+        Generate and store the digest and canonical Q&A pairs of each article, keyed by its a_id. Failures are
+        logged and skipped, the articles are already indexed and can be chatted with without them.
+
+        Args:
+            documents (list[Document]): The processed articles
+        """
+        for doc in documents:
+            try:
+                digest, faq = self.generate_digest(doc)
+                upsert_article_digest(doc.doc_id, digest, faq, self.digest_model, self.embed_model.model_name)
+                print(f"Stored digest and {len(faq)} Q&A pairs for {doc.metadata.get('file_name')}")
+            except Exception as e:
+                print(f"Failed to generate the digest of {doc.metadata.get('file_name')}: {e}")
+
 def main_doc_processor():
     # Set up the directory path
     directory_path = "/tmp/downloaded_pdfs"
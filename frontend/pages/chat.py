@@ -3,7 +3,7 @@ import io
 import streamlit as st
 from dotenv import load_dotenv
 from frontend.utils.chat import fetch_file_from_s3
-from frontend.utils.auth import make_authenticated_request
+from frontend.utils.auth import make_authenticated_stream_request
 from markdown_pdf import MarkdownPdf, Section
 
 def convert_to_pdf(markdown_content):
@@ -53,6 +53,38 @@ def display_pdf(pdf_file):
     pdf_display = f'<iframe src="data:application/pdf;base64,{base64_pdf}" width="100%" height="800" type="application/pdf"></iframe>'
     st.markdown(pdf_display, unsafe_allow_html=True)
 
+STEP_LABELS = {
+    "vector_store_retrieval": "Searched the document",
+    "vector_store_evaluation": "Document results were not enough, widening the search",
+    "paper_search_retrieval": "Searched arXiv papers",
+    "paper_search_evaluation": "Paper results were not enough, widening the search",
+    "web_search_retrieval": "Searched the web",
+    "llm_generation": "Generated the answer",
+    "conversation_reuse": "Reused the sources of the previous answer",
+    "follow_up_rewrite": "Rephrased the follow-up question",
+}
+
+
+def stream_answer(article_id, prompt, status):
+    """Yield answer tokens from the streaming Q/A endpoint, reporting graph steps on `status`"""
+    for event, data in make_authenticated_stream_request(
+        f"/chat/{article_id}/qa/stream",
+        # The conversation's session lets the backend answer follow-ups from the previous turn
+        {"question": prompt, "model": "", "session_id": st.session_state.get("qa_session_id")}
+    ):
+        if event == "step":
+            label = STEP_LABELS.get(data["step"], data["step"])
+            status.update(label=label)
+            status.write(label)
+        elif event == "token":
+            yield data["token"]
+        elif event == "done":
+            st.session_state.qa_session_id = data.get("session_id")
+            yield f"\n\n### Tools used to generate response:\n\t{data['tools_used']}"
+        elif event == "error":
+            raise RuntimeError(data["detail"])
+
+
 def qa_interface():
     st.title("Research Question Answering Interface")
 
@@ -86,23 +118,18 @@ def qa_interface():
             with st.chat_message("user"):
                 st.markdown(prompt)
 
-            with st.spinner("Analyzing..."):
-                try:
-                    response = make_authenticated_request(
-                        f"/chat/{doc['a_id']}/qa",
-                        "POST",
-                        {"question": prompt, "model": ""}
-                    )
-
-                    with st.chat_message("assistant"):
-                        st.markdown(response["response"])
-
-                    st.session_state.chat_history.append({
-                        "role": "assistant",
-                        "content": response["response"]
-                    })
-                except Exception as e:
-                    st.error(f"Analysis error: {str(e)}")
+            try:
+                with st.chat_message("assistant"):
+                    status = st.status("Analyzing...")
+                    answer = st.write_stream(stream_answer(doc['a_id'], prompt, status))
+                    status.update(label="Analysis complete", state="complete", expanded=False)
+
+                st.session_state.chat_history.append({
+                    "role": "assistant",
+                    "content": answer
+                })
+            except Exception as e:
+                st.error(f"Analysis error: {str(e)}")
 
         if st.session_state.chat_history:
             st.divider()
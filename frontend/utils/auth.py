@@ -1,3 +1,5 @@
+import json
+
 import requests
 import streamlit as st
 
@@ -34,6 +36,23 @@ def make_authenticated_request(endpoint, method="GET", data=None, params=None):
     return response.json()
 
 
+def make_authenticated_stream_request(endpoint, data=None):
+    """Yield `(event, data)` pairs from a server-sent events endpoint"""
+    token = get_access_token()
+    headers = {"Authorization": f"Bearer {token}", "Accept": "text/event-stream"}
+    url = f"{settings.BACKEND_URI}/{endpoint}"
+
+    with requests.post(url, json=data, headers=headers, stream=True) as response:
+        response.raise_for_status()
+        event = "message"
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                yield event, json.loads(line[len("data:"):].strip())
+                event = "message"
+
+
 def make_unauthenticated_request(endpoint, method="GET", data=None, params=None):
     url = f"{settings.BACKEND_URI}/{endpoint}"
 
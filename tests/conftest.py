@@ -0,0 +1,9 @@
+import os
+
+# Placeholders for the settings the backend can't start without, the tests only use fake components
+for name in (
+    "AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_REGION", "AWS_S3_BUCKET", "JWT_SECRET_KEY",
+    "POSTGRES_CONN_STRING", "POSTGRES_HOSTNAME", "POSTGRES_USER", "POSTGRES_PASSWORD", "POSTGRES_DB",
+    "PINECONE_API_KEY", "PINECONE_ENVIRONMENT", "OPENAI_API_KEY", "TAVILY_API_KEY",
+):
+    os.environ.setdefault(name, "test")
@@ -0,0 +1,42 @@
+import time
+from types import SimpleNamespace
+
+from backend.services import answer_cache
+from backend.services.answer_cache import SemanticAnswerCache
+
+
+def _cache(**kwargs) -> SemanticAnswerCache:
+    cache = SemanticAnswerCache(**{"threshold": 0.95, **kwargs})
+    cache.put("article-0/gpt-4o", "What is attention?", [1.0, 0.0, 0.0], "Attention weighs tokens.", ["retrieve"], [])
+    return cache
+
+
+def test_similar_prompt_hits():
+    cached = _cache().lookup("article-0/gpt-4o", [0.99, 0.05, 0.0])
+
+    assert cached is not None
+    assert cached.generation == "Attention weighs tokens."
+
+
+def test_prompt_under_threshold_misses():
+    cache = _cache()
+
+    assert cache.lookup("article-0/gpt-4o", [0.8, 0.6, 0.0]) is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_answers_are_scoped():
+    cache = _cache()
+
+    # Another article, or the same article answered by another generator
+    assert cache.lookup("article-1/gpt-4o", [1.0, 0.0, 0.0]) is None
+    assert cache.lookup("article-0/gpt-4o-mini", [1.0, 0.0, 0.0]) is None
+
+
+def test_answers_expire(monkeypatch):
+    cache = _cache(ttl_seconds=60)
+    later = time.time() + 61
+    monkeypatch.setattr(answer_cache, "time", SimpleNamespace(time=lambda: later))
+
+    assert cache.lookup("article-0/gpt-4o", [1.0, 0.0, 0.0]) is None
+    assert cache.stats()["size"] == 0
@@ -0,0 +1,163 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+import backend.cache
+from backend.cache import SingleFlight, TTLCache
+from backend.config import settings
+from backend.services import chat
+
+
+def test_concurrent_callers_share_one_run():
+    flights = SingleFlight()
+    runs = 0
+
+    async def compute():
+        nonlocal runs
+        runs += 1
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def run():
+        return await asyncio.gather(*(flights.do("key", compute) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert runs == 1
+    assert [result for result, _ in results] == ["answer"] * 5
+    assert sorted(shared for _, shared in results) == [False] + [True] * 4
+    assert flights.stats() == {"executed": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_failure_reaches_every_waiter_and_is_not_cached():
+    flights = SingleFlight()
+    runs = 0
+
+    async def compute():
+        nonlocal runs
+        runs += 1
+        await asyncio.sleep(0.01)
+        if runs == 1:
+            raise RuntimeError("graph failed")
+        return "answer"
+
+    async def run():
+        failures = await asyncio.gather(*(flights.do("key", compute) for _ in range(3)), return_exceptions=True)
+        return failures, await flights.do("key", compute)
+
+    failures, retry = asyncio.run(run())
+    assert all(isinstance(failure, RuntimeError) for failure in failures)
+    # The next caller runs again instead of getting the failure
+    assert retry == ("answer", False)
+    assert runs == 2
+
+
+def test_cancelled_starter_does_not_cancel_the_run():
+    flights = SingleFlight()
+
+    async def compute():
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def run():
+        starter = asyncio.create_task(flights.do("key", compute))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flights.do("key", compute))
+        await asyncio.sleep(0)
+        starter.cancel()
+        return await waiter
+
+    assert asyncio.run(run()) == ("answer", True)
+
+
+@pytest.fixture
+def counted_runs(monkeypatch):
+    monkeypatch.setattr(settings, "QA_SINGLE_FLIGHT", True)
+    monkeypatch.setattr(chat, "qa_flights", SingleFlight())
+    runs = []
+
+    async def run_agent(article_ids, prompt, generator, embedding):
+        runs.append(prompt)
+        run = len(runs)
+        await asyncio.sleep(0.01)
+        return {"generation": f"answer {run}"}
+
+    monkeypatch.setattr(chat, "_run_agent", run_agent)
+    return runs
+
+
+def test_bypass_request_never_joins_a_cacheable_run(counted_runs):
+    async def run():
+        return await asyncio.gather(
+            chat._answer(["article-0"], "What is attention?", "gpt-4o", None, bypass_cache=False),
+            chat._answer(["article-0"], "what is  attention?", "gpt-4o", None, bypass_cache=True),
+            chat._answer(["article-0"], "What is attention?", "gpt-4o", None, bypass_cache=True),
+        )
+
+    cached, bypassed, bypassed_again = asyncio.run(run())
+    # The bypassing requests get their own run, which they share with each other
+    assert len(counted_runs) == 2
+    assert cached != bypassed
+    assert bypassed == bypassed_again
+
+
+def test_concurrent_misses_compute_once():
+    cache = TTLCache(maxsize=10, ttl_seconds=60)
+    runs = 0
+    release = threading.Event()
+
+    def compute():
+        nonlocal runs
+        runs += 1
+        release.wait(1)
+        return "value"
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        futures = [executor.submit(cache.get_or_compute, "key", compute) for _ in range(5)]
+        # Let every thread reach the cache before the computation finishes
+        time.sleep(0.05)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert results == ["value"] * 5
+    assert runs == 1
+    assert cache.stats()["coalesced"] == 4
+
+
+def test_concurrent_async_misses_compute_once():
+    cache = TTLCache(maxsize=10, ttl_seconds=60)
+    runs = 0
+
+    async def compute():
+        nonlocal runs
+        runs += 1
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def run():
+        return await asyncio.gather(*(cache.aget_or_compute("key", compute) for _ in range(5)))
+
+    assert asyncio.run(run()) == ["value"] * 5
+    assert runs == 1
+
+
+def test_entries_expire(monkeypatch):
+    cache = TTLCache(maxsize=10, ttl_seconds=60)
+    cache.put("key", "value")
+    assert cache.get_or_compute("key", lambda: "recomputed") == "value"
+
+    later = time.time() + 61
+    monkeypatch.setattr(backend.cache, "time", SimpleNamespace(time=lambda: later))
+    assert cache.get("key") is None
+    assert cache.get_or_compute("key", lambda: "recomputed") == "recomputed"
+
+
+def test_uncacheable_values_are_computed_again():
+    cache = TTLCache(maxsize=10, ttl_seconds=60)
+
+    assert cache.get_or_compute("key", lambda: [], cacheable=bool) == []
+    assert cache.get_or_compute("key", lambda: ["result"], cacheable=bool) == ["result"]
+    assert cache.get("key") == ["result"]
@@ -0,0 +1,102 @@
+import asyncio
+import json
+
+import pytest
+from prometheus_client import REGISTRY
+
+from backend.config import settings
+from backend.research_agent import compile_graph, set_agent_workflow
+from backend.services.chat import stream_qa_query
+from benchmarks.fakes import FakeChatModel, FakePaperSearchTool, FakeRetriever, FakeWebSearchTool
+
+
+@pytest.fixture
+def fake_agent(monkeypatch):
+    for name in ("ANSWER_CACHE_ENABLED", "DIGEST_ANSWERS_ENABLED", "VERIFICATION_ENABLED"):
+        monkeypatch.setattr(settings, name, False)
+    set_agent_workflow(compile_graph(
+        llm=FakeChatModel(latency=0.01), retriever=FakeRetriever(), paper_search_tool=FakePaperSearchTool(),
+        web_search_tool=FakeWebSearchTool(), retrieval_mode="serial",
+    ))
+    yield
+    set_agent_workflow(None)
+
+
+def _stream(article_id: str, prompt: str) -> list[tuple[str, dict]]:
+    async def collect():
+        return [event async for event in stream_qa_query(article_id, prompt, "", 1, bypass_cache=True)]
+
+    events = []
+    for message in asyncio.run(collect()):
+        event, data = message.strip().split("\n", 1)
+        events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+def _llm_calls_recorded() -> float:
+    return sum(
+        sample.value for metric in REGISTRY.collect() if metric.name == "research_agent_llm_calls"
+        for sample in metric.samples if sample.name == "research_agent_llm_calls_total"
+    )
+
+
+def test_streamed_done_event_reports_llm_calls(fake_agent):
+    recorded_before = _llm_calls_recorded()
+
+    events = _stream("article-0", "What is the main contribution?")
+
+    event, done = events[-1]
+    assert event == "done"
+    assert done["metrics"]["llm_calls"] > 0
+    assert done["metrics"]["prompt_tokens"] > 0
+    assert _llm_calls_recorded() - recorded_before == done["metrics"]["llm_calls"]
+
+
+def test_streamed_done_event_reports_duration(fake_agent):
+    event, done = _stream("article-0", "What is the main contribution?")[-1]
+
+    assert event == "done"
+    assert done["metrics"]["duration_seconds"] > 0
+
+
+@pytest.fixture
+def speculative_agent(monkeypatch):
+    def install(vector_hit_rate: float):
+        set_agent_workflow(compile_graph(
+            llm=FakeChatModel(latency=0.01, tokens_per_second=500), retriever=FakeRetriever(hit_rate=vector_hit_rate),
+            paper_search_tool=FakePaperSearchTool(), web_search_tool=FakeWebSearchTool(), retrieval_mode="serial",
+            speculative_generation=True,
+        ))
+
+    for name in ("ANSWER_CACHE_ENABLED", "DIGEST_ANSWERS_ENABLED", "VERIFICATION_ENABLED"):
+        monkeypatch.setattr(settings, name, False)
+    yield install
+    set_agent_workflow(None)
+
+
+def _speculations(outcome: str) -> float:
+    return REGISTRY.get_sample_value("research_agent_speculative_generations_total", {"outcome": outcome}) or 0
+
+
+def test_kept_draft_is_streamed_token_by_token(speculative_agent):
+    speculative_agent(vector_hit_rate=1.0)
+    kept_before = _speculations("kept")
+
+    events = _stream("article-0", "What is the main contribution?")
+
+    tokens = [data["token"] for event, data in events if event == "token"]
+    assert _speculations("kept") - kept_before == 1
+    assert len(tokens) > 1
+    assert "".join(tokens) == FakeChatModel().answer
+    assert events[-1][0] == "done"
+
+
+def test_discarded_draft_is_not_streamed(speculative_agent):
+    speculative_agent(vector_hit_rate=0.0)
+    discarded_before = _speculations("discarded")
+
+    events = _stream("article-0", "What is the main contribution?")
+
+    tokens = [data["token"] for event, data in events if event == "token"]
+    assert _speculations("discarded") - discarded_before == 1
+    assert "".join(tokens) == FakeChatModel().answer
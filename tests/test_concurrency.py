@@ -0,0 +1,51 @@
+import asyncio
+
+from langchain_core.runnables import RunnableLambda
+
+from backend.research_agent.concurrency import ConcurrencyLimit, LimitedRunnable
+
+
+def test_calls_wait_for_the_provider_limit():
+    in_flight, peak = 0, 0
+
+    async def call(x: int) -> int:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return x * 2
+
+    limit = ConcurrencyLimit(2)
+    runnables = [LimitedRunnable(RunnableLambda(call), name, limit) for name in ("first", "second")]
+
+    async def run():
+        return await asyncio.gather(*(runnables[x % 2].ainvoke(x) for x in range(8)))
+
+    # Results are routed back to each caller, while the two runnables share the limit
+    assert asyncio.run(run()) == [x * 2 for x in range(8)]
+    assert peak == 2
+
+
+def test_cancelled_call_gives_up_its_place():
+    limit = ConcurrencyLimit(1)
+    started = []
+
+    async def call(x: int) -> int:
+        started.append(x)
+        await asyncio.sleep(0.05)
+        return x
+
+    runnable = LimitedRunnable(RunnableLambda(call), "grader", limit)
+
+    async def run():
+        first = asyncio.create_task(runnable.ainvoke(1))
+        queued = asyncio.create_task(runnable.ainvoke(2))
+        await asyncio.sleep(0)
+        queued.cancel()
+        return await first, await asyncio.gather(queued, return_exceptions=True)
+
+    result, (cancelled,) = asyncio.run(run())
+    assert result == 1
+    assert isinstance(cancelled, asyncio.CancelledError)
+    assert started == [1]
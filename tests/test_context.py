@@ -0,0 +1,50 @@
+from backend.research_agent.context import count_tokens, pack_context
+from backend.research_agent.graph import Resource
+
+MODEL = "gpt-4o"
+
+
+def _resource(content: str) -> Resource:
+    return Resource(content=content, source="vector_store")
+
+
+def test_duplicates_are_dropped():
+    passage = (
+        "The encoder maps each input token to a contextual representation. Every layer applies self-attention over the "
+        "whole sequence followed by a feed-forward network, with residual connections and layer normalization around "
+        "both, and the decoder attends to the final representations when generating the output."
+    )
+    resources = [
+        _resource(passage),
+        _resource("  " + passage.upper()),
+        # Near duplicate: the same passage with a different last word
+        _resource(passage.replace("output.", "translation.")),
+        _resource("The dataset has ten thousand questions."),
+    ]
+
+    packed, stats = pack_context(resources, MODEL, token_budget=1000)
+
+    assert [resource.content for resource in packed] == [passage, "The dataset has ten thousand questions."]
+    assert stats["exact_duplicates"] == 1
+    assert stats["near_duplicates"] == 1
+
+
+def test_resources_over_budget_are_dropped_in_order():
+    resources = [_resource(f"Passage {index} describes a different part of the method in some detail.") for index in range(5)]
+    per_resource = count_tokens(resources[0].content, MODEL)
+
+    packed, stats = pack_context(resources, MODEL, token_budget=per_resource * 2 + 1)
+
+    assert packed == resources[:2]
+    assert stats["over_budget"] == 3
+    assert stats["tokens"] <= stats["token_budget"]
+
+
+def test_most_relevant_resource_is_truncated_to_fit():
+    resources = [_resource("word " * 200), _resource("A short passage.")]
+
+    packed, stats = pack_context(resources, MODEL, token_budget=20)
+
+    assert len(packed) == 1
+    assert count_tokens(packed[0].content, MODEL) <= 20
+    assert stats["truncated"] == 1
@@ -0,0 +1,58 @@
+import pytest
+
+from backend.research_agent.graph import Resource
+from backend.services.conversations import ConversationStore, FollowUp
+
+
+@pytest.fixture
+def store() -> ConversationStore:
+    return ConversationStore()
+
+
+@pytest.fixture
+def session(store):
+    session = store.resume(None, "article-0")
+    store.record(
+        session, "How is the model trained?",
+        "The model is pre-trained with a masked language modelling loss, then fine-tuned on each task.",
+        [Resource(content="We pre-train with a masked language modelling objective on BooksCorpus.", source="vector_store")],
+    )
+    return session
+
+
+@pytest.mark.parametrize("prompt", [
+    "What is the first experiment?",
+    "Give an example of the loss",
+    "What is the second contribution?",
+    "How does the model compute its loss?",
+    "How do the authors evaluate their method?",
+    "What did previous work do?",
+    "Are there more results in the appendix?",
+    "What is this paper about?",
+    "Which datasets does this work use?",
+    "Is the model trained again after pruning?",
+])
+def test_questions_without_reference_stay_new(store, session, prompt):
+    assert store.classify(session, prompt) == FollowUp.NEW
+
+
+@pytest.mark.parametrize("prompt", [
+    "What does it mean?",
+    "Why is that?",
+    "Which of them is best?",
+    "Can you elaborate?",
+    "Give another example",
+    "Explain the second point",
+    "Can you simplify that?",
+])
+def test_references_to_the_last_turn_are_follow_ups(store, session, prompt):
+    assert store.classify(session, prompt) != FollowUp.NEW
+
+
+def test_follow_up_with_only_known_words_reuses_resources(store, session):
+    assert store.classify(session, "What does it mean?") == FollowUp.REUSE
+    assert store.classify(session, "How does it compare to GPT on translation benchmarks?") == FollowUp.REWRITE
+
+
+def test_first_question_is_new(store):
+    assert store.classify(store.resume(None, "article-0"), "What does it mean?") == FollowUp.NEW
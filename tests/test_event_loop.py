@@ -0,0 +1,57 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from backend.config import settings
+from backend.research_agent import compile_graph, set_agent_workflow
+from benchmarks.fakes import FakeChatModel, FakePaperSearchTool, FakeRetriever, FakeWebSearchTool
+
+# Seconds each fake LLM and search call takes
+LATENCY = 0.1
+REQUESTS = 10
+
+
+@pytest.fixture
+def client(monkeypatch):
+    for name in ("ANSWER_CACHE_ENABLED", "DIGEST_ANSWERS_ENABLED", "VERIFICATION_ENABLED"):
+        monkeypatch.setattr(settings, name, False)
+    set_agent_workflow(compile_graph(
+        llm=FakeChatModel(latency=LATENCY), retriever=FakeRetriever(latency=LATENCY / 10),
+        web_search_tool=FakeWebSearchTool(latency=LATENCY), paper_search_tool=FakePaperSearchTool(latency=LATENCY),
+    ))
+    from backend.main import app
+
+    yield httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", timeout=None)
+    set_agent_workflow(None)
+
+
+async def _ask(client: httpx.AsyncClient, article_id: str) -> float:
+    start = time.perf_counter()
+    response = await client.post(
+        f"/chat/{article_id}/qa", json={"question": "What is the main contribution?", "model": "", "bypass_cache": True}
+    )
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+def test_concurrent_questions_do_not_block_the_event_loop(client):
+    async def run():
+        async with client:
+            single = await _ask(client, "article-0")
+
+            start = time.perf_counter()
+            batch = asyncio.gather(*(_ask(client, f"article-{index}") for index in range(REQUESTS)))
+            await asyncio.sleep(LATENCY / 2)
+            probe_start = time.perf_counter()
+            (await client.get("/openapi.json")).raise_for_status()
+            probe = time.perf_counter() - probe_start
+            await batch
+            return single, time.perf_counter() - start, probe
+
+    single, elapsed, probe = asyncio.run(run())
+    # Graph runs wait on their LLM and search calls concurrently instead of one after the other
+    assert elapsed < single * 3
+    # Other endpoints answer while they run, rather than after a blocked call returns
+    assert probe < LATENCY
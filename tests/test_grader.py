@@ -0,0 +1,25 @@
+import pytest
+
+from backend.research_agent.grader import GraderUtils
+
+
+@pytest.mark.parametrize("scores, expected", [
+    ({"1": "yes", "2": "no", "3": "yes"}, [True, False, True]),
+    # Order and case of the output don't matter
+    ({"2": " No", "1": "YES", "3": "no "}, [True, False, False]),
+])
+def test_listwise_scores_are_parsed_in_document_order(scores, expected):
+    assert GraderUtils.parse_listwise_scores(scores, 3) == expected
+
+
+@pytest.mark.parametrize("scores", [
+    ["yes", "no", "yes"],
+    {"1": "yes", "2": "no"},
+    {"1": "yes", "2": "no", "3": "yes", "4": "no"},
+    {"0": "yes", "1": "no", "2": "yes"},
+    {"1": "yes", "2": "maybe", "3": "yes"},
+    {"1": "yes", "2": True, "3": "yes"},
+    {"1": "yes", "two": "no", "3": "yes"},
+])
+def test_malformed_listwise_scores_are_rejected(scores):
+    assert GraderUtils.parse_listwise_scores(scores, 3) is None
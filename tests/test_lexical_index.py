@@ -0,0 +1,81 @@
+import io
+
+import pytest
+from botocore.exceptions import ClientError
+
+from backend.config import settings
+from backend.research_agent import vector_store
+from backend.research_agent.lexical_index import LATEST_FILE, publish_index
+
+
+def _node(article_id: str, node_id: str, text: str) -> dict:
+    # A chunk as the DAG passes them to publish_index
+    return {"article_id": article_id, "node_id": node_id, "text": text}
+
+
+FIRST_RUN = [
+    _node("article-b", "b-0", "GPT-4o answers questions about the paper."),
+    _node("article-a", "a-0", "We fine-tune BERT-base on the v1.5 dataset."),
+    _node("article-a", "a-1", "The dataset has ten thousand questions."),
+]
+SECOND_RUN = [
+    _node("article-b", "b-new", "Sparse retrieval with BM25 complements dense retrieval."),
+    _node("article-c", "c-0", "Reciprocal rank fusion merges rankings."),
+]
+
+
+class FakeS3:
+    """S3 client keeping objects in memory, with the methods the DAG and the backend call"""
+
+    def __init__(self):
+        self.objects: dict[str, bytes] = {}
+
+    def put_object(self, Bucket, Key, Body, ContentType):
+        self.objects[Key] = Body.encode("utf-8") if isinstance(Body, str) else Body
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+        return {"Body": io.BytesIO(self.objects[Key])}
+
+    def download_file(self, Bucket, Key, Filename):
+        with open(Filename, "wb") as f:
+            f.write(self.get_object(Bucket, Key)["Body"].read())
+
+
+def _publish(s3: FakeS3, chunks: list[dict], version: str):
+    publish_index(s3, "bucket", settings.LEXICAL_INDEX_S3_PREFIX, chunks, version)
+
+
+def test_published_index_is_downloaded_and_searchable(tmp_path, monkeypatch):
+    s3 = FakeS3()
+    monkeypatch.setattr(vector_store, "get_s3_client", lambda: s3)
+    monkeypatch.setattr(vector_store, "load_s3_bucket", lambda: "bucket")
+    _publish(s3, FIRST_RUN, "20240101_000000")
+    _publish(s3, SECOND_RUN, "20240102_000000")
+    assert s3.objects[f"{settings.LEXICAL_INDEX_S3_PREFIX}/{LATEST_FILE}"] == b"20240102_000000"
+
+    index = vector_store.download_lexical_index(str(tmp_path))
+    # article-b was re-indexed in the second run, its old chunk is gone
+    assert sorted(index.articles) == ["article-a", "article-b", "article-c"]
+    assert [index.node_ids[row] for row, _ in index.search("BM25 retrieval", "article-b")] == ["b-new"]
+    assert [index.node_ids[row] for row, _ in index.search("bert", "article-a")] == ["a-0"]
+
+
+def test_missing_index_fails_loudly(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_store, "get_s3_client", FakeS3)
+    monkeypatch.setattr(vector_store, "load_s3_bucket", lambda: "bucket")
+    with pytest.raises(FileNotFoundError, match="RETRIEVER_MODE=dense"):
+        vector_store.download_lexical_index(str(tmp_path))
+
+
+def test_previous_copy_is_used_when_s3_fails(tmp_path, monkeypatch):
+    s3 = FakeS3()
+    monkeypatch.setattr(vector_store, "get_s3_client", lambda: s3)
+    monkeypatch.setattr(vector_store, "load_s3_bucket", lambda: "bucket")
+    _publish(s3, FIRST_RUN, "20240101_000000")
+    vector_store.download_lexical_index(str(tmp_path))
+
+    s3.objects.clear()
+    index = vector_store.download_lexical_index(str(tmp_path))
+    assert sorted(index.articles) == ["article-a", "article-b"]
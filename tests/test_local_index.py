@@ -0,0 +1,19 @@
+import numpy as np
+
+from backend.research_agent.local_index import LocalVectorIndex
+
+
+def test_search_leaves_the_query_embedding_unchanged(tmp_path):
+    index = LocalVectorIndex.build([
+        {"article_id": "article-0", "node_id": "n-0", "text": "first chunk", "embedding": [1.0, 0.0]},
+        {"article_id": "article-0", "node_id": "n-1", "text": "second chunk", "embedding": [0.0, 1.0]},
+    ], str(tmp_path))
+    embedding = np.array([3.0, 4.0], dtype=np.float32)
+
+    matches = index.search(embedding, "article-0", top_k=2)
+
+    assert [index.node_ids[row] for row, _ in matches] == ["n-1", "n-0"]
+    assert np.allclose([score for _, score in matches], [0.8, 0.6])
+    # Searched twice with the same array, as with a cached query embedding
+    assert index.search(embedding, "article-0", top_k=2) == matches
+    assert embedding.tolist() == [3.0, 4.0]
@@ -0,0 +1,83 @@
+import asyncio
+import time
+
+import pytest
+
+from backend.research_agent.grader import GraderUtils
+from backend.research_agent.graph import Resource
+from backend.research_agent.nodes import GraphNodes
+from benchmarks.fakes import FakeChatModel, FakePaperSearchTool, FakeRetriever, FakeWebSearchTool
+
+
+def _nodes(**kwargs) -> GraphNodes:
+    llm = FakeChatModel()
+    components = dict(
+        llm=llm, retriever=FakeRetriever(), web_search_tool=FakeWebSearchTool(), paper_search_tool=FakePaperSearchTool(),
+        retrieval_grader=GraderUtils(llm=llm).create_retrieval_grader(),
+    )
+    return GraphNodes(**{**components, **kwargs})
+
+
+def _stale_state() -> dict:
+    # Left by an earlier retrieval whose resources the reranker graded
+    return {"prompt": "What is the main contribution?", "article_id": "article-0", "steps": [],
+            "resource_grades": [True, False], "grader_calls_avoided": 2}
+
+
+def test_fanout_search_resets_reranker_grades():
+    state = _nodes().fanout_search(_stale_state())
+
+    assert state["resource_grades"] == []
+    assert state["grader_calls_avoided"] == 0
+
+
+def test_afanout_search_resets_reranker_grades():
+    state = asyncio.run(_nodes().afanout_search(_stale_state()))
+
+    assert state["resource_grades"] == []
+    assert state["grader_calls_avoided"] == 0
+
+
+class FailingWebSearchTool:
+    """Tavily reports API failures by returning the error as a string"""
+
+    def invoke(self, tool_input, config=None):
+        return "HTTPError('502 Server Error')"
+
+    async def ainvoke(self, tool_input, config=None):
+        return self.invoke(tool_input, config)
+
+
+def test_failed_web_search_yields_no_resources():
+    nodes = _nodes(web_search_tool=FailingWebSearchTool())
+
+    assert nodes.web_search({"prompt": "What is attention?", "steps": []})["resources"] == []
+    assert asyncio.run(nodes.aweb_search({"prompt": "What is attention?", "steps": []}))["resources"] == []
+
+
+class StallingGrader:
+    """Hangs on the resources containing "stall" and accepts the others"""
+
+    def invoke(self, input, config=None):
+        if "stall" in input["resources"]:
+            time.sleep(1.0)
+        return {"score": "yes"}
+
+    async def ainvoke(self, input, config=None):
+        if "stall" in input["resources"]:
+            await asyncio.sleep(1.0)
+        return {"score": "yes"}
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_grading_timeout_counts_from_each_call_start(use_async):
+    nodes = _nodes(retrieval_grader=StallingGrader(), grading_concurrency=1, grading_timeout=0.2)
+    resources = [Resource(content=content, source="vector_store") for content in ("stall", "fast", "fast")]
+
+    if use_async:
+        grades = asyncio.run(nodes._agrade_resources_pointwise("What is attention?", resources))
+    else:
+        grades = nodes._grade_resources_pointwise("What is attention?", resources)
+
+    # The stalled call times out on its own, the single worker then grades the others in time
+    assert grades == [False, True, True]
@@ -0,0 +1,47 @@
+import asyncio
+
+from backend.cache import TTLCache
+from backend.utils import CachedSearchTool
+
+
+class FlakySearchTool:
+    """Search tool answering with the queued results in turn, an error string standing for a failed Tavily call"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    def invoke(self, tool_input, config=None):
+        self.calls += 1
+        return self.results.pop(0)
+
+    async def ainvoke(self, tool_input, config=None):
+        return self.invoke(tool_input, config)
+
+
+def _tool(search_tool: FlakySearchTool) -> CachedSearchTool:
+    return CachedSearchTool(search_tool, cache=TTLCache(maxsize=10, ttl_seconds=60), name="tavily", params={})
+
+
+def test_error_strings_and_empty_results_are_not_cached():
+    results = [{"url": "https://example.com", "content": "result"}]
+    search_tool = FlakySearchTool("HTTPError('502 Server Error')", [], results)
+    tool = _tool(search_tool)
+
+    assert tool.invoke({"query": "attention"}) == "HTTPError('502 Server Error')"
+    assert tool.invoke({"query": "attention"}) == []
+    assert tool.invoke({"query": "attention"}) == results
+    assert tool.invoke({"query": "Attention "}) == results
+    assert search_tool.calls == 3
+
+
+def test_async_error_strings_are_not_cached():
+    results = [{"url": "https://example.com", "content": "result"}]
+    search_tool = FlakySearchTool("HTTPError('502 Server Error')", results)
+    tool = _tool(search_tool)
+
+    async def search():
+        return [await tool.ainvoke({"query": "attention"}) for _ in range(3)]
+
+    assert asyncio.run(search()) == ["HTTPError('502 Server Error')", results, results]
+    assert search_tool.calls == 2
@@ -0,0 +1,28 @@
+import asyncio
+
+from backend.research_agent.vector_store import Retriever
+from benchmarks.fakes import FakeEmbedding
+
+
+class RecordingEmbedding(FakeEmbedding):
+    """FakeEmbedding recording the queries it embeds"""
+    queries: list[str] = []
+
+    def _get_query_embedding(self, query: str) -> list[float]:
+        self.queries.append(query)
+        return super()._get_query_embedding(query)
+
+    async def _aget_query_embedding(self, query: str) -> list[float]:
+        self.queries.append(query)
+        return await super()._aget_query_embedding(query)
+
+
+def test_query_embeddings_keep_the_query_casing():
+    embed_model = RecordingEmbedding(dimension=8, queries=[])
+    retriever = Retriever(vector_store=None, embed_model=embed_model)
+
+    bert = retriever.embed_query("How is  BERT fine-tuned?")
+    assert retriever.embed_query("How is BERT fine-tuned? ") == bert
+    assert asyncio.run(retriever.aembed_query("How is BERT fine-tuned?")) == bert
+    assert retriever.embed_query("How is bert fine-tuned?") != bert
+    assert embed_model.queries == ["How is BERT fine-tuned?", "How is bert fine-tuned?"]
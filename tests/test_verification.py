@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+
+from backend.research_agent.edges import GraphEdges
+from backend.research_agent.grader import GraderUtils
+from backend.research_agent.graph import Resource
+from backend.services.verification import AnswerVerifier, VerificationStatus
+from benchmarks.fakes import FakeChatModel
+
+
+def _verify(llm: FakeChatModel) -> VerificationStatus:
+    grader = GraderUtils(llm=llm)
+    verifier = AnswerVerifier(
+        model="fake-chat-model", edges=GraphEdges(grader.create_hallucination_grader(), grader.create_code_evaluator())
+    )
+
+    async def verify():
+        verification = verifier.submit(
+            "What is the main contribution?", "A research agent.", [Resource(content="The paper proposes an agent.", source="vector_store")]
+        )
+        assert verification.status == VerificationStatus.PENDING
+        await asyncio.gather(*verifier._tasks)
+        return verifier.get(verification.verification_id).status
+
+    return asyncio.run(verify())
+
+
+@pytest.mark.parametrize("llm, status", [
+    (FakeChatModel(), VerificationStatus.GROUNDED),
+    (FakeChatModel(useful=False), VerificationStatus.NOT_USEFUL),
+    (FakeChatModel(grounded=False), VerificationStatus.NOT_GROUNDED),
+])
+def test_verdict_of_the_generation_grading_edge(llm, status):
+    assert _verify(llm) == status